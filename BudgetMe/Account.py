@@ -1,9 +1,9 @@
 from datetime import date
 
+from BudgetMe.Bank import Bank
 from BudgetMe.BudgetException import BudgetAccountParametersInvalid
 from BudgetMe.Empty import EmptyObject
-from BudgetMe.Forecast import Forecast
-import xlsxwriter
+from BudgetMe.Ledger import Ledger, ForecastArray
 
 """
 BudgetMe is an approach to BaC (Budget as Code).
@@ -30,7 +30,8 @@ class Account:
             self.year = todays_date.year
         else:
             self.year = year
-        self.forecast_array = []
+        self.ledger = Ledger(account=account)
+        self.forecasts = None
         self.account = account
         self.days = []
         self.category = category
@@ -48,6 +49,21 @@ class Account:
             self.transfer_balance = False
         self.balance = 0
 
+    @property
+    def forecast_array(self) -> ForecastArray:
+        """
+        Transactions of the account, in month and day order. The same array is returned while the ledger stays.
+        :return: ForecastArray
+        """
+        if (self.forecasts is None or self.forecasts.ledger is not self.ledger):
+            self.forecasts = ForecastArray(self.ledger)
+        return self.forecasts
+
+    @forecast_array.setter
+    def forecast_array(self, forecasts):
+        self.ledger.clear()
+        self.forecast_array.extend(forecasts)
+
     def validate(self) -> bool:
         """
         Validates if all the input values for an Account are valid.
@@ -94,14 +110,18 @@ class Account:
     def init(self, range_start=1, range_end=12):
         """
         Initializes an account, filling the year with transactions based on the start, end and frequency.
+        Months after 12 belong to the following years (13 is January of the next year), up to the budget end.
         :param range_start: Month where the transactions start.
         :param range_end: Month where the transactions end.
         :return: None
         """
         self.validate()
-        if (range_start > range_end or range_end < 1 or range_end > 12):
+        if (range_start > range_end or range_end < 1 or range_end > max(12, self.budget_end)):
             raise Exception("The range is incorrect.")
         frequency_counter = 0
+        self.ledger.reserve(self.budget_start, self.budget_end, len(self.days))
+        # Balance carried from the months before each iteration, so filling 'previous' is a single pass.
+        previous = self.getBalancePreviousMonth(self.budget_start)
         for i in range(self.budget_start, self.budget_end + 1):
             if (i >= range_start and i <= range_end):
                 if (frequency_counter == self.frequency):
@@ -110,20 +130,18 @@ class Account:
                     frequency_counter += 1
                 if (frequency_counter == 1):
                     for j in range(1, len(self.days) + 1):
-                        forecast = Forecast(month=i, day=j, amount=self.days[j - 1],
-                                            previous=self.getBalancePreviousMonth(i),account=self.name)
-                        self.forecast_array.append(forecast)
+                        index = self.ledger.put(month=i, day=j, amount=self.days[j - 1], previous=previous)
                         if (self.bank):
-                            self.bank.addTransaction(forecast)
+                            self.bank.addTransaction(self.ledger.view(index))
                     # frequency_counter = 0
                 else:
                     for j in range(1, len(self.days) + 1):
-                        forecast = Forecast(month=i, day=j, amount=0, previous=self.getBalancePreviousMonth(i), account=self.name)
-                        self.forecast_array.append(forecast)
+                        self.ledger.put(month=i, day=j, amount=0, previous=previous)
             else:
                 for j in range(1, len(self.days) + 1):
-                    forecast = Forecast(month=i, day=j, amount=0, previous=self.getBalancePreviousMonth(i),account=self.name)
-                    self.forecast_array.append(forecast)
+                    self.ledger.put(month=i, day=j, amount=0, previous=previous)
+            if (i >= 1):
+                previous += self.ledger.getMonthBalance(i)
 
     def getBalancePreviousMonth(self, month) -> float:
         """
@@ -131,11 +149,7 @@ class Account:
         :param month:
         :return: Float
         """
-        balance = 0
-        if (month > 1):
-            for i in range(1, month):
-                balance += self.getMonthBalance(i)
-        return balance
+        return self.ledger.getBalance(1, month - 1)
 
     def getMonth(self, month) -> []:
         """
@@ -143,7 +157,7 @@ class Account:
         :param month:
         :return:
         """
-        return [d for d in self.forecast_array if d.month == month]
+        return self.ledger.getMonth(month)
 
     def setAmount(self, month, day, amount):
         """
@@ -153,7 +167,9 @@ class Account:
         :param amount: Account name
         :return: None
         """
-        [c for c in [d for d in self.forecast_array if d.month == month] if c.day == day][0].amount = amount
+        index = self.ledger.index(month, day)
+        self.correctBank(month, day, amount - self.ledger.amounts[index])
+        self.ledger.amounts[index] = amount
 
     def correctTransaction(self, month, day, amount):
         """
@@ -164,9 +180,21 @@ class Account:
         :param amount: Account name
         :return: None
         """
-        txn = [c for c in [d for d in self.forecast_array if d.month == month] if c.day == day][0]
-        txn.amount = amount
-        txn.confirmed = True
+        index = self.ledger.index(month, day)
+        self.correctBank(month, day, amount - self.ledger.amounts[index])
+        self.ledger.amounts[index] = amount
+        self.ledger.confirmed[index] = 1
+
+    def correctBank(self, month, day, difference):
+        """
+        Passes the change of amount of a transaction to the bank of the account.
+        :param month: Month of the transaction.
+        :param day: Ordinal day of the transaction.
+        :param difference: New amount minus the previous one.
+        :return: None
+        """
+        if (isinstance(self.bank, Bank) and difference != 0):
+            self.bank.correctTransaction(month, day, difference)
 
     def confirmTransaction(self, month, day):
         """
@@ -177,7 +205,7 @@ class Account:
         :param amount: Account name
         :return: None
         """
-        txn = [c for c in [d for d in self.forecast_array if d.month == month] if c.day == day][0].confirmed = True
+        self.ledger.confirmed[self.ledger.index(month, day)] = 1
 
     def removeConfirmTransaction(self, month, day):
         """
@@ -188,7 +216,7 @@ class Account:
         :param amount: Account name
         :return: None
         """
-        txn = [c for c in [d for d in self.forecast_array if d.month == month] if c.day == day][0].confirmed = False
+        self.ledger.confirmed[self.ledger.index(month, day)] = 0
 
     def correctPreviousBalance(self, month, day, previous):
         """
@@ -199,17 +227,68 @@ class Account:
         :param amount: Account name
         :return: None
         """
-        [c for c in [d for d in self.forecast_array if d.month == month] if c.day == day][0].previous = previous
+        self.ledger.previous[self.ledger.index(month, day)] = previous
+
+    def correctTransactions(self, corrections) -> int:
+        """
+        Updates the actual values of many transactions of the account in one pass, confirming them.
+        :param corrections: Iterable of (month, day, amount).
+        :return: Number of transactions that changed.
+        """
+        ledger = self.ledger
+        cells = [(month, day, ledger.index(month, day), amount) for month, day, amount in corrections]
+        changed = 0
+        for month, day, index, amount in cells:
+            if (ledger.amounts[index] != amount or not ledger.confirmed[index]):
+                changed += 1
+                self.correctBank(month, day, amount - ledger.amounts[index])
+                ledger.amounts[index] = amount
+                ledger.confirmed[index] = 1
+        return changed
+
+    def confirmTransactions(self, confirmations) -> int:
+        """
+        Sets or removes the confirmation of many transactions of the account in one pass.
+        :param confirmations: Iterable of (month, day, confirmed).
+        :return: Number of transactions that changed.
+        """
+        ledger = self.ledger
+        cells = [(ledger.index(month, day), 1 if confirmed else 0) for month, day, confirmed in confirmations]
+        changed = 0
+        for index, confirmed in cells:
+            if (ledger.confirmed[index] != confirmed):
+                changed += 1
+                ledger.confirmed[index] = confirmed
+        return changed
+
+    def correctPreviousBalances(self, corrections) -> int:
+        """
+        Updates the previous balance of many transactions of the account in one pass.
+        :param corrections: Iterable of (month, day, previous).
+        :return: Number of transactions that changed.
+        """
+        ledger = self.ledger
+        cells = [(ledger.index(month, day), previous) for month, day, previous in corrections]
+        changed = 0
+        for index, previous in cells:
+            if (ledger.previous[index] != previous):
+                changed += 1
+                ledger.previous[index] = previous
+        return changed
 
     def getFinalBalance(self) -> float:
         """
         Returns the final balance of the account
         :return:
         """
-        balance = 0
-        for month in range(1, 13):
-            balance += self.getMonthBalance(month)
-        return balance
+        return self.ledger.getBalance(1, self.getLastMonth())
+
+    def getLastMonth(self) -> int:
+        """
+        Returns the last month covered by the account: December of the first year, or later for longer horizons.
+        :return: int
+        """
+        return max(12, self.ledger.last())
 
     def getMonthBalance(self, month) -> float:
         """
@@ -217,11 +296,7 @@ class Account:
         :param month:
         :return:
         """
-        balance = 0
-        month_transactions = [d for d in self.forecast_array if d.month == month]
-        for txn in month_transactions:
-            balance += txn.amount
-        return balance
+        return self.ledger.getMonthBalance(month)
 
     def getMonthDayBalance(self, month, day) -> float:
         """
@@ -229,11 +304,7 @@ class Account:
         :param month:
         :return:
         """
-        balance = 0
-        month_transactions = [d for d in self.forecast_array if d.month == month and d.day == day]
-        for txn in month_transactions:
-            balance += txn.amount
-        return balance
+        return self.ledger.getMonthDayBalance(month, day)
 
     def getMonthBalance2(self, month) -> float:
         """
@@ -242,7 +313,7 @@ class Account:
         :return:
         """
         balance = 0
-        month_transactions = [d for d in self.forecast_array if d.month == month]
+        month_transactions = self.ledger.getMonth(month)
         for txn in month_transactions:
             print(txn.account,",",txn.month,",",txn.day,",",txn.amount)
             balance += txn.amount
@@ -254,7 +325,7 @@ class Account:
         :return:
         """
         results = []
-        for i in range(1, 13):
+        for i in range(1, self.getLastMonth() + 1):
             balance = self.getMonthBalance(i)
             if (balance < 0):
                 results.append({"month": i, "balance": balance})
@@ -266,7 +337,4 @@ class Account:
         :param month:
         :return:
         """
-        balance = 0
-        for days in range(1, month + 1):
-            balance += self.getMonthBalance(days)
-        return balance
+        return self.ledger.getBalance(1, month)
@@ -1,10 +1,11 @@
 from BudgetMe.Budget import Budget
+from BudgetMe.BudgetMeHtmlPlugIn import BudgetMeHtml
 
 class B2022():
 
     @staticmethod
     def run() -> Budget:
-        budget = Budget(2022, daysof=2, start=10, end=12)
+        budget = BudgetMeHtml(2022, daysof=2, start=10, end=12)
         budget.addBank("BoA Checking")
         budget.addBank("BoA Savings")
         budget.addBank("PayPal")
@@ -0,0 +1,83 @@
+class BalanceCache:
+    """
+    Memoized balances of a Budget.
+    Entries are grouped by kind so a change can drop exactly the months, categories and accounts it touches.
+    """
+
+    KINDS = ["month", "day", "running", "final", "category", "account", "matrix", "yearly", "totals"]
+
+    def __init__(self):
+        self.entries = {kind: {} for kind in self.KINDS}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(self, kind, key, compute):
+        """
+        Returns a cached value, computing and storing it on a miss.
+        :param kind: Kind of balance (one of KINDS).
+        :param key: Key of the balance inside its kind.
+        :param compute: Function without parameters that computes the value.
+        :return: The value.
+        """
+        entries = self.entries[kind]
+        if key in entries:
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        value = compute()
+        entries[key] = value
+        return value
+
+    def clear(self):
+        """
+        Drops every cached balance.
+        :return: None
+        """
+        for entries in self.entries.values():
+            entries.clear()
+        self.invalidations += 1
+
+    def invalidate(self, first_month, last_month, categories=(), accounts=()):
+        """
+        Drops the balances affected by a change of some accounts between two months.
+        :param first_month: First month changed.
+        :param last_month: Last month changed.
+        :param categories: Categories of the changed accounts.
+        :param accounts: Names of the changed accounts and of their parents.
+        :return: None
+        """
+        entries = self.entries
+        for month in [m for m in entries["month"] if first_month <= m <= last_month]:
+            del entries["month"][month]
+        for key in [k for k in entries["day"] if first_month <= k[0] <= last_month]:
+            del entries["day"][key]
+        for month in [m for m in entries["running"] if m >= first_month]:
+            del entries["running"][month]
+        if last_month >= 1:
+            entries["final"].clear()
+        for category in categories:
+            entries["category"].pop(category, None)
+        for account in accounts:
+            entries["account"].pop(account, None)
+        entries["matrix"].clear()
+        entries["yearly"].clear()
+        entries["totals"].clear()
+        self.invalidations += 1
+
+    def copy(self) -> "BalanceCache":
+        """
+        Returns a cache with the same balances and fresh counters.
+        :return: BalanceCache
+        """
+        cache = BalanceCache()
+        cache.entries = {kind: dict(entries) for kind, entries in self.entries.items()}
+        return cache
+
+    def stats(self) -> dict:
+        """
+        Returns the hit and miss counters of the cache.
+        :return: dict
+        """
+        return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                "entries": sum(len(entries) for entries in self.entries.values())}
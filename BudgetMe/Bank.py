@@ -1,17 +1,130 @@
+from itertools import accumulate
+
 from BudgetMe.Forecast import Forecast
+from BudgetMe.Ledger import Ledger
 
 class Bank(object):
     """
     Basic bank object.
+    Besides its balance, a bank keeps a timeline: a Ledger with the amounts that moved on each month and day, and
+    the running balance at the end of each of them, computed once after every change.
     """
     def __init__(self, name, initial_balance=0):
         self.name = name
         self.balance = initial_balance
-        self.transactions = []
+        self.opening_balance = initial_balance
+        self.transaction_list = []
+        self.transaction_loader = None
+        self.ledger = Ledger(account=name)
+        self.running = None
+        self.timeline_accounts = None
+
+    @property
+    def transactions(self) -> list:
+        """
+        Transactions of the bank. When the bank comes from a snapshot they are read on first use.
+        :return: list
+        """
+        if self.transaction_loader is not None:
+            self.transaction_list = self.transaction_loader()
+            self.transaction_loader = None
+        return self.transaction_list
+
+    @transactions.setter
+    def transactions(self, transactions):
+        self.transaction_list = transactions
+        self.transaction_loader = None
 
     def addTransaction(self, txn:Forecast):
+        # A timeline still to be rebuilt takes its opening balance from the balance before this change.
+        self.getLedger()
         self.balance += txn.amount
         self.transactions.append({"id": txn.id, "amount": txn.amount})
+        self.addToTimeline(txn.month, txn.day, txn.amount)
+
+    def correctTransaction(self, month, day, difference):
+        """
+        Applies the change of amount of a transaction of an account of the bank.
+        :param month: Month of the transaction.
+        :param day: Ordinal day of the transaction.
+        :param difference: New amount minus the previous one.
+        :return: None
+        """
+        self.getLedger()
+        self.balance += difference
+        self.addToTimeline(month, day, difference)
+
+    def addToTimeline(self, month, day, amount):
+        """
+        Adds an amount to the month and day of the timeline.
+        :param month: Month of the movement.
+        :param day: Ordinal day of the movement.
+        :param amount: Amount that moved.
+        :return: None
+        """
+        self.getLedger().add(month, day, amount)
+        self.running = None
+
+    def getLedger(self) -> Ledger:
+        """
+        Returns the timeline of the bank. A bank loaded from a file rebuilds it here, on first use, from the
+        accounts of the bank; what they do not explain is taken as the opening balance.
+        :return: Ledger
+        """
+        if self.timeline_accounts is not None:
+            accounts = self.timeline_accounts
+            self.timeline_accounts = None
+            self.ledger.clear()
+            for account in accounts:
+                ledger = account.ledger
+                for index in ledger.indexes():
+                    if ledger.amounts[index] != 0:
+                        month, day = ledger.position(index)
+                        self.ledger.add(month, day, ledger.amounts[index])
+            self.opening_balance = self.balance - sum(self.ledger.amounts)
+            self.running = None
+        return self.ledger
+
+    def getRunningBalances(self) -> list:
+        """
+        Returns the balance of the bank at the end of every cell of its timeline, in month and day order.
+        :return: list
+        """
+        if self.running is None:
+            self.running = list(accumulate([self.opening_balance] + self.getLedger().amounts))[1:]
+        return self.running
+
+    def getBalanceAt(self, month, day=None) -> float:
+        """
+        Returns the balance of the bank at the end of a day, or of a month when no day is given.
+        Constant time once the running balances are computed.
+        :param month: Month to query.
+        :param day: Ordinal day to query.
+        :return: float
+        """
+        ledger = self.getLedger()
+        if ledger.periods == 0 or month < ledger.first:
+            return self.opening_balance
+        running = self.getRunningBalances()
+        if month > ledger.last():
+            return running[-1]
+        day = ledger.daysof if day is None else max(1, min(day, ledger.daysof))
+        return running[(month - ledger.first) * ledger.daysof + day - 1]
+
+    def copy(self) -> "Bank":
+        """
+        Returns a bank with the same balance and its own copy of the timeline and of the list of transactions.
+        :return: Bank
+        """
+        bank = Bank(name=self.name, initial_balance=self.balance)
+        bank.ledger = self.getLedger().copy()
+        bank.opening_balance = self.opening_balance
+        bank.running = self.running
+        if self.transaction_loader is not None:
+            bank.transaction_loader = self.transaction_loader
+        else:
+            bank.transaction_list = list(self.transaction_list)
+        return bank
 
     def asdict(self):
-        return {"name": self.name, "balance": self.balance, "transactions": self.transactions}
\ No newline at end of file
+        return {"name": self.name, "balance": self.balance, "transactions": self.transactions}
@@ -1,9 +1,17 @@
-import xlsxwriter
+import calendar
+import copy
+import weakref
+from itertools import accumulate
 
 from BudgetMe.Account import Account
+from BudgetMe.BalanceCache import BalanceCache
 from BudgetMe.Bank import Bank
 from BudgetMe.Forecast import Forecast
 from BudgetMe.BudgetException import *
+from BudgetMe.BudgetJson import BudgetJson
+from BudgetMe.BudgetJsonStream import BudgetJsonStream
+from BudgetMe.BudgetSnapshot import BudgetSnapshot
+from BudgetMe.VersionedList import VersionedList
 
 
 class Budget:
@@ -20,12 +28,51 @@ class Budget:
         self.template = {}
         self.start: int = start
         self.end: int = end
+        self.account_index = {}
+        self.parent_index = {}
+        self.position_index = {}
+        self.bank_index = {}
+        self.indexed_accounts = 0
+        self.indexed_banks = 0
+        self.cache = BalanceCache()
+        self.version = 0
+        self.shared = None
 
-    def asdict(self) -> dict:
+    @property
+    def transactions(self) -> VersionedList:
+        """
+        Accounts of the Budget. Any list assigned is kept as a VersionedList, so the lookup indexes follow its changes.
+        :return: VersionedList
+        """
+        return self.account_list
+
+    @transactions.setter
+    def transactions(self, accounts):
+        self.account_list = accounts if isinstance(accounts, VersionedList) else VersionedList(accounts)
+        self.indexed_accounts = None
+
+    @property
+    def banks(self) -> VersionedList:
+        """
+        Banks of the Budget, kept as a VersionedList like the accounts.
+        :return: VersionedList
+        """
+        return self.bank_list
+
+    @banks.setter
+    def banks(self, banks):
+        self.bank_list = banks if isinstance(banks, VersionedList) else VersionedList(banks)
+        self.indexed_banks = None
+
+    def asdict(self, schema=1) -> dict:
         """
         Converts the class structure into a dictionary.
+        :param schema: 1 for one dictionary per Forecast and a copy of the bank inside each account, 2 for the
+        normalized form (see BudgetJson), where banks are stored once and transactions as columns.
         :return: dict
         """
+        if (schema == 2):
+            return BudgetJson.asdict(self)
         transactions = []
         banks = []
         for txn in self.transactions:
@@ -35,7 +82,20 @@ class Budget:
         return {"year": self.year, "daysof": self.daysof, "transactions": transactions, "banks": banks,
                 "days_labels": self.days_labels, "template": self.template, "start": self.start, "end": self.end}
 
-    def addAccount(self, name, days, category="", frequency=1, start=1, end=12, bank="", periodical=False,
+    def getTemplateWithoutTransactions(self) -> dict:
+        """
+        Returns the template of the Budget without the transactions of its account and bank, which are not
+        needed to add accounts.
+        :return: dict
+        """
+        template = dict(self.template)
+        if ("forecast_array" in template):
+            template["forecast_array"] = []
+        if (isinstance(template.get("bank"), dict) and "transactions" in template["bank"]):
+            template["bank"] = dict(template["bank"], transactions=[])
+        return template
+
+    def addAccount(self, name, days, category="", frequency=1, start=1, end=None, bank="", periodical=False,
                    txn_mode="Required", use_last=False, parent=None) -> Account:
         """
         Adds an account to the Budget
@@ -43,8 +103,9 @@ class Budget:
         :param days: Days of transactions in the form of an array. The array size has to be the same size of the parameter 'daysof' of the Account.
         :param category: The category where to put the Account.
         :param frequency: How frequent in months the transaction happens. Default is 1.
-        :param start: Month where the transactions start.
-        :param end: Month where the transactions end.
+        :param start: Month where the transactions start. Either a month number or a (year, month) tuple.
+        :param end: Month where the transactions end. Either a month number or a (year, month) tuple. Defaults to
+        December, or to the end of the Budget when it spans more than one year.
         :param bank: Name of the bank where the money comes or goes.
         :param periodical: Boolean to identify if the transactions happens periodically.
         :param parent: String with the name of the parent transaction name.
@@ -60,19 +121,25 @@ class Budget:
             bank = self.template['bank']
             periodical = self.template['periodical']
             txn_mode = self.template['txn_mode']
+        if (end is None):
+            end = max(12, self.end)
+        start = self.getMonthNumber(start)
+        end = self.getMonthNumber(end)
         if (type(days) != list):
             days_array = []
             days_array.append(days)
             days = days_array
         if (len(days) != self.daysof):
             raise Exception("All accounts must have the number of days associated during creation.")
-        bank_instance = self.getBank(name=bank)
+        bank_instance = self.ownBank(self.getBank(name=bank))
         account = Account(account=name, year=self.year, category=category, frequency=frequency, start=start,
                           bank=bank_instance, periodical=periodical, txn_mode=txn_mode, budget_start=self.start,
                           budget_end=self.end, parent=parent)
         account.days = days
         account.init(range_start=start, range_end=end)
         self.transactions.append(account)
+        self.indexAccount(account)
+        self.invalidate(account, account.ledger.first, account.ledger.last())
         self.template = account.asdict()  # Save the basic parameters to be reused and simplify the entries.
         self.template['end'] = end
         return account
@@ -82,7 +149,7 @@ class Budget:
         """
         Creates an account that only has one single transaction in the entire year.
         :param name: Name of the account.
-        :param month: Number of the month where the transaction happens.
+        :param month: Number of the month where the transaction happens, or a (year, month) tuple.
         :param days: Ordinal of the day where the transaction happens.
         :param category: Category of the transaction.
         :param bank: Name of the bank where the money comes or goes.
@@ -97,29 +164,55 @@ class Budget:
             bank = self.template['bank']
             periodical = self.template['periodical']
             txn_mode = self.template['txn_mode']
+        month = self.getMonthNumber(month)
         if (type(days) != list):
             days_array = []
             days_array.append(days)
             days = days_array
         if (len(days) != self.daysof):
             raise Exception("All accounts must have the number of days associated during creation.")
-        bank_instance = self.getBank(name=bank)
+        bank_instance = self.ownBank(self.getBank(name=bank))
         account = Account(account=name, year=self.year, category=category, frequency=1, start=month,
-                          bank=bank_instance, periodical=periodical, txn_mode=txn_mode, parent=parent)
+                          bank=bank_instance, periodical=periodical, txn_mode=txn_mode, budget_end=max(12, self.end),
+                          parent=parent)
         account.days = days
         account.init_single_month(month)
         self.transactions.append(account)
+        self.indexAccount(account)
+        self.invalidate(account, account.ledger.first, account.ledger.last())
         self.template = account.asdict()  # Save the basic parameters to be reused and simplify the entries.
         return account
 
+    def removeAccount(self, account_name):
+        """
+        Removes an account from the Budget, taking its amounts out of its bank.
+        :param account_name: Name of the account.
+        :return: None
+        """
+        account = self.ownAccount(self.getAccount(account_name), ledger=False)
+        if (isinstance(account.bank, Bank)):
+            ledger = account.ledger
+            ids = set()
+            for index in ledger.indexes():
+                ids.add(ledger.view(index).id)
+                if (ledger.amounts[index] != 0):
+                    month, day = ledger.position(index)
+                    account.bank.correctTransaction(month, day, -ledger.amounts[index])
+            account.bank.transactions = [txn for txn in account.bank.transactions if txn["id"] not in ids]
+        self.transactions.remove(account)
+        self.refreshIndexes()
+
     def getAccountBalance(self, account_name) -> float:
         """
         Gets the balance of an specified Account. If the account has child accounts, the balance is from the child accounts.
         :param account:
         :return: Float
         """
+        return self.cached("account", account_name, lambda: self.computeAccountBalance(account_name))
+
+    def computeAccountBalance(self, account_name) -> float:
         balance = 0
-        accounts = [d for d in self.transactions if d.parent == account_name]
+        accounts = self.getChildAccounts(parent_name=account_name)
         if (len(accounts) > 0):
             for account in accounts:
                 balance += account.getFinalBalance()
@@ -136,7 +229,11 @@ class Budget:
         Gets the child accounts of a parent Account
         :return:
         """
-        return [d for d in self.transactions if d.parent == parent_name]
+        self.refreshIndexes()
+        try:
+            return list(self.parent_index.get(parent_name, []))
+        except TypeError:
+            return []
 
     def getCategories(self) -> list:
         """
@@ -155,11 +252,12 @@ class Budget:
         :param account: Name of the account.
         :param amount: The amount to pay off.
         :param time: The time to pay off the amount.
-        :param start: When to start the payments.
+        :param start: When to start the payments. Either a month number or a (year, month) tuple.
         :param category: Category of the account.
         :param bank: Name of the bank where the money comes.
         :return: None
         """
+        start = self.getMonthNumber(start)
         monthly_payment = round(amount / time, 2)
         days = []
         days.append(monthly_payment)
@@ -179,24 +277,132 @@ class Budget:
             result[category] = self.getTotalBalanceByCategory(category)
         return result
 
+    def getBankBalanceAt(self, bank_name, month, day=None) -> float:
+        """
+        Returns the balance of a bank at the end of a day, or of a month when no day is given.
+        :param bank_name: Name of the bank.
+        :param month: Month to query.
+        :param day: Ordinal day to query.
+        :return: float
+        """
+        bank = self.getBank(bank_name)
+        if (bank is None):
+            raise BudgetAccountNotFound("Bank %s not found." % bank_name)
+        return bank.getBalanceAt(month, day)
+
+    def getBankTimelines(self) -> dict:
+        """
+        Returns the balance of every bank at the end of every day of the Budget, from start to end, computed with
+        one cumulative sum over all the banks. Requires numpy.
+        :return: Dictionary with the periods, as (month, day) tuples, and the balances of each bank, as numpy arrays.
+        """
+        import numpy as np
+        periods = [(month, day) for month in range(self.start, self.end + 1) for day in range(1, self.daysof + 1)]
+        if (len(self.banks) == 0):
+            return {"periods": periods, "banks": {}}
+        ledgers = [bank.getLedger() for bank in self.banks]
+        used = [ledger for ledger in ledgers if ledger.periods > 0]
+        first = min([self.start] + [ledger.first for ledger in used])
+        last = max([self.end] + [ledger.last() for ledger in used])
+        daysof = max([self.daysof] + [ledger.daysof for ledger in used])
+        amounts = np.zeros((len(ledgers), last - first + 1, daysof))
+        for row, ledger in enumerate(ledgers):
+            if (ledger.periods > 0):
+                offset = ledger.first - first
+                amounts[row, offset:offset + ledger.periods, :ledger.daysof] = np.asarray(
+                    ledger.amounts, dtype=float).reshape(ledger.periods, ledger.daysof)
+        opening = np.array([bank.opening_balance for bank in self.banks], dtype=float)
+        # Days of a month beyond the days of the Budget are added into its last day.
+        if (daysof > self.daysof):
+            amounts[:, :, self.daysof - 1] += amounts[:, :, self.daysof:].sum(axis=2)
+            amounts = amounts[:, :, :self.daysof]
+        running = np.cumsum(amounts.reshape(len(ledgers), -1), axis=1) + opening[:, None]
+        start = (self.start - first) * self.daysof
+        running = running[:, start:start + len(periods)]
+        return {"periods": periods, "banks": {bank.name: running[row] for row, bank in enumerate(self.banks)}}
+
+    def restoreBankTimelines(self):
+        """
+        Has every bank rebuild its timeline from its accounts on first use. Called after loading a Budget from a
+        file, which stores the balance of the banks but not their timelines.
+        :return: None
+        """
+        for bank in self.banks:
+            bank.timeline_accounts = []
+        for account in self.transactions:
+            if (isinstance(account.bank, Bank)):
+                if (account.bank.timeline_accounts is None):
+                    account.bank.timeline_accounts = []
+                account.bank.timeline_accounts.append(account)
+
     def getFinalBalance(self) -> float:
         """
         Returns the final balance from all the accounts.
         :return:
         """
+        return self.cached("final", None, self.computeFinalBalance)
+
+    def computeFinalBalance(self) -> float:
         balance = 0.0
         for txn in self.transactions:
             balance += txn.getFinalBalance()
         return balance
 
+    def getRunningBalances(self) -> list:
+        """
+        Returns the running balance of every month from the start to the end of the Budget, in a single pass over
+        the monthly balances.
+        :return: list
+        """
+        balances = []
+        balance = 0.0
+        for month in range(1, self.end + 1):
+            balance += self.getMonthBalance(month)
+            if (month >= self.start):
+                balances.append(balance)
+        return balances
+
+    def compareRunningBalances(self, forks) -> dict:
+        """
+        Returns the running balances of the Budget and of some of its forks (see fork) side by side, for the months
+        of the Budget. A fork is computed from the Budget and the accounts whose ledger is not shared between both,
+        so comparing many forks costs as much as the accounts they changed, not as the whole Budget each time.
+        :param forks: Dictionary with a name for each fork.
+        :return: Dictionary with the months, the running balances of the Budget in 'base' and those of each fork in
+        'forks', by name.
+        """
+        base = self.getRunningBalances()
+        first = max(self.start, 1)
+        ledgers = {id(account.ledger): account.ledger for account in self.transactions}
+        running = {}
+
+        def getLedgerRunning(ledger):
+            if (id(ledger) not in running):
+                running[id(ledger)] = list(accumulate([ledger.getBalance(1, first - 1)] +
+                                                      list(ledger.getMonthBalances(first, self.end))))[1:]
+            return running[id(ledger)]
+
+        result = {}
+        for name, fork in forks.items():
+            fork_ledgers = {id(account.ledger): account.ledger for account in fork.transactions}
+            balances = list(base)
+            for key, ledger in fork_ledgers.items():
+                if (key not in ledgers):
+                    balances = [balance + amount for balance, amount in zip(balances, getLedgerRunning(ledger))]
+            for key, ledger in ledgers.items():
+                if (key not in fork_ledgers):
+                    balances = [balance - amount for balance, amount in zip(balances, getLedgerRunning(ledger))]
+            result[name] = balances
+        return {"months": list(range(first, self.end + 1)), "base": base, "forks": result}
+
     def detectNegativeBalance(self) -> dict:
         """
         Detects and returns if the first month that will end up with negative balance.
         :return:
         """
         result = {"month": 0, "balance": 0}
-        for month in range(1, 13):
-            balance = self.getRunningBalance(month)
+        first = max(self.start, 1)
+        for month, balance in enumerate(self.getRunningBalances(), start=first):
             if (balance < 0):
                 result = {"month": month, "balance": balance}
                 break
@@ -205,16 +411,80 @@ class Budget:
     def preventNegativeBalance(self, account_name="Negative protection"):
         """
         Creates transactions to avoid ending in negative balances,
+        Starting on the first negative month, each month gets the amount needed to bring the next negative running
+        balance back to zero. All the amounts come from one sweep over the running balances.
         :param account_name: Name of the account.
         :return:
         """
-        analysis = self.detectNegativeBalance()
-        self.addAccount(account_name, days=0)
-        month_start = analysis['month']
-        for month in range(month_start, 13):
-            negative_analysis = self.detectNegativeBalance()
-            if (negative_analysis['balance'] < 0):
-                self.updateTransaction("Negative protection", month, 1, negative_analysis['balance'] * -1)
+        first = max(self.start, 1)
+        balances = self.getRunningBalances()
+        self.addAccount(account_name, days=[0] * self.daysof)
+        updates = []
+        added = 0.0
+        negative = 0
+        while (negative < len(balances) and balances[negative] >= 0):
+            negative += 1
+        for month in range(first + negative, self.end + 1):
+            # Months up to the last one protected are already at zero or more, so the search only moves forward.
+            while (negative < len(balances) and balances[negative] + added >= 0):
+                negative += 1
+            if (negative == len(balances)):
+                break
+            top_up = (balances[negative] + added) * -1
+            updates.append((account_name, month, 1, top_up))
+            added += top_up
+        self.updateTransactions(updates)
+
+    def simulate(self, distributions, scenarios=10000, seed=None, workers=None, batch=10000) -> dict:
+        """
+        Runs a Monte Carlo simulation of the running balances, varying the accounts with a distribution (see
+        BudgetSimulation). Requires numpy.
+        This is the probabilistic version of detectNegativeBalance: for each month it returns the probability of a
+        negative running balance, besides the mean and the percentiles 5, 25, 50, 75 and 95.
+        :param distributions: Dictionary with the names of the accounts and their distributions, like
+        {"Groceries": {"distribution": "normal", "stdev": 0.15}}.
+        :param scenarios: Number of scenarios.
+        :param seed: Seed of the random numbers.
+        :param workers: Number of processes. Defaults to the number of CPUs.
+        :param batch: Maximum number of scenarios sampled together.
+        :return: dict
+        """
+        from BudgetMe.BudgetSimulation import BudgetSimulation
+        return BudgetSimulation(self, distributions).run(scenarios=scenarios, seed=seed, workers=workers,
+                                                         batch=batch)
+
+    def importStatement(self, source, rules, unmatched=None, **options) -> dict:
+        """
+        Imports a bank statement as the actual amounts of the transactions, and confirms them (see BudgetImport).
+        Files ending in .ofx or .qfx are read as OFX, any other as CSV.
+        :param source: Path of the statement.
+        :param rules: List of (pattern, account name) matched against the descriptions of the rows.
+        :param unmatched: Text stream where the rows that were not imported are written as CSV.
+        :param options: Options of BudgetImport.importCsv or BudgetImport.importOfx, like columns or date_format.
+        :return: Report of the import.
+        """
+        from BudgetMe.BudgetImport import BudgetImport
+        importer = BudgetImport(self, rules)
+        if str(source).lower().endswith((".ofx", ".qfx")):
+            return importer.importOfx(source, unmatched=unmatched, **options)
+        return importer.importCsv(source, unmatched=unmatched, **options)
+
+    def reconcile(self, transactions, amount_tolerance=0.0, relative_tolerance=0.0, day_tolerance=0, confirm=True,
+                  update=True) -> dict:
+        """
+        Matches actual bank transactions with the open (unconfirmed) forecasts and confirms the matches (see
+        BudgetReconcile).
+        :param transactions: Iterable of (bank name, date, amount). The date is a date or a (month, day) tuple.
+        :param amount_tolerance: Largest difference of amount of a match.
+        :param relative_tolerance: Largest difference of amount of a match, as a fraction of the amount.
+        :param day_tolerance: Largest number of ordinal days between a transaction and its forecast.
+        :param confirm: False to only report the matches.
+        :param update: True to also set the amount of the matched forecasts to the actual amount.
+        :return: Match report, with the confidence of each match.
+        """
+        from BudgetMe.BudgetReconcile import BudgetReconcile
+        return BudgetReconcile(self, amount_tolerance=amount_tolerance, relative_tolerance=relative_tolerance,
+                               day_tolerance=day_tolerance).reconcile(transactions, confirm=confirm, update=update)
 
     def calcualtePotentialSavings(self) -> float:
         """
@@ -232,8 +502,10 @@ class Budget:
         """
         Updates the balances of the transactions.
         """
-        for row in self.transactions:
-            row.balance = round(self.getAccountBalance(row.name),2)
+        for row in list(self.transactions):
+            balance = round(self.getAccountBalance(row.name),2)
+            if (row.balance != balance):
+                self.ownAccount(row, ledger=False).balance = balance
 
     def getRunningBalance(self, month) -> float:
         """
@@ -241,6 +513,9 @@ class Budget:
         :param month:
         :return:
         """
+        return self.cached("running", month, lambda: self.computeRunningBalance(month))
+
+    def computeRunningBalance(self, month) -> float:
         balance = 0.0
         for txn in self.transactions:
             balance += txn.getRunningBalance(month)
@@ -252,6 +527,9 @@ class Budget:
         :param month: Month to query.
         :return:
         """
+        return self.cached("month", month, lambda: self.computeMonthBalance(month))
+
+    def computeMonthBalance(self, month) -> float:
         balance = 0
         for account in self.transactions:
             balance += account.getMonthBalance(month)
@@ -263,6 +541,9 @@ class Budget:
         :param month: Month to query.
         :return:
         """
+        return self.cached("day", (month, day), lambda: self.computeMonthDayBalance(month, day))
+
+    def computeMonthDayBalance(self, month, day) -> float:
         balance = 0
         for account in self.transactions:
             balance += account.getMonthDayBalance(month,day)
@@ -279,6 +560,15 @@ class Budget:
             balance += account.getMonthBalance2(month)
         return balance
 
+    def getMatrix(self):
+        """
+        Stacks all the accounts into a BudgetMatrix to answer aggregates with vectorized reductions. Requires numpy.
+        The matrix is a snapshot, rebuilt after the Budget changes.
+        :return: BudgetMatrix
+        """
+        from BudgetMe.BudgetMatrix import BudgetMatrix
+        return self.cached("matrix", None, lambda: BudgetMatrix(self))
+
     def getVarianceForMonth(self, account: str, month: int) -> float:
         """
         Gets the deviation (Forecasted vs Actual) of the month.
@@ -297,6 +587,9 @@ class Budget:
         :param category: Name of the category.
         :return: Balance of the category at the end of the year.
         """
+        return self.cached("category", category, lambda: self.computeTotalBalanceByCategory(category))
+
+    def computeTotalBalanceByCategory(self, category) -> float:
         transactions = [d for d in self.transactions if d.category == category]
         balance = 0
         for transaction in transactions:
@@ -309,22 +602,109 @@ class Budget:
         :param account_name: Name of the Account
         :return: Account
         """
+        self.refreshIndexes()
         try:
-            return [d for d in self.transactions if d.name == account_name][0]
-        except:
+            return self.account_index[account_name]
+        except (KeyError, TypeError):
             raise BudgetAccountNotFound("Account %s not found." % account_name)
 
     def getMonthName(self, month_number):
         """
         Transaltes ordinals in names of months in english.
+        Months after the first year also carry their year, like "JAN 2023".
         :param month_number: Number of the month.
         :return: Name of the month in a 3 letter abbreviation.
         """
         months = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
-        if (month_number < 1 or month_number > 12):
-            raise Exception("Month must be between 1 and 12.")
+        if (month_number < 1):
+            raise Exception("Month must be 1 or greater.")
+        if (month_number > 12):
+            year, month = self.getPeriod(month_number)
+            return "%s %s" % (months[month - 1], year)
         return months[month_number - 1]
 
+    def getPeriod(self, month_number) -> tuple:
+        """
+        Translates a month number of the Budget into its calendar year and month. Month 13 is January of the year
+        after the Budget year.
+        :param month_number: Number of the month.
+        :return: Tuple (year, month)
+        """
+        return self.year + (month_number - 1) // 12, (month_number - 1) % 12 + 1
+
+    def getMonthNumber(self, period) -> int:
+        """
+        Translates a (year, month) period into the month number of the Budget. Numbers are returned as they are.
+        :param period: Tuple (year, month) or month number.
+        :return: int
+        """
+        if (type(period) in (tuple, list)):
+            year, month = period
+            if (month < 1 or month > 12):
+                raise Exception("Month must be between 1 and 12.")
+            return (year - self.year) * 12 + month
+        return period
+
+    def getMonthDay(self, day) -> tuple:
+        """
+        Translates a calendar date into the month number and the ordinal day of the Budget. The days of the month are
+        split evenly in 'daysof' parts: with daysof=2, the 1st to the 15th of a 30 day month are day 1.
+        :param day: date or datetime.
+        :return: Tuple (month, day)
+        """
+        days = calendar.monthrange(day.year, day.month)[1]
+        return self.getMonthNumber((day.year, day.month)), min(self.daysof, (day.day - 1) * self.daysof // days + 1)
+
+    def getPeriodTotals(self) -> dict:
+        """
+        Returns the month, day and running balances of every month up to the end of the Budget, computed in one pass
+        over the accounts. The values are the same getMonthBalance, getMonthDayBalance and getRunningBalance return.
+        :return: Dictionary with "month" and "running" keyed by month, and "day" keyed by (month, day).
+        """
+        return self.cached("totals", None, self.computePeriodTotals)
+
+    def computePeriodTotals(self) -> dict:
+        months = range(1, self.end + 1)
+        month_totals = {month: 0 for month in months}
+        day_totals = {(month, day): 0 for month in months for day in range(1, self.daysof + 1)}
+        running_totals = {month: 0.0 for month in months}
+        for account in self.transactions:
+            ledger = account.ledger
+            running = 0
+            for month in months:
+                balance = ledger.getMonthBalance(month)
+                month_totals[month] += balance
+                running += balance
+                running_totals[month] += running
+                for day in range(1, self.daysof + 1):
+                    day_totals[(month, day)] += ledger.getMonthDayBalance(month, day)
+        return {"month": month_totals, "day": day_totals, "running": running_totals}
+
+    def getYearlySummaries(self) -> list:
+        """
+        Summarizes each calendar year of the Budget: its months, the balance of those months and the running
+        balance at the end of the year. Computed in one pass and kept until the Budget changes.
+        :return: list of dictionaries, one per year.
+        """
+        return self.cached("yearly", None, self.computeYearlySummaries)
+
+    def computeYearlySummaries(self) -> list:
+        summaries = []
+        running = 0.0
+        for month in range(1, self.end + 1):
+            balance = self.getMonthBalance(month)
+            running += balance
+            if (month < self.start):
+                continue
+            year, _ = self.getPeriod(month)
+            if (not summaries or summaries[-1]["year"] != year):
+                summaries.append({"year": year, "first": month, "last": month, "balance": 0.0, "running": 0.0})
+            summary = summaries[-1]
+            summary["last"] = month
+            summary["balance"] += balance
+            summary["running"] = running
+        return summaries
+
     def updateTransaction(self, account_name, month, day, amount):
         """
         Updates a transaction in an account.
@@ -334,7 +714,9 @@ class Budget:
         :param amount: Amount to update.
         :return: None
         """
-        self.getAccount(account_name=account_name).correctTransaction(month, day, amount)
+        account = self.ownAccount(self.getAccount(account_name=account_name))
+        account.correctTransaction(month, day, amount)
+        self.invalidate(account, month, month)
 
     def updatePreviousBalance(self, account_name, month, day, previous):
         """
@@ -345,7 +727,8 @@ class Budget:
         :param amount: Amount to update.
         :return: None
         """
-        self.getAccount(account_name=account_name).correctPreviousBalance(month, day, previous)
+        self.ownAccount(self.getAccount(account_name=account_name)).correctPreviousBalance(month, day, previous)
+        self.touch()
 
     def confirmTransaction(self, account_name, month, day):
         """
@@ -356,7 +739,8 @@ class Budget:
         :param amount: Amount to update.
         :return: None
         """
-        self.getAccount(account_name=account_name).confirmTransaction(month, day)
+        self.ownAccount(self.getAccount(account_name=account_name)).confirmTransaction(month, day)
+        self.touch()
 
     def removeConfirmTransaction(self, account_name, month, day):
         """
@@ -367,7 +751,64 @@ class Budget:
         :param amount: Amount to update.
         :return: None
         """
-        self.getAccount(account_name=account_name).removeConfirmTransaction(month, day)
+        self.ownAccount(self.getAccount(account_name=account_name)).removeConfirmTransaction(month, day)
+        self.touch()
+
+    def updateTransactions(self, updates) -> dict:
+        """
+        Updates many transactions at once, like calling updateTransaction for each of them.
+        :param updates: Iterable of (account_name, month, day, amount).
+        :return: Summary of the changes (see applyByAccount).
+        """
+        return self.applyByAccount(updates, Account.correctTransactions, changes_balances=True)
+
+    def confirmTransactions(self, confirmations) -> dict:
+        """
+        Confirms many transactions at once, like calling confirmTransaction for each of them.
+        An optional fourth value set to False removes the confirmation instead.
+        :param confirmations: Iterable of (account_name, month, day) or (account_name, month, day, confirmed).
+        :return: Summary of the changes (see applyByAccount).
+        """
+        rows = ((row[0], row[1], row[2], row[3] if len(row) > 3 else True) for row in confirmations)
+        return self.applyByAccount(rows, Account.confirmTransactions)
+
+    def updatePreviousBalances(self, updates) -> dict:
+        """
+        Updates the previous balance of many transactions at once, like calling updatePreviousBalance for each of them.
+        :param updates: Iterable of (account_name, month, day, previous).
+        :return: Summary of the changes (see applyByAccount).
+        """
+        return self.applyByAccount(updates, Account.correctPreviousBalances)
+
+    def applyByAccount(self, rows, apply, changes_balances=False) -> dict:
+        """
+        Groups (account_name, month, day, value) rows by account and hands each group to an Account batch method.
+        Every account and transaction is looked up before anything changes, so an unknown one leaves the Budget
+        untouched.
+        :param rows: Iterable of (account_name, month, day, value).
+        :param apply: Account method receiving the account and its (month, day, value) rows.
+        :param changes_balances: True if the method changes amounts, so the cached balances of the months are dropped.
+        :return: Dictionary with the rows received, the transactions changed and the changes by account.
+        """
+        groups = {}
+        received = 0
+        for account_name, month, day, value in rows:
+            if (account_name not in groups):
+                groups[account_name] = (self.getAccount(account_name=account_name), [])
+            account, cells = groups[account_name]
+            account.ledger.index(month, day)
+            cells.append((month, day, value))
+            received += 1
+        accounts = {}
+        for account_name, (account, cells) in groups.items():
+            account = self.ownAccount(self.getAccount(account_name=account_name))
+            accounts[account_name] = apply(account, cells)
+            if (accounts[account_name] > 0 and changes_balances):
+                months = [cell[0] for cell in cells]
+                self.invalidate(account, min(months), max(months))
+        if (received > 0):
+            self.touch()
+        return {"received": received, "changed": sum(accounts.values()), "accounts": accounts}
 
     def formatCurrency(self, number) -> str:
         """
@@ -391,7 +832,8 @@ class Budget:
         :return: None
         """
         txn = Forecast(1, 1, -1 * self.getAccount(from_account).getFinalBalance())
-        self.getBank(to_bank).addTransaction(txn)
+        self.ownBank(self.getBank(to_bank)).addTransaction(txn)
+        self.touch()
 
     def addBank(self, name):
         """
@@ -399,7 +841,10 @@ class Budget:
         :param name: Name of the bank
         :return:
         """
-        self.banks.append(Bank(name=name))
+        bank = Bank(name=name)
+        self.banks.append(bank)
+        self.indexBank(bank)
+        self.touch()
 
     def getBank(self, name) -> Bank:
         """
@@ -407,11 +852,243 @@ class Budget:
         :param name: Bank name
         :return:
         """
+        self.refreshIndexes()
         try:
-            return [d for d in self.banks if d.name == name][0]
-        except:
+            return self.bank_index.get(name)
+        except TypeError:
             return None
 
+    def indexAccount(self, account: Account, position=None):
+        """
+        Adds an account to the lookup indexes. The first account with a name wins, as in a linear search.
+        :param account: Account just appended to the transactions.
+        :param position: Position of the account in the transactions, the last one by default.
+        :return: None
+        """
+        self.account_index.setdefault(account.name, account)
+        self.parent_index.setdefault(account.parent, []).append(account)
+        self.position_index[id(account)] = len(self.transactions) - 1 if position is None else position
+        if (self.indexed_accounts == self.transactions.version - 1):
+            self.indexed_accounts = self.transactions.version
+
+    def indexBank(self, bank: Bank):
+        """
+        Adds a bank to the lookup indexes. The first bank with a name wins, as in a linear search.
+        :param bank: Bank just appended to the banks.
+        :return: None
+        """
+        self.bank_index.setdefault(bank.name, bank)
+        if (self.indexed_banks == self.banks.version - 1):
+            self.indexed_banks = self.banks.version
+
+    def refreshIndexes(self):
+        """
+        Rebuilds the lookup indexes when accounts or banks were added, removed or replaced without going through the
+        Budget. The indexes remember the version of the lists they were built from.
+        :return: None
+        """
+        if (self.indexed_accounts != self.transactions.version):
+            self.invalidate()
+            self.account_index = {}
+            self.parent_index = {}
+            self.position_index = {}
+            self.indexed_accounts = None
+            for position, account in enumerate(self.transactions):
+                self.indexAccount(account, position)
+            self.indexed_accounts = self.transactions.version
+        if (self.indexed_banks != self.banks.version):
+            self.bank_index = {}
+            self.indexed_banks = None
+            for bank in self.banks:
+                self.indexBank(bank)
+            self.indexed_banks = self.banks.version
+
+    def cached(self, kind, key, compute):
+        """
+        Returns a balance from the cache, computing it on a miss.
+        :param kind: Kind of balance (see BalanceCache.KINDS).
+        :param key: Key of the balance inside its kind.
+        :param compute: Function without parameters that computes the balance.
+        :return: The balance.
+        """
+        self.refreshIndexes()
+        return self.cache.lookup(kind, key, compute)
+
+    def invalidate(self, account: Account = None, first_month=None, last_month=None):
+        """
+        Drops the cached balances affected by a change to an account and bumps the version of the Budget.
+        Without an account every cached balance is dropped. Call it after changing an Account directly.
+        :param account: Account that changed.
+        :param first_month: First month that changed.
+        :param last_month: Last month that changed.
+        :return: None
+        """
+        self.version += 1
+        if (account is None):
+            self.cache.clear()
+        else:
+            first_month = 1 if first_month is None else first_month
+            last_month = first_month if last_month is None else last_month
+            self.cache.invalidate(first_month, last_month, categories=[account.category],
+                                  accounts=[account.name, account.parent])
+
+    def touch(self):
+        """
+        Bumps the version of the Budget after a change that does not affect any cached balance.
+        :return: None
+        """
+        self.version += 1
+
+    def getCacheStats(self) -> dict:
+        """
+        Returns the version of the Budget and the hit and miss counters of its balance cache.
+        :return: dict
+        """
+        stats = self.cache.stats()
+        stats["version"] = self.version
+        return stats
+
+    def fork(self) -> "Budget":
+        """
+        Creates a scenario of the Budget to try changes on, like removing an optional account or adding a loan,
+        without touching the Budget. Forking copies no transactions: the fork shares the accounts, ledgers and banks
+        of the Budget, and either of them copies an account, its ledger and its bank the first time it changes them.
+        Balances already cached by the Budget are kept by the fork.
+        Accounts taken with getAccount and changed directly must go through ownAccount first.
+        Called on a subclass (e.g. BudgetMeHtml) it creates an object of that subclass.
+        :return: Budget
+        """
+        self.refreshIndexes()
+        if (self.shared is None):
+            self.shared = weakref.WeakValueDictionary()
+        # Forks of forks share a single dictionary: anything in it may be used by another Budget of the family.
+        # It holds the objects weakly by id, so an object leaves it when no Budget uses it anymore.
+        shared = self.shared
+        for bank in self.banks:
+            shared[id(bank)] = bank
+        for account in self.transactions:
+            shared[id(account)] = account
+            shared[id(account.ledger)] = account.ledger
+            if (isinstance(account.bank, Bank)):
+                shared[id(account.bank)] = account.bank
+        fork = type(self)(self.year, daysof=self.daysof, start=self.start, end=self.end)
+        fork.days_labels = list(self.days_labels)
+        fork.template = self.template
+        fork.transactions = list(self.transactions)
+        fork.banks = list(self.banks)
+        fork.account_index = dict(self.account_index)
+        fork.parent_index = {parent: list(children) for parent, children in self.parent_index.items()}
+        fork.position_index = dict(self.position_index)
+        fork.bank_index = dict(self.bank_index)
+        fork.indexed_accounts = fork.transactions.version
+        fork.indexed_banks = fork.banks.version
+        fork.cache = self.cache.copy()
+        fork.version = self.version
+        fork.shared = shared
+        return fork
+
+    def ownAccount(self, account: Account, ledger=True) -> Account:
+        """
+        Copies what a fork (see fork) shares of an account of the Budget before it changes: the account, its bank
+        and, unless only the attributes of the account change, its ledger.
+        :param account: Account of the Budget.
+        :param ledger: False when the transactions of the account do not change.
+        :return: The Account to change, which replaces the given one in the Budget when it was copied.
+        """
+        if (self.shared is None):
+            return account
+        if (self.isShared(account)):
+            position = self.position_index.get(id(account))
+            if (position is None or position >= len(self.transactions) or self.transactions[position] is not account):
+                position = self.transactions.index(account)
+            account = copy.copy(account)
+            self.replaceAccount(position, account)
+        if (ledger and self.isShared(account.ledger)):
+            account.ledger = account.ledger.copy()
+        self.ownBank(account.bank)
+        return account
+
+    def ownBank(self, bank: Bank) -> Bank:
+        """
+        Copies a bank shared with a fork (see fork) before it changes. The accounts of the bank point to the copy.
+        :param bank: Bank of the Budget, or None.
+        :return: The Bank to change.
+        """
+        if (self.shared is None or not isinstance(bank, Bank) or not self.isShared(bank)):
+            return bank
+        bank_copy = bank.copy()
+        indexed = self.indexed_banks == self.banks.version
+        for position, other in enumerate(self.banks):
+            if (other is bank):
+                self.banks[position] = bank_copy
+        if (self.bank_index.get(bank.name) is bank):
+            self.bank_index[bank.name] = bank_copy
+        if (indexed):
+            self.indexed_banks = self.banks.version
+        for position, account in enumerate(self.transactions):
+            if (account.bank is bank):
+                if (self.isShared(account)):
+                    account = copy.copy(account)
+                    self.replaceAccount(position, account)
+                account.bank = bank_copy
+        return bank_copy
+
+    def isShared(self, item) -> bool:
+        """
+        Tells whether an account, ledger or bank may be used by another Budget of the family of a fork (see fork).
+        :param item: Account, Ledger or Bank.
+        :return: bool
+        """
+        return self.shared is not None and self.shared.get(id(item)) is item
+
+    def replaceAccount(self, position, account: Account):
+        """
+        Puts an account in the place of another one, in the transactions and in the lookup indexes.
+        :param position: Position of the account to replace in the transactions.
+        :param account: The new Account.
+        :return: None
+        """
+        old = self.transactions[position]
+        indexed = self.indexed_accounts == self.transactions.version
+        self.transactions[position] = account
+        if (not indexed or old.name != account.name or old.parent != account.parent):
+            return  # The indexes are rebuilt on the next lookup.
+        self.indexed_accounts = self.transactions.version
+        if (self.account_index.get(old.name) is old):
+            self.account_index[old.name] = account
+        # The children of a parent are in the order of the transactions: find the old account by its position.
+        children = self.parent_index.get(old.parent, [])
+        low, high = 0, len(children)
+        while (low < high):
+            middle = (low + high) // 2
+            if (self.position_index.get(id(children[middle]), -1) < position):
+                low = middle + 1
+            else:
+                high = middle
+        if (low < len(children) and children[low] is old):
+            children[low] = account
+        self.position_index.pop(id(old), None)
+        self.position_index[id(account)] = position
+
+    def saveSnapshot(self, filename):
+        """
+        Saves the Budget in the binary snapshot format (see BudgetSnapshot).
+        :param filename: Name of the file.
+        :return: None
+        """
+        BudgetSnapshot.save(self, filename)
+
+    @classmethod
+    def loadSnapshot(cls, filename):
+        """
+        Opens a Budget saved with saveSnapshot. The file is memory mapped and the transactions are read from it
+        as they are used, so even large budgets open almost instantly. Amounts come back as floats.
+        Called on a subclass (e.g. BudgetMeHtml) it creates an object of that subclass.
+        :param filename: Name of the file.
+        :return: Budget
+        """
+        return BudgetSnapshot.load(filename, cls)
+
     @staticmethod
     def createForecastFromJson(forecast_json: dict) -> Forecast:
         """
@@ -419,8 +1096,12 @@ class Budget:
         :param forecast_json: The json representation of the Forecast
         :return:
         """
-        return Forecast(month=forecast_json['month'], day=forecast_json['day'], amount=forecast_json['amount'],
-                        previous=forecast_json['previous'])
+        forecast = Forecast(month=forecast_json['month'], day=forecast_json['day'], amount=forecast_json['amount'],
+                            previous=forecast_json['previous'])
+        forecast.planned = forecast_json.get('planned', forecast.amount)
+        forecast.confirmed = forecast_json.get('caused', False)
+        forecast.note = forecast_json.get('note', "")
+        return forecast
 
     @staticmethod
     def createBankFromJson(bank_json: dict) -> Bank:
@@ -435,13 +1116,21 @@ class Budget:
         return bank
 
     @staticmethod
-    def createAccountFromJson(account_json: dict) -> Account:
+    def createAccountFromJson(account_json: dict, banks=None) -> Account:
         """
         Creates a new Account object from an Account Dictionary.
         :param account_json: The json representation of the Account
+        :param banks: Banks already created, by name. The Account shares the Bank with the same name instead of
+        creating a copy.
         :return:
         """
-        bank = Budget.createBankFromJson(account_json['bank'])
+        bank_json = account_json['bank']
+        if (banks is not None and bank_json and bank_json.get('name') in banks):
+            bank = banks[bank_json['name']]
+        elif (bank_json):
+            bank = Budget.createBankFromJson(bank_json)
+        else:
+            bank = None
         account = Account(account_json['account'], year=account_json['year'], category=account_json['category'],
                           frequency=account_json['frequency'], start=account_json['start'], bank=bank,
                           periodical=account_json['periodical'], txn_mode=account_json['txn_mode'],
@@ -451,15 +1140,39 @@ class Budget:
             account.forecast_array.append(Budget.createForecastFromJson(forecast))
         return account
 
-    @staticmethod
-    def createBudgetFromJson(budget_json):
+    @classmethod
+    def loadJson(cls, source):
+        """
+        Creates a new Budget from a JSON document (schema 1 or 2) read incrementally from a file or a stream.
+        Each account is built as soon as it is read, so the whole document is never decoded at once.
+        Called on a subclass (e.g. BudgetMeHtml) it creates an object of that subclass.
+        :param source: Path of the file, or a text stream.
+        :return: Budget
+        """
+        return BudgetJsonStream.load(source, cls)
+
+    @classmethod
+    def createBudgetFromJson(cls, budget_json):
         """
-        Creates a new Budget object from an Budget Dictionary.
-        :param account_json: The json representation of the Budget
+        Creates a new Budget object from an Budget Dictionary, either of schema 1 or 2 (see asdict).
+        Accounts of a bank listed in the Budget share that Bank object.
+        Called on a subclass (e.g. BudgetMeHtml) it creates an object of that subclass.
+        :param budget_json: The json representation of the Budget
         :return: Budget
         """
-        budget = Budget(budget_json['year'], daysof=budget_json['daysof'])
+        if (budget_json.get('schema', 1) != 1):
+            return BudgetJson.load(budget_json, cls)
+        budget = cls(budget_json['year'], daysof=budget_json['daysof'], start=budget_json.get('start', 1),
+                     end=budget_json.get('end', 12))
         budget.days_labels = budget_json['days_labels']
-        for account in budget_json['transactions']:
-            budget.transactions.append(Budget.createAccountFromJson(account))
+        budget.template = budget_json.get('template', {})
+        for bank_json in budget_json.get('banks', []):
+            bank = Budget.createBankFromJson(bank_json)
+            budget.banks.append(bank)
+            budget.indexBank(bank)
+        for account_json in budget_json['transactions']:
+            account = Budget.createAccountFromJson(account_json, banks=budget.bank_index)
+            budget.transactions.append(account)
+            budget.indexAccount(account)
+        budget.restoreBankTimelines()
         return budget
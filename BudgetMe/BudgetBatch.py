@@ -0,0 +1,192 @@
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from BudgetMe.BudgetException import BudgetAccountParametersInvalid
+from BudgetMe.BudgetMeExcelPlugIn import BudgetMeExcel
+from BudgetMe.BudgetMeHtmlPlugIn import BudgetMeHtml
+
+# Format: (extension of the output, method of BudgetReport that writes it)
+FORMATS = {"html": ("html", "generateHtmlFile"), "xlsx": ("xlsx", "generateExcelFile")}
+
+
+class BudgetReport(BudgetMeHtml, BudgetMeExcel):
+    """
+    Budget with both the HTML and the Excel reports.
+    """
+
+    def __init__(self, year, daysof=1, start=1, end=12):
+        super(BudgetReport, self).__init__(year, daysof, start, end)
+
+
+class BudgetBatch:
+    """
+    Renders the reports of many budgets in a process pool.
+    Each source is either the path of a budget JSON file (schema 1 or 2) or a builder callable returning a Budget,
+    like B2022.run, optionally paired with the name of its outputs as a (name, source) tuple. Outputs are written to
+    a folder as '<name>.html' and '<name>.xlsx', where the name defaults to the one of the JSON file or the module
+    and qualified name of the builder (see getName). Two sources with the same name are an error. An output newer
+    than its input, the JSON file or the module of the builder, is not rendered again.
+    Sources are sent to the workers in chunks, so a worker renders several budgets per round trip; builders must be
+    importable by the workers (no lambdas or local functions).
+    """
+
+    def __init__(self, output_folder, formats=("html", "xlsx"), workers=None, chunksize=1, force=False):
+        for output_format in formats:
+            if output_format not in FORMATS:
+                raise BudgetAccountParametersInvalid("Format %s must be one of %s." % (output_format, list(FORMATS)))
+        if chunksize < 1:
+            raise BudgetAccountParametersInvalid("Chunk size (%s) must be greater than zero." % chunksize)
+        self.output_folder = output_folder
+        self.formats = list(formats)
+        self.workers = workers
+        self.chunksize = chunksize
+        self.force = force
+
+    def run(self, sources) -> list:
+        """
+        Renders the reports of the sources.
+        :param sources: List of paths of budget JSON files and builder callables, each one optionally in a
+        (name, source) tuple.
+        :return: List with the result of each source, in the same order: its name, the outputs written, the ones
+        skipped because they were up to date, the seconds spent loading and rendering each format, the total seconds
+        and the error, if any.
+        """
+        jobs = []
+        names = set()
+        for source in sources:
+            name, source = source if isinstance(source, tuple) else (BudgetBatch.getName(source), source)
+            # Names that differ only in case are the same file on some file systems.
+            if name.lower() in names:
+                raise BudgetAccountParametersInvalid("Two sources render the same reports (%s)." % name)
+            names.add(name.lower())
+            jobs.append((name, source, self.output_folder, self.formats, self.force))
+        os.makedirs(self.output_folder, exist_ok=True)
+        chunks = [jobs[i:i + self.chunksize] for i in range(0, len(jobs), self.chunksize)]
+        workers = min(self.workers or os.cpu_count() or 1, len(chunks))
+        if workers <= 1:
+            return [result for chunk in chunks for result in renderChunk(chunk)]
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(renderChunk, chunk) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                try:
+                    results.extend(future.result())
+                except Exception as error:
+                    # The chunk did not reach the worker, e.g. a builder that cannot be pickled.
+                    results.extend(getResult(job[0], error="%s: %s" % (type(error).__name__, error))
+                                   for job in chunk)
+        return results
+
+    @staticmethod
+    def getName(source) -> str:
+        """
+        Returns the name of the reports of a source: the name of the JSON file, or the module and qualified name of
+        the builder (e.g. 'BudgetMe.B2022.B2022.run'), with the characters other than letters, digits, '.' and '-'
+        replaced by '_'. Builders without a qualified name, like partials, take the one of their type.
+        :param source: Path of a budget JSON file or builder callable.
+        :return: str
+        """
+        if callable(source):
+            builder = source if hasattr(source, "__qualname__") else type(source)
+            name = "%s.%s" % (getattr(builder, "__module__", None) or "", builder.__qualname__)
+            return re.sub(r"[^\w.-]", "_", name.lstrip("."))
+        return os.path.splitext(os.path.basename(source))[0]
+
+    @staticmethod
+    def getSourceTime(source):
+        """
+        Returns the modification time of the input of a source: the JSON file, or the module of the builder.
+        :param source: Path of a budget JSON file or builder callable.
+        :return: Modification time, or None when it is unknown.
+        """
+        if callable(source):
+            module = sys.modules.get(getattr(source, "__module__", None))
+            path = getattr(module, "__file__", None)
+        else:
+            path = source
+        try:
+            return os.stat(path).st_mtime
+        except (OSError, TypeError):
+            return None
+
+    @staticmethod
+    def summarize(results) -> dict:
+        """
+        Adds up the results of a run.
+        :param results: Results returned by run.
+        :return: Dictionary with the number of budgets, rendered outputs, skipped outputs and failures, and the
+        seconds spent by all of them.
+        """
+        return {"budgets": len(results), "rendered": sum(len(result["outputs"]) for result in results),
+                "skipped": sum(len(result["skipped"]) for result in results),
+                "failed": [result["name"] for result in results if result["error"]],
+                "seconds": sum(result["seconds"] for result in results)}
+
+
+def getResult(name, error=None) -> dict:
+    return {"name": name, "outputs": {}, "skipped": [], "timings": {}, "seconds": 0.0, "error": error}
+
+
+def renderChunk(jobs) -> list:
+    """
+    Renders the reports of a chunk of sources, one after another.
+    :param jobs: List of (name, source, output folder, formats, force).
+    :return: List of results.
+    """
+    return [renderJob(*job) for job in jobs]
+
+
+def renderJob(name, source, output_folder, formats, force) -> dict:
+    """
+    Renders the reports of a source. Errors are kept in the result instead of raised, so one budget failing does
+    not stop the others.
+    :param name: Name of the reports.
+    :param source: Path of a budget JSON file or builder callable.
+    :param output_folder: Folder of the reports.
+    :param formats: Formats to render.
+    :param force: True to render outputs that are up to date.
+    :return: dict
+    """
+    result = getResult(name)
+    started = time.perf_counter()
+    try:
+        source_time = BudgetBatch.getSourceTime(source)
+        pending = []
+        for output_format in formats:
+            path = os.path.join(output_folder, "%s.%s" % (name, FORMATS[output_format][0]))
+            if not force and source_time is not None and os.path.exists(path) and \
+                    os.stat(path).st_mtime > source_time:
+                result["skipped"].append(output_format)
+            else:
+                pending.append((output_format, path))
+        if pending:
+            budget = loadBudget(source, [FORMATS[output_format][1] for output_format, path in pending])
+            result["timings"]["load"] = time.perf_counter() - started
+            for output_format, path in pending:
+                rendering = time.perf_counter()
+                getattr(budget, FORMATS[output_format][1])(path)
+                result["timings"][output_format] = time.perf_counter() - rendering
+                result["outputs"][output_format] = path
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def loadBudget(source, methods):
+    """
+    Loads or builds the Budget of a source, as a BudgetReport when it does not have the report methods.
+    :param source: Path of a budget JSON file or builder callable.
+    :param methods: Names of the report methods needed.
+    :return: Budget
+    """
+    if not callable(source):
+        return BudgetReport.loadJson(source)
+    budget = source()
+    if all(hasattr(budget, method) for method in methods):
+        return budget
+    return BudgetReport.createBudgetFromJson(budget.asdict(schema=2))
@@ -0,0 +1,128 @@
+"""
+Command line interface of BaC: budgetascode check|render|convert.
+Only the standard library is imported here; each subcommand imports what it needs (xlsxwriter only to render
+Excel files), so short jobs start fast.
+"""
+import argparse
+import json
+import sys
+
+SNAPSHOT_EXTENSION = ".snap"
+
+
+class BudgetCli:
+    """
+    Subcommands of the budgetascode command. Each one returns the exit status of the command.
+    """
+
+    @staticmethod
+    def getParser() -> argparse.ArgumentParser:
+        """
+        Builds the parser of the command line.
+        :return: ArgumentParser
+        """
+        parser = argparse.ArgumentParser(prog="budgetascode", description="Budget as Code on budget files: JSON "
+                                         "documents made with Budget.asdict() or snapshots made with saveSnapshot.")
+        subparsers = parser.add_subparsers(dest="command")
+        subparsers.required = True
+        check = subparsers.add_parser("check", help="Reports the first negative running balance and the potential "
+                                                    "savings. Exits with 1 when a budget goes negative.")
+        check.add_argument("budgets", nargs="+", help="Budget files.")
+        check.add_argument("--json", action="store_true", help="Prints the results as JSON.")
+        check.set_defaults(run=BudgetCli.check)
+        render = subparsers.add_parser("render", help="Renders the HTML and Excel reports of budget JSON files.")
+        render.add_argument("budgets", nargs="+", help="Budget JSON files.")
+        render.add_argument("-o", "--output", default=".", help="Folder of the reports. Default: current folder.")
+        render.add_argument("-f", "--format", dest="formats", action="append", choices=["html", "xlsx"],
+                            help="Format to render, can be repeated. Default: html and xlsx.")
+        render.add_argument("-w", "--workers", type=int, default=None, help="Processes. Default: number of CPUs.")
+        render.add_argument("--chunksize", type=int, default=1, help="Budgets sent to a process at a time.")
+        render.add_argument("--force", action="store_true", help="Renders reports newer than their budget too.")
+        render.set_defaults(run=BudgetCli.render)
+        convert = subparsers.add_parser("convert", help="Converts a budget file into JSON (schema 1 or 2) or into "
+                                                        "a snapshot (output ending in %s)." % SNAPSHOT_EXTENSION)
+        convert.add_argument("source", help="Budget file to convert.")
+        convert.add_argument("target", help="File to write.")
+        convert.add_argument("--schema", type=int, choices=[1, 2], default=2, help="JSON schema. Default: 2.")
+        convert.set_defaults(run=BudgetCli.convert)
+        return parser
+
+    @staticmethod
+    def load(path):
+        """
+        Opens a budget file, a snapshot or a JSON document.
+        :param path: Path of the file.
+        :return: Budget
+        """
+        from BudgetMe.Budget import Budget
+        from BudgetMe.BudgetSnapshot import MAGIC
+        with open(path, "rb") as file:
+            magic = file.read(len(MAGIC))
+        if magic == MAGIC:
+            return Budget.loadSnapshot(path)
+        return Budget.loadJson(path)
+
+    @staticmethod
+    def check(arguments) -> int:
+        status = 0
+        results = []
+        for path in arguments.budgets:
+            budget = BudgetCli.load(path)
+            negative = budget.detectNegativeBalance()
+            result = {"budget": path, "negative": negative, "savings": budget.calcualtePotentialSavings()}
+            results.append(result)
+            if negative["month"] != 0:
+                status = 1
+            if not arguments.json:
+                if negative["month"] != 0:
+                    print("%s: negative balance in %s: %s" % (path, budget.getMonthName(negative["month"]),
+                                                              budget.formatCurrency(negative["balance"])))
+                else:
+                    print("%s: no negative balance" % path)
+                print("%s: potential savings: %s" % (path, budget.formatCurrency(result["savings"])))
+        if arguments.json:
+            print(json.dumps(results, indent=2))
+        return status
+
+    @staticmethod
+    def render(arguments) -> int:
+        from BudgetMe.BudgetBatch import BudgetBatch
+        batch = BudgetBatch(arguments.output, formats=arguments.formats or ["html", "xlsx"],
+                            workers=arguments.workers, chunksize=arguments.chunksize, force=arguments.force)
+        results = batch.run(arguments.budgets)
+        for result in results:
+            if result["error"]:
+                print("%s: failed\n%s" % (result["name"], result["error"]), file=sys.stderr)
+                continue
+            outputs = ", ".join(result["outputs"].values()) or "-"
+            skipped = " (up to date: %s)" % ", ".join(result["skipped"]) if result["skipped"] else ""
+            print("%s: %s in %.3f s%s" % (result["name"], outputs, result["seconds"], skipped))
+        summary = BudgetBatch.summarize(results)
+        print("%d budgets, %d reports rendered, %d up to date, %d failed" % (
+            summary["budgets"], summary["rendered"], summary["skipped"], len(summary["failed"])))
+        return 1 if summary["failed"] else 0
+
+    @staticmethod
+    def convert(arguments) -> int:
+        budget = BudgetCli.load(arguments.source)
+        if arguments.target.endswith(SNAPSHOT_EXTENSION):
+            budget.saveSnapshot(arguments.target)
+        else:
+            with open(arguments.target, "w", encoding="utf-8") as file:
+                json.dump(budget.asdict(schema=arguments.schema), file)
+        return 0
+
+
+def main(argv=None) -> int:
+    """
+    Runs the budgetascode command.
+    :param argv: Arguments, without the name of the program. Defaults to the ones of the process.
+    :return: Exit status.
+    """
+    from BudgetMe.BudgetException import BudgetAccountParametersInvalid
+    arguments = BudgetCli.getParser().parse_args(argv)
+    try:
+        return arguments.run(arguments)
+    except (OSError, ValueError, BudgetAccountParametersInvalid) as error:
+        print("budgetascode: error: %s" % error, file=sys.stderr)
+        return 2
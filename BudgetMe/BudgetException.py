@@ -16,4 +16,14 @@ class BudgetAccountNotFound(Exception):
 
     def __init__(self, message):
         self.message = message
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+class BudgetNotFound(Exception):
+
+    """
+    Exception to throw when a Budget cannot be loaded
+    """
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,247 @@
+import csv
+import html
+import re
+from datetime import datetime
+
+from BudgetMe.BudgetException import BudgetAccountParametersInvalid
+
+CHUNK = 1 << 16
+# Descriptions and dates remembered with their account and slot. Cleared when full, so memory stays bounded.
+MEMO_SIZE = 1 << 16
+SAMPLES = 20
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+NO_RULE = "no rule"
+OUTSIDE = "outside budget"
+NO_TRANSACTION = "no transaction"
+INVALID = "invalid"
+
+
+class BudgetImport:
+    """
+    Imports bank statements (CSV or OFX) as the actual amounts of the transactions of a Budget.
+    Statements are read row by row. Each row goes to the account of the first rule whose pattern is found in its
+    description (case insensitive), and to the month of its date and the ordinal day of that month for 'daysof'
+    (with daysof=2, days 1 to 15 of a 30 day month are the first). The rows of a transaction are added up and, at
+    the end, every transaction is updated and confirmed in batches through Budget.updateTransactions. Memory grows
+    with the transactions of the Budget, not with the rows, so statements of millions of rows can be imported.
+    Rows that cannot be placed are counted by reason, the first ones kept as samples and, optionally, all of them
+    written to a CSV file.
+    """
+
+    def __init__(self, budget, rules, batch=10000):
+        """
+        :param budget: Budget to update.
+        :param rules: List of (pattern, account name), or a dictionary. Patterns are regular expressions.
+        :param batch: Transactions updated together.
+        """
+        self.budget = budget
+        self.rules = []
+        for pattern, account_name in (rules.items() if isinstance(rules, dict) else rules):
+            budget.getAccount(account_name)
+            try:
+                self.rules.append((re.compile(pattern, re.IGNORECASE), account_name))
+            except re.error as error:
+                raise BudgetAccountParametersInvalid("Rule %s is not valid: %s" % (pattern, error))
+        self.batch = batch
+        self.accounts = {}
+        self.slots = {}
+
+    def importCsv(self, source, columns=None, date_format="%Y-%m-%d", delimiter=",", encoding="utf-8",
+                  unmatched=None) -> dict:
+        """
+        Imports a CSV statement with a header row.
+        :param source: Path of the file, or a text stream.
+        :param columns: Names of the 'date', 'description' and 'amount' columns, when they are not those.
+        :param date_format: Format of the dates (see datetime.strptime).
+        :param delimiter: Delimiter of the columns.
+        :param encoding: Encoding of the file.
+        :param unmatched: Text stream where the rows that were not imported are written as CSV.
+        :return: Report of the import (see importRows).
+        """
+        columns = dict({"date": "date", "description": "description", "amount": "amount"}, **(columns or {}))
+        if hasattr(source, "read"):
+            return self.importRows(self.readCsv(source, columns, delimiter), date_format, unmatched)
+        with open(source, "r", encoding=encoding, newline="") as stream:
+            return self.importRows(self.readCsv(stream, columns, delimiter), date_format, unmatched)
+
+    def importOfx(self, source, encoding="latin-1", unmatched=None) -> dict:
+        """
+        Imports an OFX statement, either SGML (OFX 1) or XML (OFX 2).
+        :param source: Path of the file, or a text stream.
+        :param encoding: Encoding of the file.
+        :param unmatched: Text stream where the rows that were not imported are written as CSV.
+        :return: Report of the import (see importRows).
+        """
+        if hasattr(source, "read"):
+            return self.importRows(self.readOfx(source), "%Y%m%d", unmatched)
+        with open(source, "r", encoding=encoding) as stream:
+            return self.importRows(self.readOfx(stream), "%Y%m%d", unmatched)
+
+    @staticmethod
+    def readCsv(stream, columns, delimiter):
+        """
+        Yields the (line, date, description, amount) of every row of a CSV statement.
+        :return: Generator of tuples of strings.
+        """
+        reader = csv.reader(stream, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        try:
+            positions = [header.index(columns[key]) for key in ["date", "description", "amount"]]
+        except ValueError:
+            raise BudgetAccountParametersInvalid("The statement needs the columns %s, it has %s." % (
+                [columns[key] for key in ["date", "description", "amount"]], header))
+        date, description, amount = positions
+        last = max(positions)
+        for row in reader:
+            if len(row) <= last:
+                if any(row):
+                    yield reader.line_num, None, ",".join(row), None
+                continue
+            yield reader.line_num, row[date], row[description], row[amount]
+
+    @staticmethod
+    def readOfx(stream):
+        """
+        Yields the (number, date, description, amount) of every STMTTRN of an OFX statement, reading the stream in
+        chunks. The date is the YYYYMMDD part of DTPOSTED and the description joins NAME, PAYEE and MEMO.
+        :return: Generator of tuples of strings.
+        """
+        buffer = ""
+        transaction = None
+        number = 0
+        while True:
+            chunk = stream.read(CHUNK)
+            buffer += chunk
+            # The last tag may continue in the next chunk.
+            end = len(buffer) if not chunk else max(buffer.rfind("<"), 0)
+            for match in OFX_TAG.finditer(buffer, 0, end):
+                closing, tag, value = match.group(1), match.group(2).upper(), match.group(3).strip()
+                if tag == "STMTTRN":
+                    if transaction is not None:
+                        number += 1
+                        yield BudgetImport.getOfxRow(number, transaction)
+                    transaction = None if closing else {}
+                elif tag == "BANKTRANLIST" and closing and transaction is not None:
+                    number += 1
+                    yield BudgetImport.getOfxRow(number, transaction)
+                    transaction = None
+                elif transaction is not None and not closing and value:
+                    transaction[tag] = html.unescape(value)
+            buffer = buffer[end:]
+            if not chunk:
+                break
+        if transaction is not None:
+            number += 1
+            yield BudgetImport.getOfxRow(number, transaction)
+
+    @staticmethod
+    def getOfxRow(number, transaction) -> tuple:
+        description = " ".join(transaction[tag] for tag in ["NAME", "PAYEE", "MEMO"] if tag in transaction)
+        return number, transaction.get("DTPOSTED", "")[:8] or None, description, transaction.get("TRNAMT")
+
+    def importRows(self, rows, date_format, unmatched=None) -> dict:
+        """
+        Imports rows of a statement.
+        :param rows: Iterable of (line, date, description, amount), as strings.
+        :param date_format: Format of the dates.
+        :param unmatched: Text stream where the rows that were not imported are written as CSV.
+        :return: Dictionary with the rows read and imported, the transactions updated and changed, the rows not
+        imported by reason and samples of them.
+        """
+        writer = csv.writer(unmatched) if unmatched is not None else None
+        if writer is not None:
+            writer.writerow(["line", "date", "description", "amount", "reason"])
+        cells = {}
+        report = {"rows": 0, "imported": 0, "transactions": 0, "changed": 0, "unmatched": 0,
+                  "reasons": {NO_RULE: 0, OUTSIDE: 0, NO_TRANSACTION: 0, INVALID: 0}, "samples": []}
+        for line, date, description, amount in rows:
+            report["rows"] += 1
+            reason = None
+            slot = self.getSlot(date, date_format) if date else None
+            value = parseAmount(amount)
+            if slot is None or value is None:
+                reason = INVALID
+            else:
+                account_name = self.getAccountName(description)
+                if account_name is None:
+                    reason = NO_RULE
+                elif slot[0] < max(self.budget.start, 1) or slot[0] > self.budget.end:
+                    reason = OUTSIDE
+                elif self.budget.getAccount(account_name).ledger.find(slot[0], slot[1]) < 0:
+                    reason = NO_TRANSACTION
+            if reason is not None:
+                report["unmatched"] += 1
+                report["reasons"][reason] += 1
+                if len(report["samples"]) < SAMPLES:
+                    report["samples"].append({"line": line, "date": date, "description": description,
+                                              "amount": amount, "reason": reason})
+                if writer is not None:
+                    writer.writerow([line, date, description, amount, reason])
+                continue
+            key = (account_name, slot[0], slot[1])
+            cells[key] = cells.get(key, 0) + value
+            report["imported"] += 1
+        updates = [(account_name, month, day, round(amount, 2)) for (account_name, month, day), amount in
+                   cells.items()]
+        for start in range(0, len(updates), self.batch):
+            result = self.budget.updateTransactions(updates[start:start + self.batch])
+            report["changed"] += result["changed"]
+        report["transactions"] = len(updates)
+        return report
+
+    def getAccountName(self, description):
+        """
+        Returns the account of the first rule found in a description, or None.
+        :param description: Description of the row.
+        :return: str
+        """
+        account_name = self.accounts.get(description, self)
+        if account_name is self:
+            account_name = None
+            for pattern, name in self.rules:
+                if pattern.search(description or ""):
+                    account_name = name
+                    break
+            if len(self.accounts) >= MEMO_SIZE:
+                self.accounts.clear()
+            self.accounts[description] = account_name
+        return account_name
+
+    def getSlot(self, date, date_format):
+        """
+        Returns the month of the Budget and the ordinal day of a date, or None when it is not a valid date.
+        :param date: Date of the row.
+        :param date_format: Format of the date.
+        :return: Tuple (month, day)
+        """
+        slot = self.slots.get((date, date_format), self)
+        if slot is self:
+            try:
+                slot = self.budget.getMonthDay(datetime.strptime(date.strip(), date_format))
+            except ValueError:
+                slot = None
+            if len(self.slots) >= MEMO_SIZE:
+                self.slots.clear()
+            self.slots[(date, date_format)] = slot
+        return slot
+
+
+def parseAmount(amount):
+    """
+    Reads an amount like '-12.50', '$1,234.00' or '(12.50)' (negative), or returns None.
+    """
+    if amount is None:
+        return None
+    text = amount.strip().replace(",", "").replace("$", "")
+    negative = text.startswith("(") and text.endswith(")")
+    if negative:
+        text = text[1:-1]
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return -value if negative else value
@@ -0,0 +1,187 @@
+from BudgetMe.Account import Account
+from BudgetMe.Bank import Bank
+from BudgetMe.BudgetException import BudgetAccountParametersInvalid
+
+SCHEMA = 2
+
+
+class BudgetJson:
+    """
+    Normalized JSON representation of a Budget (schema 2).
+    Banks are stored once, in 'banks', and accounts refer to them by their position ('bank': 0). The transactions
+    of each account are stored as columns (month, day, amount, ...) instead of one dictionary per Forecast, and the
+    transactions of each bank as an amount column plus the position of each id in a table of distinct ids.
+    Columns that only repeat the defaults (planned equal to amount, nothing confirmed, no notes) are left out.
+    """
+
+    @staticmethod
+    def asdict(budget) -> dict:
+        """
+        Converts a Budget into a schema 2 dictionary.
+        :param budget: Budget to convert.
+        :return: dict
+        """
+        banks = list(budget.banks)
+        listed = len(banks)
+        positions = {id(bank): position for position, bank in enumerate(banks)}
+        for account in budget.transactions:
+            if isinstance(account.bank, Bank) and id(account.bank) not in positions:
+                positions[id(account.bank)] = len(banks)
+                banks.append(account.bank)
+        banks_json = []
+        for position, bank in enumerate(banks):
+            bank_json = {"name": bank.name, "balance": bank.balance}
+            bank_json.update(BudgetJson.getBankTransactions(bank))
+            if position >= listed:
+                bank_json["listed"] = False
+            banks_json.append(bank_json)
+        accounts_json = []
+        for account in budget.transactions:
+            accounts_json.append({"name": account.name, "account": account.account, "year": account.year,
+                                  "days": account.days, "category": account.category,
+                                  "frequency": account.frequency, "start": account.start,
+                                  "bank": positions.get(id(account.bank)), "periodical": account.periodical,
+                                  "txn_mode": account.txn_mode, "budget_start": account.budget_start,
+                                  "budget_end": account.budget_end, "parent": account.parent,
+                                  "transfer_balance": account.transfer_balance, "balance": account.balance,
+                                  "forecasts": BudgetJson.getForecasts(account)})
+        return {"schema": SCHEMA, "year": budget.year, "daysof": budget.daysof, "start": budget.start,
+                "end": budget.end, "days_labels": budget.days_labels,
+                "template": budget.getTemplateWithoutTransactions(), "banks": banks_json,
+                "accounts": accounts_json}
+
+    @staticmethod
+    def getBankTransactions(bank) -> dict:
+        """
+        Returns the transactions of a bank as a table of distinct ids, the position of the id of each transaction
+        in that table and the amount of each transaction.
+        :param bank: Bank to convert.
+        :return: dict
+        """
+        ids = []
+        id_positions = {}
+        transaction_ids = []
+        amounts = []
+        for txn in bank.transactions:
+            position = id_positions.get(txn["id"])
+            if position is None:
+                position = id_positions[txn["id"]] = len(ids)
+                ids.append(txn["id"])
+            transaction_ids.append(position)
+            amounts.append(txn["amount"])
+        return {"ids": ids, "transaction_ids": transaction_ids, "amounts": amounts}
+
+    @staticmethod
+    def getForecasts(account) -> dict:
+        """
+        Returns the transactions of an account as columns.
+        :param account: Account to convert.
+        :return: dict
+        """
+        ledger = account.ledger
+        indexes = ledger.indexes()
+        months = []
+        days = []
+        for index in indexes:
+            month, day = ledger.position(index)
+            months.append(month)
+            days.append(day)
+        amounts = [ledger.amounts[i] for i in indexes]
+        planned = [ledger.planned[i] for i in indexes]
+        forecasts = {"month": months, "day": days, "amount": amounts,
+                     "previous": [ledger.previous[i] for i in indexes]}
+        if ledger.periods > 0:
+            forecasts["reserved"] = [ledger.first, ledger.last(), ledger.daysof]
+        if planned != amounts:
+            forecasts["planned"] = planned
+        confirmed = [ledger.confirmed[i] for i in indexes]
+        if any(confirmed):
+            forecasts["confirmed"] = confirmed
+        if ledger.notes:
+            rows = {index: row for row, index in enumerate(indexes)}
+            forecasts["notes"] = sorted([rows[index], note] for index, note in ledger.notes.items())
+        return forecasts
+
+    @staticmethod
+    def load(budget_json: dict, budget_class):
+        """
+        Creates a Budget from a schema 2 dictionary. Accounts of the same bank share one Bank object.
+        :param budget_json: The schema 2 representation of the Budget.
+        :param budget_class: Class of the Budget to create.
+        :return: Budget
+        """
+        if budget_json.get("schema") != SCHEMA:
+            raise BudgetAccountParametersInvalid("Budget schema %s is not supported." % budget_json.get("schema"))
+        budget = budget_class(budget_json['year'], daysof=budget_json['daysof'], start=budget_json['start'],
+                              end=budget_json['end'])
+        budget.days_labels = budget_json['days_labels']
+        budget.template = budget_json['template']
+        banks = []
+        for bank_json in budget_json['banks']:
+            bank = BudgetJson.createBank(bank_json)
+            banks.append(bank)
+            if bank_json.get('listed', True):
+                budget.banks.append(bank)
+                budget.indexBank(bank)
+        for account_json in budget_json['accounts']:
+            account = BudgetJson.createAccount(account_json, banks)
+            budget.transactions.append(account)
+            budget.indexAccount(account)
+        budget.restoreBankTimelines()
+        return budget
+
+    @staticmethod
+    def createBank(bank_json: dict) -> Bank:
+        """
+        Creates a Bank from its schema 2 dictionary. Its list of transactions is built on first use.
+        :param bank_json: The schema 2 representation of the Bank.
+        :return: Bank
+        """
+        bank = Bank(name=bank_json['name'], initial_balance=bank_json['balance'])
+        bank.transaction_loader = BudgetJson.transactionLoader(bank_json)
+        return bank
+
+    @staticmethod
+    def createAccount(account_json: dict, banks: list) -> Account:
+        """
+        Creates an Account from its schema 2 dictionary, filling its ledger straight from the columns.
+        :param account_json: The schema 2 representation of the Account.
+        :param banks: Banks of the Budget, in the order of the document.
+        :return: Account
+        """
+        bank = account_json['bank']
+        account = Account(account_json['account'], year=account_json['year'], category=account_json['category'],
+                          frequency=account_json['frequency'], start=account_json['start'],
+                          bank=banks[bank] if bank is not None else None, periodical=account_json['periodical'],
+                          txn_mode=account_json['txn_mode'], budget_start=account_json['budget_start'],
+                          budget_end=account_json['budget_end'], parent=account_json['parent'])
+        account.name = account_json['name']
+        account.days = account_json['days']
+        account.transfer_balance = account_json['transfer_balance']
+        account.balance = account_json['balance']
+        forecasts = account_json['forecasts']
+        months = forecasts['month']
+        days = forecasts['day']
+        amounts = forecasts['amount']
+        previous = forecasts['previous']
+        planned = forecasts.get('planned', amounts)
+        confirmed = forecasts.get('confirmed')
+        ledger = account.ledger
+        if 'reserved' in forecasts:
+            ledger.reserve(*forecasts['reserved'])
+        for row in range(len(months)):
+            ledger.put(months[row], days[row], amounts[row], previous=previous[row], planned=planned[row],
+                       confirmed=confirmed is not None and confirmed[row] == 1)
+        for row, note in forecasts.get('notes', []):
+            ledger.notes[ledger.index(months[row], days[row])] = note
+        return account
+
+    @staticmethod
+    def transactionLoader(bank_json: dict):
+        ids = bank_json['ids']
+        transaction_ids = bank_json['transaction_ids']
+        amounts = bank_json['amounts']
+
+        def load():
+            return [{"id": ids[transaction_ids[i]], "amount": amounts[i]} for i in range(len(amounts))]
+        return load
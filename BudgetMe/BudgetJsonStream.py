@@ -0,0 +1,190 @@
+import json
+
+from BudgetMe.BudgetException import BudgetAccountParametersInvalid
+from BudgetMe.BudgetJson import BudgetJson
+
+WHITESPACE = " \t\n\r"
+
+
+class BudgetJsonStream:
+    """
+    Incremental loader of budget JSON documents, of schema 1 or 2.
+    The top level object and its list of accounts are read token by token from the stream. Each account is
+    decoded on its own, turned into an Account and dropped, so the decoded dictionaries of only one account are in
+    memory at a time, instead of the whole document.
+    """
+
+    CHUNK = 1 << 16
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.banks = None
+
+    @staticmethod
+    def load(source, budget_class):
+        """
+        Creates a Budget from a JSON document.
+        :param source: Path of the file, or a text stream.
+        :param budget_class: Class of the Budget to create.
+        :return: Budget
+        """
+        if hasattr(source, "read"):
+            return BudgetJsonStream(source).readBudget(budget_class)
+        with open(source, "r", encoding="utf-8") as stream:
+            return BudgetJsonStream(stream).readBudget(budget_class)
+
+    def readBudget(self, budget_class):
+        """
+        Reads the budget document of the stream.
+        :param budget_class: Class of the Budget to create.
+        :return: Budget
+        """
+        header = {}
+        accounts = []
+        pending = []
+        banks = {}
+        self.expect("{")
+        if self.peek() == "}":
+            raise BudgetAccountParametersInvalid("The budget document is empty.")
+        while True:
+            key = self.readValue()
+            self.expect(":")
+            if key == "transactions":
+                for account_json in self.readArray():
+                    account = budget_class.createAccountFromJson(account_json, banks=banks)
+                    if account.bank is not None:
+                        banks.setdefault(account.bank.name, account.bank)
+                    accounts.append(account)
+            elif key == "accounts":
+                for account_json in self.readArray():
+                    if "banks" in header:
+                        accounts.append(BudgetJson.createAccount(account_json, self.getBanks(header)))
+                    else:
+                        # Accounts before their banks cannot be built yet.
+                        pending.append(account_json)
+            else:
+                header[key] = self.readValue()
+            if self.next() == "}":
+                break
+        self.skipWhitespace()
+        if self.position < len(self.buffer):
+            raise BudgetAccountParametersInvalid("Unexpected data after the budget document.")
+        for account_json in pending:
+            accounts.append(BudgetJson.createAccount(account_json, self.getBanks(header)))
+        schema = header.get("schema", 1)
+        budget = budget_class(header["year"], daysof=header["daysof"], start=header.get("start", 1),
+                              end=header.get("end", 12))
+        budget.days_labels = header["days_labels"]
+        budget.template = header.get("template", {})
+        if schema == 1:
+            for bank_json in header.get("banks", []):
+                bank = budget_class.createBankFromJson(bank_json)
+                budget.banks.append(bank)
+                budget.indexBank(bank)
+            for account in accounts:
+                if account.bank is not None and account.bank.name in budget.bank_index:
+                    account.bank = budget.bank_index[account.bank.name]
+        else:
+            for bank_json, bank in zip(header["banks"], self.getBanks(header)):
+                if bank_json.get("listed", True):
+                    budget.banks.append(bank)
+                    budget.indexBank(bank)
+        for account in accounts:
+            budget.transactions.append(account)
+            budget.indexAccount(account)
+        budget.restoreBankTimelines()
+        return budget
+
+    def getBanks(self, header) -> list:
+        """
+        Returns the banks of a schema 2 document, creating them the first time.
+        :param header: Values of the document read so far.
+        :return: list
+        """
+        if self.banks is None:
+            self.banks = [BudgetJson.createBank(bank_json) for bank_json in header["banks"]]
+        return self.banks
+
+    def readArray(self):
+        """
+        Yields the values of the array at the current position, one at a time.
+        :return: Generator of values.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self.readValue()
+            if self.next() == "]":
+                return
+
+    def readValue(self):
+        """
+        Decodes the value at the current position.
+        :return: The value.
+        """
+        self.skipWhitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # Read at least as much again as the value read so far, so large values are decoded a few times
+                # at most.
+                self.fill(max(self.CHUNK, len(self.buffer) - self.position))
+                continue
+            if end == len(self.buffer) and not self.eof:
+                # A number at the end of the buffer may continue in the next chunk.
+                self.fill(self.CHUNK)
+                continue
+            self.position = end
+            return value
+
+    def next(self) -> str:
+        """
+        Returns the separator at the current position (',' or the end of the object or array) and skips it.
+        :return: str
+        """
+        char = self.peek()
+        if char not in ",}]":
+            raise BudgetAccountParametersInvalid("Unexpected '%s' in the budget document." % char)
+        self.position += 1
+        return char
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise BudgetAccountParametersInvalid("Expected '%s' in the budget document." % char)
+        self.position += 1
+
+    def peek(self) -> str:
+        self.skipWhitespace()
+        if self.position >= len(self.buffer):
+            raise BudgetAccountParametersInvalid("The budget document is truncated.")
+        return self.buffer[self.position]
+
+    def skipWhitespace(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer) or self.eof:
+                return
+            self.fill(self.CHUNK)
+
+    def fill(self, size):
+        """
+        Drops what was already read and appends the next chunk of the stream to the buffer.
+        :param size: Number of characters to read.
+        :return: None
+        """
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+        chunk = self.stream.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer += chunk
@@ -0,0 +1,159 @@
+import numpy as np
+
+from BudgetMe.BudgetException import BudgetAccountNotFound
+
+
+class BudgetMatrix:
+    """
+    Snapshot of a Budget stacked into one accounts x months x days matrix.
+    Every aggregate is a single reduction over the matrix, and the batch methods return all the months at once.
+    The snapshot does not follow later changes to the Budget; build a new one after updating it.
+    """
+
+    def __init__(self, budget):
+        accounts = budget.transactions
+        ledgers = [account.ledger for account in accounts if account.ledger.periods > 0]
+        self.year = budget.year
+        self.start = budget.start
+        self.end = budget.end
+        self.first = min([1] + [ledger.first for ledger in ledgers])
+        self.last = max([12] + [ledger.last() for ledger in ledgers])
+        self.daysof = max([budget.daysof] + [ledger.daysof for ledger in ledgers])
+        self.names = [account.name for account in accounts]
+        self.amounts = np.zeros((len(accounts), self.last - self.first + 1, self.daysof))
+        for row, account in enumerate(accounts):
+            ledger = account.ledger
+            if ledger.periods == 0:
+                continue
+            offset = ledger.first - self.first
+            self.amounts[row, offset:offset + ledger.periods, :ledger.daysof] = np.asarray(
+                ledger.amounts, dtype=float).reshape(ledger.periods, ledger.daysof)
+        self.rows = {}
+        self.categories = {}
+        self.banks = {}
+        self.parents = {}
+        for row, account in enumerate(accounts):
+            self.rows.setdefault(account.name, row)
+            self.categories.setdefault(account.category, []).append(row)
+            bank = getattr(account.bank, "name", None)
+            if bank is not None:
+                self.banks.setdefault(bank, []).append(row)
+            # Every parent is indexed, None and "" included, as in Budget.parent_index.
+            self.parents.setdefault(account.parent, []).append(row)
+        self.categories = {k: np.array(v) for k, v in self.categories.items()}
+        self.banks = {k: np.array(v) for k, v in self.banks.items()}
+        self.parents = {k: np.array(v) for k, v in self.parents.items()}
+        # Reductions shared by every query.
+        self.account_months = self.amounts.sum(axis=2)
+        self.day_totals = self.amounts.sum(axis=0)
+        self.month_totals = self.day_totals.sum(axis=1)
+        self.account_finals = self.account_months[:, self._column(1):].sum(axis=1)
+        self.running = np.cumsum(self.month_totals[self._column(1):])
+
+    def _column(self, month) -> int:
+        return month - self.first
+
+    def _inside(self, month) -> bool:
+        return self.first <= month <= self.last
+
+    def getMonthBalance(self, month) -> float:
+        """
+        Returns the balance of the specified month.
+        :param month: Month to query.
+        :return: float
+        """
+        if not self._inside(month):
+            return 0.0
+        return float(self.month_totals[self._column(month)])
+
+    def getMonthDayBalance(self, month, day) -> float:
+        """
+        Returns the balance of the specified month and day.
+        :param month: Month to query.
+        :param day: Ordinal day to query.
+        :return: float
+        """
+        if not self._inside(month) or day < 1 or day > self.daysof:
+            return 0.0
+        return float(self.day_totals[self._column(month), day - 1])
+
+    def getRunningBalance(self, month) -> float:
+        """
+        Running balance is the balance accumulated until the month specified.
+        :param month: Month to query.
+        :return: float
+        """
+        if month < 1:
+            return 0.0
+        return float(self.running[min(month, self.last) - 1])
+
+    def getFinalBalance(self) -> float:
+        """
+        Returns the final balance from all the accounts.
+        :return: float
+        """
+        return float(self.account_finals.sum())
+
+    def getTotalBalanceByCategory(self, category) -> float:
+        """
+        Returns the total balance for a Category by the end of the Budget.
+        :param category: Name of the category.
+        :return: float
+        """
+        if category not in self.categories:
+            return 0.0
+        return float(self.account_finals[self.categories[category]].sum())
+
+    def getAccountBalance(self, account_name) -> float:
+        """
+        Gets the balance of an Account. If the account has child accounts, the balance is from the child accounts.
+        :param account_name: Name of the Account.
+        :return: float
+        """
+        if account_name in self.parents:
+            return float(self.account_finals[self.parents[account_name]].sum())
+        if account_name not in self.rows:
+            raise BudgetAccountNotFound("Account %s not found." % account_name)
+        return float(self.account_finals[self.rows[account_name]])
+
+    def getMonthBalances(self) -> list:
+        """
+        Returns the balance of every month of the Budget, from start to end.
+        :return: list
+        """
+        return [float(v) for v in self.month_totals[self._column(self.start):self._column(self.end) + 1]]
+
+    def getMonthDayBalances(self) -> list:
+        """
+        Returns the balance of every day of every month of the Budget, from start to end.
+        :return: list of lists, one per month.
+        """
+        return self.day_totals[self._column(self.start):self._column(self.end) + 1].tolist()
+
+    def getRunningBalances(self) -> list:
+        """
+        Returns the running balance of every month of the Budget, from start to end.
+        :return: list
+        """
+        return [self.getRunningBalance(month) for month in range(self.start, self.end + 1)]
+
+    def getAccountBalances(self) -> dict:
+        """
+        Returns the balance of every Account, following the same parent rules as getAccountBalance.
+        :return: Dictionary with the account names and their balances.
+        """
+        return {name: self.getAccountBalance(name) for name in self.rows}
+
+    def getBalanceByCategories(self) -> dict:
+        """
+        Gets the balance by categories.
+        :return: Dictionary with the categories and its balances.
+        """
+        return {k: float(self.account_finals[v].sum()) for k, v in self.categories.items()}
+
+    def getBalanceByBanks(self) -> dict:
+        """
+        Gets the balance of the accounts of each bank.
+        :return: Dictionary with the banks and its balances.
+        """
+        return {k: float(self.account_finals[v].sum()) for k, v in self.banks.items()}
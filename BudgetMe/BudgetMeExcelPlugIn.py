@@ -1,109 +1,105 @@
 from BudgetMe.Budget import Budget
 
 
-class BudgetMeHtml(Budget):
+class BudgetMeExcel(Budget):
 
     def __init__(self, year, daysof=1, start=1, end=12):
-        super(BudgetMeHtml, self).__init__(year, daysof, start, end)
+        super(BudgetMeExcel, self).__init__(year, daysof, start, end)
 
-    # TODO: Fix Excel generation. The columns are not considering Budgets of less than twelve months.
-    def generateExcelFile(self, filename="budget.xlsx"):
+    def generateExcelFile(self, filename="budget.xlsx", constant_memory=True):
         """
         Generates a file with representation of the Budget HTML in Excel format.
+        Columns follow the months from the start to the end of the Budget, 'daysof' columns per month.
+        Rows are written top to bottom with write_row, so in constant memory mode each row is flushed to disk as soon
+        as the next one starts.
         :param filename: Name of the file to save the data.
+        :param constant_memory: Keeps only the current row in memory (xlsxwriter 'constant_memory' mode).
         :return: None
         """
-        workbook = xlsxwriter.Workbook(filename)
+        import xlsxwriter
+        workbook = xlsxwriter.Workbook(filename, {"constant_memory": constant_memory})
         worksheet = workbook.add_worksheet()
-        worksheet.set_column('A:A', 20)
-        worksheet.write('A1', self.year)
-        month = 0
-        for column in range(1, 25, 2):
-            month += 1
-            col = 65 + column
-            cell = '%s1' % chr(col)
-            merge = '%s1' % chr(col + 1)
-            worksheet.merge_range("%s:%s" % (cell, merge), str(self.getMonthName(month)))
-        for month in range(1, 25):
-            for label in self.days_labels:
-                col = 65 + month
-                worksheet.write("%s2" % chr(col), label)
-        worksheet.write("Z2", "Final balances")
-        row_counter = 2
-        for row in self.transactions:
-            if (self.accountHasChildAccounts(row.name)):
-                child_accounts = self.getChildAccounts(row.name)
-                row_counter += 1
-                worksheet.write("A%s" % row_counter, row.name)
-                for child in child_accounts:
-                    row_counter += 1
-                    worksheet.write("A%s" % row_counter, "- " + child.name)
-                    days_counter = 0
-                    for txn in child.forecast_array:
-                        days_counter += 1
-                        col = 65 + days_counter
-                        worksheet.write("%s%s" % (chr(col), row_counter), txn.amount)
-                    days_counter += 1
-                    col = 65 + days_counter
-                    worksheet.write("%s%s" % (chr(col), row_counter), child.getFinalBalance())
+        worksheet.set_column(0, 0, 20)
+        months = range(self.start, self.end + 1)
+        final_column = len(months) * self.daysof + 1
+        totals = self.getPeriodTotals()
+        labels = (list(self.days_labels) + [""] * self.daysof)[:self.daysof]
+        worksheet.write(0, 0, self.year)
+        for position, month in enumerate(months):
+            self.writeMonthCell(worksheet, 0, position, self.getMonthName(month))
+        worksheet.write_row(1, 1, labels * len(months))
+        worksheet.write(1, final_column, "Final balances")
+        row = 2
+        for account in self.transactions:
+            children = self.getChildAccounts(account.name)
+            if (len(children) > 0):
+                worksheet.write(row, 0, account.name)
+                worksheet.write(row, final_column, self.getAccountBalance(account.name))
+                row += 1
+                for child in children:
+                    worksheet.write(row, 0, "- " + child.name)
+                    worksheet.write_row(row, 1, self.getRowAmounts(child))
+                    worksheet.write(row, final_column, self.getAccountBalance(child.name))
+                    row += 1
             else:
-                row_counter += 1
-                worksheet.write("A%s" % row_counter, row.name)
-                days_counter = 0
-                for txn in row.forecast_array:
-                    days_counter += 1
-                    col = 65 + days_counter
-                    worksheet.write("%s%s" % (chr(col), row_counter), txn.amount)
-                days_counter += 1
-                col = 65 + days_counter
-                worksheet.write("%s%s" % (chr(col), row_counter), row.getFinalBalance())
-        # # Monthly Balance
-        row_counter += 1
-        worksheet.write("A%s" % row_counter, "Monthly balance")
-        month = 0
-        for column in range(1, 25, 2):
-            month += 1
-            col = 65 + column
-            cell = '%s%s' % (chr(col), row_counter)
-            merge = '%s%s' % (chr(col + 1), row_counter)
-            worksheet.merge_range("%s:%s" % (cell, merge), str(self.getMonthBalance(month)))
-        row_counter += 1
-        worksheet.write("A%s" % row_counter, "Running balance")
-        month = 0
-        for column in range(1, 25, 2):
-            month += 1
-            col = 65 + column
-            cell = '%s%s' % (chr(col), row_counter)
-            merge = '%s%s' % (chr(col + 1), row_counter)
-            worksheet.merge_range("%s:%s" % (cell, merge), str(self.getRunningBalance(month)))
-        month += 1
-        worksheet.write("Z%s" % row_counter, self.getFinalBalance())
+                worksheet.write(row, 0, account.name)
+                worksheet.write_row(row, 1, self.getRowAmounts(account))
+                worksheet.write(row, final_column, account.getFinalBalance())
+                row += 1
+        # Monthly Balance
+        worksheet.write(row, 0, "Monthly balance")
+        for position, month in enumerate(months):
+            self.writeMonthCell(worksheet, row, position, totals["month"].get(month, 0))
+        row += 1
+        worksheet.write(row, 0, "Running balance")
+        for position, month in enumerate(months):
+            self.writeMonthCell(worksheet, row, position, totals["running"].get(month, 0.0))
+        worksheet.write(row, final_column, self.getFinalBalance())
 
-        row_counter += 2
-        cell = 'A%s' % (row_counter)
-        merge = 'C%s' % (row_counter)
-        worksheet.merge_range("%s:%s" % (cell, merge), "Categories")
-        row_counter += 1
-        categories = self.getBalanceByCategories()
-        for k, v in categories.items():
-            worksheet.write("A%s" % row_counter, k)
-            worksheet.write("B%s" % row_counter, v)
-            worksheet.write("C%s" % row_counter, v / 12)
-            row_counter += 1
+        row += 2
+        worksheet.merge_range(row, 0, row, 2, "Categories")
+        row += 1
+        for k, v in self.getBalanceByCategories().items():
+            worksheet.write_row(row, 0, [k, v, v / 12])
+            row += 1
 
-        row_counter += 2
-        cell = 'A%s' % (row_counter)
-        merge = 'B%s' % (row_counter)
-        worksheet.merge_range("%s:%s" % (cell, merge), "Banks")
-        row_counter += 1
+        row += 2
+        worksheet.merge_range(row, 0, row, 1, "Banks")
+        row += 1
         for bank in self.banks:
-            worksheet.write("A%s" % row_counter, bank.name)
-            worksheet.write("B%s" % row_counter, bank.balance)
-            row_counter += 1
+            worksheet.write_row(row, 0, [bank.name, bank.balance])
+            row += 1
 
-        row_counter += 2
-        worksheet.write("A%s" % row_counter, "Potential savings")
-        row_counter += 1
-        worksheet.write("A%s" % row_counter, self.calcualtePotentialSavings())
-        row_counter += 1
-        workbook.close()
\ No newline at end of file
+        row += 2
+        worksheet.write(row, 0, "Potential savings")
+        row += 1
+        worksheet.write(row, 0, self.calcualtePotentialSavings())
+        workbook.close()
+
+    def writeMonthCell(self, worksheet, row, position, value):
+        """
+        Writes a value spanning the 'daysof' columns of a month.
+        :param worksheet: Worksheet to write.
+        :param row: Row of the cell (zero based).
+        :param position: Position of the month from the start of the Budget (zero based).
+        :param value: Value to write.
+        :return: None
+        """
+        column = 1 + position * self.daysof
+        if (self.daysof > 1):
+            worksheet.merge_range(row, column, row, column + self.daysof - 1, value)
+        else:
+            worksheet.write(row, column, value)
+
+    def getRowAmounts(self, account):
+        """
+        Returns the amounts of an account from the start to the end of the Budget, one per column.
+        Days without a transaction are left empty.
+        :param account: Account of the row.
+        :return: Generator of amounts.
+        """
+        ledger = account.ledger
+        for month in range(self.start, self.end + 1):
+            for day in range(1, self.daysof + 1):
+                index = ledger.find(month, day)
+                yield ledger.amounts[index] if index >= 0 else None
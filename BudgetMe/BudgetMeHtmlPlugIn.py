@@ -11,54 +11,104 @@ class BudgetMeHtml(Budget):
         Generates an HTML string with the entire budget
         :return: HTML in a String.
         """
+        return "".join(self.iterHTMLTable())
+
+    def iterHTMLTable(self):
+        """
+        Generates the HTML of the entire budget in chunks, one table row at a time.
+        All the balances are computed once before the first row, so the whole report is a single pass.
+        :return: Generator of HTML strings.
+        """
+        css = """<style type="text/css">
+        table {
+            font-size: small;
+            font-family: 'Helvetica';
+            border-collapse: collapse;
+        }
+        .sub_account {
+            font-size: small;
+            font-family: 'Helvetica';
+            font-style: italic;
+        }
+        .negative {
+            font-size: small;
+            font-family: 'Helvetica';
+            background-color: #fde1e5
+        }
+        .positive {
+            font-size: small;
+            font-family: 'Helvetica';
+            background-color: #bfffd5;
+        }
+        .positive_italic {
+            font-size: smaller;
+            font-family: 'Helvetica';
+            background-color: #bfffd5;
+            font-style: italic;
+        }
+        .negative_italic {
+            font-size: smaller;
+            font-family: 'Helvetica';
+            background-color: #fde1e5;
+            font-style: italic;
+        }
+        .centered {
+            text-align: center;
+        }
+        .confirmed {
+            text-decoration: green underline overline wavy;
+        }
+    </style>"""
+        yield "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"UTF-8\">\n<title>Report</title>\n" + css + "</head>\n<body>\n"
+        totals = self.getPeriodTotals()
+        colspan = str(self.daysof)
+        months = range(self.start, self.end + 1)
         html = "<table border=\"1\" cellpadding=\"5\">\n"
         # Months Columns Headers
         html += "\t<tr style=\"background-color: cornflowerblue; color: aliceblue\">\n"
         html += "\t\t<td style=\"text-align: center; font-weight: bold\">" + str(self.year) + "</td>\n"
-        for month in range(self.start, self.end + 1):
-            html += "\t\t<td colspan=\"" + str(
-                self.daysof) + "\" style=\"text-align: center; font-weight: bold\">" + str(
+        for month in months:
+            html += "\t\t<td colspan=\"" + colspan + "\" style=\"text-align: center; font-weight: bold\">" + str(
                 self.getMonthName(month)) + "</td>\n"
         html += "\t\t<td style=\"background-color: #EEEEEE; color\">&nbsp;</td>\n"
         html += "\t</tr>\n"
+        yield html
         # Days labels columns headers
-        html += "\t<tr style=\"background-color: cadetblue; color: aliceblue\">\n"
+        html = "\t<tr style=\"background-color: cadetblue; color: aliceblue\">\n"
         html += "\t\t<td style=\"background-color: #EEEEEE; color\">&nbsp;</td>\n"
-        for month in range(self.start, self.end + 1):
-            for label in self.days_labels:
-                html += "\t\t<td style=\"text-align: center; font-weight: bold; font-size: x-small;\">" + label + "</td>\n"
+        labels = "".join("\t\t<td style=\"text-align: center; font-weight: bold; font-size: x-small;\">" + label +
+                         "</td>\n" for label in self.days_labels)
+        html += labels * len(months)
         html += "\t\t<td>Final&nbsp;balances</td>\n"
         html += "\t</tr>\n"
+        yield html
         # ------------
         for row in self.transactions:
-            if (self.accountHasChildAccounts(row.name)):
-                html += "\t<tr>\n"
+            children = self.getChildAccounts(row.name)
+            if (len(children) > 0):
+                html = "\t<tr>\n"
                 html += "\t\t<td><strong>" + row.name + "</strong></td>\n"
-                for month in range(self.start, self.end + 1):
-                    for day in row.getMonth(month):
-                        html += "\t\t<td style=\"background-color: #EEEEEE;\">&nbsp;</td>\n"
+                html += "\t\t<td style=\"background-color: #EEEEEE;\">&nbsp;</td>\n" * sum(
+                    1 for _ in self.iterRowCells(row))
                 final_balance = self.getAccountBalance(row.name)
                 if (final_balance < 0):
                     html += "\t\t<td  class=\"negative\">" + self.formatCurrency(final_balance) + "</td>\n"
                 else:
                     html += "\t\t<td class=\"positive\">" + self.formatCurrency(final_balance) + "</td>\n"
                 html += "\t</tr>\n"
-                sub_row = self.getChildAccounts(row.name)
-                for child in sub_row:
-                    html += "\t<tr>\n"
+                yield html
+                for child in children:
+                    html = "\t<tr>\n"
                     html += "\t\t<td class=\"sub_account\">&nbsp;&nbsp;" + child.name + "</td>\n"
-                    for month in range(self.start, self.end + 1):
-                        for day in child.getMonth(month):
-                            if (day.amount > 0):
-                                html += "\t\t<td class=\"positive_italic " + self.setHtmlToConfirmed(
-                                    day) + " \">&nbsp;&nbsp;" + self.formatCurrency(
-                                    day.amount) + "</td>\n"
-                            elif (day.amount == 0):
-                                html += "\t\t<td style=\"background-color: #EEEEEE;\">&nbsp;</td>\n"
-                            else:
-                                html += "\t\t<td class=\"negative_italic " + self.setHtmlToConfirmed(
-                                    day) + " \">&nbsp;&nbsp;" + self.formatCurrency(
-                                    day.amount) + "</td>\n"
+                    for amount, confirmed in self.iterRowCells(child):
+                        if (amount > 0):
+                            html += "\t\t<td class=\"positive_italic " + confirmed + " \">&nbsp;&nbsp;" + \
+                                    self.formatCurrency(amount) + "</td>\n"
+                        elif (amount == 0):
+                            html += "\t\t<td style=\"background-color: #EEEEEE;\">&nbsp;</td>\n"
+                        else:
+                            html += "\t\t<td class=\"negative_italic " + confirmed + " \">&nbsp;&nbsp;" + \
+                                    self.formatCurrency(amount) + "</td>\n"
                     final_balance = self.getAccountBalance(child.name)
                     if (final_balance < 0):
                         html += "\t\t<td  class=\"negative_italic\">" + self.formatCurrency(
@@ -67,34 +117,32 @@ class BudgetMeHtml(Budget):
                         html += "\t\t<td class=\"positive_italic\">" + self.formatCurrency(
                             final_balance) + "</td>\n"
                     html += "\t</tr>\n"
+                    yield html
             else:
-                html += "\t<tr>\n"
+                html = "\t<tr>\n"
                 html += "\t\t<td>" + row.name + "</td>\n"
-                for month in range(self.start, self.end + 1):
-                    for day in row.getMonth(month):
-                        if (day.amount > 0):
-                            html += "\t\t<td class=\"positive " + self.setHtmlToConfirmed(
-                                day) + " \">" + self.formatCurrency(day.amount) + "</td>\n"
-                        elif (day.amount == 0):
-                            html += "\t\t<td style=\"background-color: #EEEEEE;\">&nbsp;</td>\n"
-                        else:
-                            html += "\t\t<td class=\"negative " + self.setHtmlToConfirmed(
-                                day) + " \">" + self.formatCurrency(
-                                day.amount) + "</td>\n"
+                for amount, confirmed in self.iterRowCells(row):
+                    if (amount > 0):
+                        html += "\t\t<td class=\"positive " + confirmed + " \">" + self.formatCurrency(
+                            amount) + "</td>\n"
+                    elif (amount == 0):
+                        html += "\t\t<td style=\"background-color: #EEEEEE;\">&nbsp;</td>\n"
+                    else:
+                        html += "\t\t<td class=\"negative " + confirmed + " \">" + self.formatCurrency(
+                            amount) + "</td>\n"
                 final_balance = row.getFinalBalance()
                 if (final_balance < 0):
-                    html += "\t\t<td  class=\"negative\">" + self.formatCurrency(
-                        row.getFinalBalance()) + "</td>\n"
+                    html += "\t\t<td  class=\"negative\">" + self.formatCurrency(final_balance) + "</td>\n"
                 else:
-                    html += "\t\t<td class=\"positive\">" + self.formatCurrency(
-                        row.getFinalBalance()) + "</td>\n"
+                    html += "\t\t<td class=\"positive\">" + self.formatCurrency(final_balance) + "</td>\n"
                 html += "\t</tr>\n"
+                yield html
         # ------------
-        html += "\t<tr style=\"background-color: aliceblue\">\n"
+        html = "\t<tr style=\"background-color: aliceblue\">\n"
         html += "\t\t<td>Balances</td>\n"
-        for month in range(self.start, self.end + 1):
+        for month in months:
             for day in range(1, self.daysof + 1):
-                monthly_balance = self.getMonthDayBalance(month, day)
+                monthly_balance = totals["day"].get((month, day), 0)
                 if (monthly_balance > 0):
                     html += "\t\t<td class=\"positive centered\">" + self.formatCurrency(
                         monthly_balance) + "</td>\n"
@@ -103,34 +151,32 @@ class BudgetMeHtml(Budget):
                         monthly_balance) + "</td>\n"
         html += "\t\t<td>&nbsp;</td>\n"
         html += "\t</tr>\n"
+        yield html
         # ------------
         # Monthly Balance
-        html += "\t<tr style=\"background-color: aliceblue\">\n"
+        html = "\t<tr style=\"background-color: aliceblue\">\n"
         html += "\t\t<td>Monthly&nbsp;balance</td>\n"
-        for month in range(self.start, self.end + 1):
-            monthly_balance = self.getMonthBalance(month)
+        for month in months:
+            monthly_balance = totals["month"].get(month, 0)
             if (monthly_balance > 0):
-                html += "\t\t<td colspan=\"" + str(
-                    self.daysof) + "\" class=\"positive centered\">" + self.formatCurrency(
+                html += "\t\t<td colspan=\"" + colspan + "\" class=\"positive centered\">" + self.formatCurrency(
                     monthly_balance) + "</td>\n"
             else:
-                html += "\t\t<td colspan=\"" + str(
-                    self.daysof) + "\"  class=\"negative centered\">" + self.formatCurrency(
+                html += "\t\t<td colspan=\"" + colspan + "\"  class=\"negative centered\">" + self.formatCurrency(
                     monthly_balance) + "</td>\n"
         html += "\t\t<td>&nbsp;</td>\n"
         html += "\t</tr>\n"
+        yield html
         # Running Balances
-        html += "\t<tr>\n"
+        html = "\t<tr>\n"
         html += "\t\t<td>Running&nbsp;balance</td>\n"
-        for month in range(self.start, self.end + 1):
-            running_balance = self.getRunningBalance(month)
+        for month in months:
+            running_balance = totals["running"].get(month, 0.0)
             if (running_balance > 0):
-                html += "\t\t<td colspan=\"" + str(
-                    self.daysof) + "\" class=\"positive, centered\">" + self.formatCurrency(
+                html += "\t\t<td colspan=\"" + colspan + "\" class=\"positive, centered\">" + self.formatCurrency(
                     running_balance) + "</td>\n"
             else:
-                html += "\t\t<td colspan=\"" + str(
-                    self.daysof) + "\"  class=\"negative, centered\">" + self.formatCurrency(
+                html += "\t\t<td colspan=\"" + colspan + "\"  class=\"negative, centered\">" + self.formatCurrency(
                     running_balance) + "</td>\n"
         total_balance = self.getFinalBalance()
         if (total_balance < 0):
@@ -140,7 +186,8 @@ class BudgetMeHtml(Budget):
             html += "\t\t<td  style=\"text-align: right; font-weight: bold\">&nbsp;" + self.formatCurrency(
                 total_balance) + "</td>\n"
         html += "\t</tr>\n"
-        html += "<table border=\"1\" cellpadding=\"5\">\n<br>"
+        yield html
+        html = "<table border=\"1\" cellpadding=\"5\">\n<br>"
         html += "<td colspan=\"3\" style=\"text-align: center; font-weight: bold \">Categories</td>\n"
         categories = self.getBalanceByCategories()
         for k, v in categories.items():
@@ -168,54 +215,27 @@ class BudgetMeHtml(Budget):
         html += "</table>"
         html += "</tr>\n"
         html += "</table>"
-        css = """<style type="text/css">
-        table {
-            font-size: small;
-            font-family: 'Helvetica';
-            border-collapse: collapse;
-        }
-        .sub_account {
-            font-size: small;
-            font-family: 'Helvetica';
-            font-style: italic;
-        }
-        .negative {
-            font-size: small;
-            font-family: 'Helvetica';
-            background-color: #fde1e5
-        }
-        .positive {
-            font-size: small;
-            font-family: 'Helvetica';
-            background-color: #bfffd5;
-        }
-        .positive_italic {
-            font-size: smaller;
-            font-family: 'Helvetica';
-            background-color: #bfffd5;
-            font-style: italic;
-        }
-        .negative_italic {
-            font-size: smaller;
-            font-family: 'Helvetica';
-            background-color: #fde1e5;
-            font-style: italic;
-        }
-        .centered {
-            text-align: center;
-        }
-        .confirmed {
-            text-decoration: green underline overline wavy;
-        }
-    </style>"""
-        body = "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"UTF-8\">\n<title>Report</title>\n" + css + "</head>\n<body>\n" + html + "\n</body>\n</html>"
-        return body
+        yield html
+        yield "\n</body>\n</html>"
+
+    def iterRowCells(self, account):
+        """
+        Walks the cells of an account shown in the report, from the start to the end of the Budget.
+        :param account: Account of the row.
+        :return: Generator of (amount, confirmed class) tuples.
+        """
+        ledger = account.ledger
+        for month in range(max(self.start, ledger.first), min(self.end, ledger.last()) + 1):
+            first = (month - ledger.first) * ledger.daysof
+            for index in range(first, first + ledger.daysof):
+                if (ledger.present[index]):
+                    yield ledger.amounts[index], " confirmed" if ledger.confirmed[index] else ""
 
     def generateHtmlFile(self, file_name="report.html"):
         """
-        Generates the file of the HTML Budget.
+        Generates the file of the HTML Budget, writing the report as it is generated.
         :param file_name: Name of the file.
         :return: None
         """
         with open(file_name, "w") as text_file:
-            text_file.write(self.generateHTMLTable())
\ No newline at end of file
+            text_file.writelines(self.iterHTMLTable())
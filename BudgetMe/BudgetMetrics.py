@@ -0,0 +1,221 @@
+import functools
+import math
+import threading
+import time
+from collections import deque
+
+from BudgetMe.Account import Account
+from BudgetMe.Budget import Budget
+from BudgetMe.BudgetMeHtmlPlugIn import BudgetMeHtml
+from BudgetMe.Ledger import Ledger
+
+# Methods timed while the metrics are enabled, by the class that defines them.
+ENTRY_POINTS = {
+    Budget: ["asdict", "addAccount", "addSingleAccount", "getAccountBalance", "getBalanceByCategories",
+             "getTotalBalanceByCategory", "getFinalBalance", "getRunningBalances", "getRunningBalance",
+             "getMonthBalance", "getMonthDayBalance", "getPeriodTotals", "getYearlySummaries", "getMatrix",
+             "detectNegativeBalance", "preventNegativeBalance", "calcualtePotentialSavings", "updateTransaction",
+             "updateTransactions", "createBudgetFromJson", "loadJson", "loadSnapshot"],
+    Account: ["init", "asdict", "getFinalBalance", "getMonthBalance", "getMonthDayBalance", "getRunningBalance"],
+    BudgetMeHtml: ["generateHTMLTable"],
+}
+# Ledger methods that read cells, with the number of cells each call reads.
+SCANS = {
+    "getMonthBalance": lambda ledger, *args, **kwargs: ledger.daysof,
+    "getMonthDayBalance": lambda ledger, *args, **kwargs: 1,
+    "getMonth": lambda ledger, *args, **kwargs: ledger.daysof,
+    "indexes": lambda ledger, *args, **kwargs: len(ledger.present),
+}
+# Latest latencies kept per method or route to compute the 95th percentile.
+SAMPLES = 1024
+
+
+class BudgetMetrics:
+    """
+    Opt-in instrumentation of the main Budget and Account methods, exported in the Prometheus text format.
+    enable() wraps the methods of ENTRY_POINTS, and the Ledger methods that read cells, to record the calls, their
+    latency and the forecasts (ledger cells) read during each call; disable() puts the original methods back. While
+    disabled nothing is wrapped, so the metrics cost nothing. Latencies and forecasts are inclusive: a call to
+    Budget.getFinalBalance also counts in the Account.getFinalBalance calls it makes.
+    Only one BudgetMetrics can be enabled at a time.
+    """
+
+    active = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.calls = {}
+        self.requests = {}
+        self.originals = []
+        self.enabled = False
+
+    def enable(self):
+        """
+        Starts recording the calls of the instrumented methods.
+        :return: None
+        """
+        if self.enabled:
+            return
+        if BudgetMetrics.active is not None:
+            BudgetMetrics.active.disable()
+        for owner, names in ENTRY_POINTS.items():
+            for name in names:
+                self.wrap(owner, name, self.timed("%s.%s" % (owner.__name__, name), owner.__dict__[name]))
+        for name, count in SCANS.items():
+            self.wrap(Ledger, name, self.counted(Ledger.__dict__[name], count))
+        self.enabled = True
+        BudgetMetrics.active = self
+
+    def disable(self):
+        """
+        Stops recording and puts the original methods back. The metrics recorded so far are kept.
+        :return: None
+        """
+        for owner, name, original in reversed(self.originals):
+            setattr(owner, name, original)
+        self.originals = []
+        self.enabled = False
+        if BudgetMetrics.active is self:
+            BudgetMetrics.active = None
+
+    def wrap(self, owner, name, wrapper):
+        original = owner.__dict__[name]
+        if isinstance(original, classmethod):
+            wrapper = classmethod(wrapper)
+        elif isinstance(original, staticmethod):
+            wrapper = staticmethod(wrapper)
+        self.originals.append((owner, name, original))
+        setattr(owner, name, wrapper)
+
+    def timed(self, name, method):
+        """
+        Returns a function that calls a method and records its latency and the forecasts it read.
+        :param name: Name of the method in the metrics.
+        :param method: Method, or the function of a classmethod or staticmethod.
+        :return: function
+        """
+        function = method.__func__ if isinstance(method, (classmethod, staticmethod)) else method
+        local = self.local
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            scanned = getattr(local, "scanned", 0)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - started, getattr(local, "scanned", 0) - scanned)
+        return wrapper
+
+    def counted(self, function, count):
+        """
+        Returns a function that calls a Ledger method and adds the cells it reads to the forecasts of this thread.
+        :param function: Ledger method.
+        :param count: Function returning the cells read by a call, from the same arguments.
+        :return: function
+        """
+        local = self.local
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            local.scanned = getattr(local, "scanned", 0) + count(*args, **kwargs)
+            return function(*args, **kwargs)
+        return wrapper
+
+    def record(self, name, seconds, scanned=0):
+        """
+        Records a call of an instrumented method.
+        :param name: Name of the method.
+        :param seconds: Latency of the call.
+        :param scanned: Forecasts read during the call.
+        :return: None
+        """
+        with self.lock:
+            stat = self.calls.get(name)
+            if stat is None:
+                stat = self.calls[name] = {"count": 0, "seconds": 0.0, "scanned": 0, "samples": deque(maxlen=SAMPLES)}
+            stat["count"] += 1
+            stat["seconds"] += seconds
+            stat["scanned"] += scanned
+            stat["samples"].append(seconds)
+
+    def recordRequest(self, route, status, seconds):
+        """
+        Records a request served by the application.
+        :param route: Rule of the route, like '/budgets/<name>/'.
+        :param status: HTTP status of the response.
+        :param seconds: Time spent serving the request.
+        :return: None
+        """
+        with self.lock:
+            stat = self.requests.get(route)
+            if stat is None:
+                stat = self.requests[route] = {"count": 0, "seconds": 0.0, "statuses": {},
+                                               "samples": deque(maxlen=SAMPLES)}
+            stat["count"] += 1
+            stat["seconds"] += seconds
+            stat["statuses"][status] = stat["statuses"].get(status, 0) + 1
+            stat["samples"].append(seconds)
+
+    def getStats(self) -> dict:
+        """
+        Returns the calls, seconds, 95th percentile latency and forecasts read of every method called so far.
+        :return: dict
+        """
+        with self.lock:
+            return {name: {"count": stat["count"], "seconds": stat["seconds"], "scanned": stat["scanned"],
+                           "p95": percentile(stat["samples"], 0.95)} for name, stat in self.calls.items()}
+
+    def getText(self) -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        :return: str
+        """
+        lines = []
+        with self.lock:
+            calls = sorted(self.calls.items())
+            requests = sorted(self.requests.items())
+            lines.append("# HELP bac_call_seconds Latency of the instrumented Budget and Account methods.")
+            lines.append("# TYPE bac_call_seconds summary")
+            for name, stat in calls:
+                labels = 'method="%s"' % escape(name)
+                lines.append('bac_call_seconds{%s,quantile="0.95"} %r' % (labels, percentile(stat["samples"],
+                                                                                            0.95)))
+                lines.append("bac_call_seconds_sum{%s} %r" % (labels, stat["seconds"]))
+                lines.append("bac_call_seconds_count{%s} %d" % (labels, stat["count"]))
+            lines.append("# HELP bac_forecasts_scanned_total Forecasts read by the instrumented methods.")
+            lines.append("# TYPE bac_forecasts_scanned_total counter")
+            for name, stat in calls:
+                lines.append('bac_forecasts_scanned_total{method="%s"} %d' % (escape(name), stat["scanned"]))
+            lines.append("# HELP bac_request_seconds Time spent serving the requests of each route.")
+            lines.append("# TYPE bac_request_seconds summary")
+            for route, stat in requests:
+                labels = 'route="%s"' % escape(route)
+                lines.append('bac_request_seconds{%s,quantile="0.95"} %r' % (labels, percentile(stat["samples"],
+                                                                                               0.95)))
+                lines.append("bac_request_seconds_sum{%s} %r" % (labels, stat["seconds"]))
+                lines.append("bac_request_seconds_count{%s} %d" % (labels, stat["count"]))
+            lines.append("# HELP bac_requests_total Requests of each route, by status.")
+            lines.append("# TYPE bac_requests_total counter")
+            for route, stat in requests:
+                for status, count in sorted(stat["statuses"].items()):
+                    lines.append('bac_requests_total{route="%s",status="%s"} %d' % (escape(route), status, count))
+        lines.append("# HELP bac_metrics_enabled 1 while the methods are instrumented.")
+        lines.append("# TYPE bac_metrics_enabled gauge")
+        lines.append("bac_metrics_enabled %d" % (1 if self.enabled else 0))
+        return "\n".join(lines) + "\n"
+
+
+def percentile(samples, fraction) -> float:
+    """
+    Returns a percentile of some samples (nearest rank), or 0 without samples.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
@@ -0,0 +1,201 @@
+import heapq
+from bisect import bisect_left
+
+from BudgetMe.BudgetException import BudgetAccountParametersInvalid
+
+# Amounts closer than this are the same amount.
+EPSILON = 1e-9
+
+
+class BudgetReconcile:
+    """
+    Matches actual bank transactions with the open (unconfirmed) forecasts of a Budget, and confirms the matches.
+    The open forecasts are indexed by bank, sign and day slot (month and ordinal day), each slot holding its amounts
+    sorted, so the candidates of a transaction are found with a binary search on the slots within 'day_tolerance',
+    walking outward from the amount and skipping the forecasts already matched, instead of comparing it with every
+    forecast. A forecast is a candidate when its amount differs by at most the larger of 'amount_tolerance' and
+    'relative_tolerance' times the amount.
+    Each candidate has a confidence: 1 for the same amount on the same day, down to 0.5 at the amount tolerance and
+    0.5 at the day tolerance (0.25 at both). Matches are assigned from the most confident down, so every
+    transaction and forecast is matched at most once: a transaction whose best candidate was taken moves on to its
+    next one.
+    """
+
+    def __init__(self, budget, amount_tolerance=0.0, relative_tolerance=0.0, day_tolerance=0, candidates=1):
+        """
+        :param budget: Budget to reconcile.
+        :param amount_tolerance: Largest difference of amount of a match.
+        :param relative_tolerance: Largest difference of amount of a match, as a fraction of the amount.
+        :param day_tolerance: Largest number of ordinal days between a transaction and its forecast.
+        :param candidates: Candidates looked up at once per transaction. Transactions whose candidates were all
+        taken are searched again without them.
+        """
+        if candidates < 1:
+            raise BudgetAccountParametersInvalid("Candidates (%s) must be at least 1." % candidates)
+        self.budget = budget
+        self.amount_tolerance = amount_tolerance
+        self.relative_tolerance = relative_tolerance
+        self.day_tolerance = day_tolerance
+        self.candidates = candidates
+        self.index = {}
+
+    def buildIndex(self):
+        """
+        Indexes the open forecasts of the accounts with a bank by (bank, sign, slot), with their amounts sorted.
+        Each slot also keeps, for the lookups to skip the matched forecasts, the next position not matched at or
+        after each one ('after') and at or before it ('before', shifted by one so -1 is 0).
+        :return: None
+        """
+        index = {}
+        daysof = self.budget.daysof
+        for account in self.budget.transactions:
+            bank = getattr(account.bank, "name", None)
+            if bank is None:
+                continue
+            ledger = account.ledger
+            amounts, confirmed = ledger.amounts, ledger.confirmed
+            for cell in ledger.indexes():
+                amount = amounts[cell]
+                if confirmed[cell] or not amount:
+                    continue
+                month, day = ledger.position(cell)
+                slot = (month - 1) * daysof + day - 1
+                index.setdefault((bank, amount > 0, slot), []).append((abs(amount), account.name, month, day, amount))
+        self.index = {}
+        for key, entries in index.items():
+            entries.sort()
+            self.index[key] = ([entry[0] for entry in entries], entries, list(range(len(entries) + 1)),
+                               list(range(len(entries) + 1)))
+
+    def reconcile(self, transactions, confirm=True, update=True) -> dict:
+        """
+        Matches actual transactions with the open forecasts and, unless confirm is False, confirms the matches.
+        :param transactions: Iterable of (bank name, date, amount). The date is a date or a (month, day) tuple.
+        :param confirm: False to only report the matches.
+        :param update: True to also set the amount of the matched forecasts to the actual amount.
+        :return: Dictionary with the "matched" transactions (with their forecast, the ordinal days from the
+        transaction to the forecast and the confidence), the row numbers of the "unmatched" ones and the number of
+        forecasts still "open".
+        """
+        self.buildIndex()
+        unmatched = []
+        queues = {}
+        heap = []
+        for number, (bank, day, amount) in enumerate(transactions):
+            month, day = self.budget.getMonthDay(day) if hasattr(day, "year") else day
+            if not amount:
+                unmatched.append(number)
+                continue
+            row = (number, bank, month, day, amount)
+            queues[number] = [], True
+            if not self.pushCandidate(heap, queues, row):
+                unmatched.append(number)
+        matched = {}
+        while heap:
+            candidate = heapq.heappop(heap)
+            order, distance, number, row, entry, days_apart, slot, position = candidate
+            if self.isMatched(slot, position):
+                if not self.pushCandidate(heap, queues, row):
+                    unmatched.append(number)
+                continue
+            self.setMatched(slot, position)
+            del queues[number]
+            matched[number] = {"row": number, "bank": row[1], "amount": row[4], "account": entry[1],
+                               "month": entry[2], "day": entry[3], "forecast": entry[4], "days_apart": days_apart,
+                               "confidence": -order}
+        matches = [matched[number] for number in sorted(matched)]
+        if confirm and matches:
+            if update:
+                self.budget.updateTransactions((match["account"], match["month"], match["day"], match["amount"])
+                                               for match in matches)
+            else:
+                self.budget.confirmTransactions((match["account"], match["month"], match["day"])
+                                                for match in matches)
+        opened = sum(len(slot[0]) for slot in self.index.values())
+        return {"matched": matches, "unmatched": sorted(unmatched),
+                "open": opened - (len(matches) if confirm else 0)}
+
+    def pushCandidate(self, heap, queues, row) -> bool:
+        """
+        Pushes the next candidate of a transaction not matched yet, looking up more when its queue runs out.
+        :param heap: Heap of the best candidate of each transaction.
+        :param queues: Dictionary with the remaining candidates of each transaction, and whether there can be more.
+        :param row: Tuple (number, bank, month, day, amount).
+        :return: False when the transaction has no candidates left.
+        """
+        queue, more = queues[row[0]]
+        while True:
+            while queue:
+                candidate = queue.pop()
+                if not self.isMatched(candidate[6], candidate[7]):
+                    heapq.heappush(heap, candidate)
+                    return True
+            if not more:
+                del queues[row[0]]
+                return False
+            queue, more = self.getCandidates(row)
+            queue.reverse()
+            queues[row[0]] = queue, more
+
+    def getCandidates(self, row) -> tuple:
+        """
+        Returns the best candidates of a transaction, leaving out the forecasts already matched. In every slot within
+        the day tolerance the lookup starts at the position of the amount and walks outward, to the closest amount
+        first, until it has enough candidates or leaves the amount tolerance.
+        :param row: Tuple (number, bank, month, day, amount).
+        :return: Tuple with the list of (-confidence, amount difference, number, row, index entry, days apart, slot,
+        position), best first, and whether there can be more candidates.
+        """
+        number, bank, month, day, amount = row
+        size = abs(amount)
+        window = max(self.amount_tolerance, self.relative_tolerance * size)
+        low, high = size - window - EPSILON, size + window + EPSILON
+        start = (month - 1) * self.budget.daysof + day - 1
+        candidates = []
+        more = False
+        for shift in range(-self.day_tolerance, self.day_tolerance + 1):
+            slot = self.index.get((bank, amount > 0, start + shift))
+            if slot is None:
+                continue
+            keys, entries, after, before = slot
+            position = bisect_left(keys, size)
+            left = findRoot(before, position) - 1
+            right = findRoot(after, position)
+            found = 0
+            while found < self.candidates:
+                if left >= 0 and keys[left] >= low and (right >= len(keys) or keys[right] > high or
+                                                        size - keys[left] <= keys[right] - size):
+                    position, left = left, findRoot(before, left) - 1
+                elif right < len(keys) and keys[right] <= high:
+                    position, right = right, findRoot(after, right + 1)
+                else:
+                    break
+                entry = entries[position]
+                distance = abs(entry[0] - size)
+                confidence = (1 - 0.5 * min(1.0, distance / window) if window > 0 else 1.0) * \
+                             (1 - 0.5 * abs(shift) / self.day_tolerance if self.day_tolerance else 1.0)
+                candidates.append((-round(confidence, 4), distance, number, row, entry, shift, slot, position))
+                found += 1
+            more = more or found == self.candidates
+        return heapq.nsmallest(self.candidates, candidates), more or len(candidates) > self.candidates
+
+    @staticmethod
+    def isMatched(slot, position) -> bool:
+        return slot[2][position] != position
+
+    @staticmethod
+    def setMatched(slot, position):
+        slot[2][position] = position + 1
+        slot[3][position + 1] = position
+
+
+def findRoot(parents, position) -> int:
+    """
+    Follows the parents of a position to the one that is its own parent, shortening the path on the way.
+    """
+    root = position
+    while parents[root] != root:
+        root = parents[root]
+    while parents[position] != root:
+        parents[position], position = root, parents[position]
+    return root
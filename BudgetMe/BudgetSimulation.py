@@ -0,0 +1,119 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from BudgetMe.BudgetException import BudgetAccountNotFound, BudgetAccountParametersInvalid
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+class BudgetSimulation:
+    """
+    Monte Carlo simulation of the running balances of a Budget.
+    Accounts with a distribution get their monthly amount multiplied by a random factor in every scenario and
+    month; the other accounts keep their forecast. Scenarios are sampled in batches, one matrix per batch, and the
+    batches are spread across a process pool.
+
+    Distributions, by account name:
+    {"distribution": "normal", "stdev": 0.1}: factor with mean 1 and the given standard deviation.
+    {"distribution": "lognormal", "sigma": 0.2}: positive factor with mean 1.
+    {"distribution": "uniform", "low": 0.8, "high": 1.2}: factor between low and high.
+    {"distribution": "optional", "probability": 0.5}: the amount happens (factor 1) or not (factor 0).
+    """
+
+    def __init__(self, budget, distributions):
+        matrix = budget.getMatrix()
+        self.start = max(budget.start, 1)
+        self.end = budget.end
+        first = 1 - matrix.first
+        amounts = np.zeros((len(matrix.names), self.end))
+        available = matrix.account_months[:, first:first + self.end]
+        amounts[:, :available.shape[1]] = available
+        self.specs = []
+        rows = []
+        for account_name, spec in distributions.items():
+            if account_name not in matrix.rows:
+                raise BudgetAccountNotFound("Account %s not found." % account_name)
+            rows.append(matrix.rows[account_name])
+            self.specs.append(BudgetSimulation.validate(account_name, spec))
+        self.variable = amounts[rows]
+        self.fixed = np.delete(amounts, rows, axis=0).sum(axis=0)
+
+    @staticmethod
+    def validate(account_name, spec) -> dict:
+        """
+        Checks the distribution of an account.
+        :param account_name: Name of the account.
+        :param spec: Distribution of the account.
+        :return: The distribution with its defaults.
+        """
+        defaults = {"normal": {"stdev": 0.1}, "lognormal": {"sigma": 0.2}, "uniform": {"low": 0.8, "high": 1.2},
+                    "optional": {"probability": 0.5}}
+        kind = spec.get("distribution")
+        if kind not in defaults:
+            raise BudgetAccountParametersInvalid("Distribution of %s must be one of %s." % (account_name,
+                                                                                            list(defaults)))
+        spec = dict(defaults[kind], **spec)
+        if kind == "optional" and not 0 <= spec["probability"] <= 1:
+            raise BudgetAccountParametersInvalid("Probability of %s must be between 0 and 1." % account_name)
+        if kind == "uniform" and spec["low"] > spec["high"]:
+            raise BudgetAccountParametersInvalid("Low of %s must not be greater than high." % account_name)
+        return spec
+
+    def run(self, scenarios=10000, seed=None, workers=None, batch=10000) -> dict:
+        """
+        Samples the scenarios and summarizes their running balances month by month.
+        :param scenarios: Number of scenarios.
+        :param seed: Seed of the random numbers. The same seed gives the same result with any number of workers.
+        :param workers: Number of processes. Defaults to the number of CPUs; 1 runs in this process.
+        :param batch: Maximum number of scenarios sampled together.
+        :return: Dictionary with the months, the mean, the percentiles and the probability of a negative running
+        balance of each month, and the probability of going negative in any month.
+        """
+        if scenarios < 1:
+            raise BudgetAccountParametersInvalid("Scenarios (%s) must be greater than zero." % scenarios)
+        sizes = [min(batch, scenarios - done) for done in range(0, scenarios, batch)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        jobs = [(self.fixed, self.variable, self.specs, size, batch_seed) for size, batch_seed in zip(sizes, seeds)]
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        if workers <= 1:
+            results = [simulateBatch(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(simulateBatch, *zip(*jobs)))
+        running = np.concatenate(results)[:, self.start - 1:]
+        negative = running < 0
+        return {"scenarios": scenarios, "months": list(range(self.start, self.end + 1)),
+                "mean": running.mean(axis=0).tolist(),
+                "percentiles": {p: v.tolist() for p, v in zip(PERCENTILES, np.percentile(running, PERCENTILES,
+                                                                                          axis=0))},
+                "negative_probability": negative.mean(axis=0).tolist(),
+                "any_negative_probability": float(negative.any(axis=1).mean())}
+
+
+def simulateBatch(fixed, variable, specs, size, seed):
+    """
+    Samples a batch of scenarios.
+    :param fixed: Amount of every month of the accounts without distribution, added up.
+    :param variable: Amount of every month of each account with a distribution.
+    :param specs: Distribution of each variable account.
+    :param size: Number of scenarios.
+    :param seed: SeedSequence of the batch.
+    :return: Running balance of every scenario and month.
+    """
+    generator = np.random.default_rng(seed)
+    months = np.broadcast_to(fixed, (size, len(fixed))).copy()
+    for amounts, spec in zip(variable, specs):
+        shape = (size, len(amounts))
+        kind = spec["distribution"]
+        if kind == "normal":
+            factors = generator.normal(1.0, spec["stdev"], shape)
+        elif kind == "lognormal":
+            factors = generator.lognormal(-spec["sigma"] ** 2 / 2, spec["sigma"], shape)
+        elif kind == "uniform":
+            factors = generator.uniform(spec["low"], spec["high"], shape)
+        else:
+            factors = generator.random(shape) < spec["probability"]
+        months += factors * amounts
+    return np.cumsum(months, axis=1)
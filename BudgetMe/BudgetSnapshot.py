@@ -0,0 +1,279 @@
+import bisect
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from BudgetMe.Account import Account
+from BudgetMe.Bank import Bank
+from BudgetMe.BudgetException import BudgetAccountParametersInvalid
+
+MAGIC = b"BACS"
+VERSION = 1
+NONE = 0xFFFFFFFF
+NO_BANK = -1
+
+# magic, version, reserved, year, daysof, start, end, strings, banks, accounts, bank transactions, cells, notes
+HEADER = struct.Struct("<4sHHiiiiIIIQQQ")
+# name, balance, listed in the budget, first transaction, transactions
+BANK = struct.Struct("<IdIQQ")
+# name, account, category, txn_mode, parent, bank, year, frequency, start, budget_start, budget_end, periodical,
+# transfer_balance, balance, first day, days, ledger first month, periods, daysof, count, first cell
+ACCOUNT = struct.Struct("<IIIIIiiiiiiBBxxdQQiiiIQ")
+# cell, note
+NOTE = struct.Struct("<QI")
+
+
+class BudgetSnapshot:
+    """
+    Binary snapshot of a Budget.
+    The cells of every ledger are stored back to back as typed arrays (amounts, planned and previous as doubles,
+    confirmed and present as bytes) and every name is stored once in a string table. Loading memory maps the file
+    and points each ledger at its slice of the arrays, so opening a snapshot does not read the cells; the pages
+    are read when the cells are first used. The mapping is copy on write: changing the Budget never changes the
+    file.
+
+    Layout, little endian, every section aligned to 8 bytes:
+    header, string offsets (strings + 1 x u32), string data (utf-8), banks, accounts, bank transaction ids (u32),
+    bank transaction amounts (f64), account days (f64), amounts (f64), planned (f64), previous (f64),
+    confirmed (u8), present (u8), notes.
+    """
+
+    @staticmethod
+    def save(budget, filename):
+        """
+        Writes a snapshot of a Budget.
+        :param budget: Budget to save.
+        :param filename: Name of the file.
+        :return: None
+        """
+        strings = StringTable()
+        strings.add(json.dumps({"days_labels": budget.days_labels, "template": budget.getTemplateWithoutTransactions()}))
+        banks = list(budget.banks)
+        listed = len(banks)
+        bank_positions = {id(bank): position for position, bank in enumerate(banks)}
+        for account in budget.transactions:
+            if isinstance(account.bank, Bank) and id(account.bank) not in bank_positions:
+                bank_positions[id(account.bank)] = len(banks)
+                banks.append(account.bank)
+        bank_records = []
+        txn_ids = array("I")
+        txn_amounts = array("d")
+        for position, bank in enumerate(banks):
+            transactions = bank.transactions
+            bank_records.append(BANK.pack(strings.add(bank.name), bank.balance, 1 if position < listed else 0,
+                                          len(txn_ids), len(transactions)))
+            for txn in transactions:
+                txn_ids.append(strings.add(txn["id"]))
+                txn_amounts.append(txn["amount"])
+        account_records = []
+        days = array("d")
+        amounts = array("d")
+        planned = array("d")
+        previous = array("d")
+        confirmed = bytearray()
+        present = bytearray()
+        notes = []
+        for account in budget.transactions:
+            ledger = account.ledger
+            first_cell = len(amounts)
+            bank = bank_positions.get(id(account.bank), NO_BANK) if isinstance(account.bank, Bank) else NO_BANK
+            try:
+                account_records.append(ACCOUNT.pack(
+                    strings.add(account.name), strings.add(account.account), strings.add(account.category),
+                    strings.add(account.txn_mode), strings.add(account.parent), bank, account.year,
+                    account.frequency, account.start, account.budget_start, account.budget_end,
+                    1 if account.periodical else 0, 1 if account.transfer_balance else 0, account.balance,
+                    len(days), len(account.days), ledger.first, ledger.periods, ledger.daysof, ledger.count,
+                    first_cell))
+            except struct.error as error:
+                raise BudgetAccountParametersInvalid("Account %s cannot be saved: %s" % (account.name, error))
+            days.extend(account.days)
+            amounts.extend(ledger.amounts)
+            planned.extend(ledger.planned)
+            previous.extend(ledger.previous)
+            confirmed.extend(ledger.confirmed)
+            present.extend(ledger.present)
+            for index, note in sorted(ledger.notes.items()):
+                notes.append(NOTE.pack(first_cell + index, strings.add(note)))
+        sections = [strings.offsets(), strings.data(), b"".join(bank_records), b"".join(account_records),
+                    txn_ids, txn_amounts, days, amounts, planned, previous, confirmed, present, b"".join(notes)]
+        header = HEADER.pack(MAGIC, VERSION, 0, budget.year, budget.daysof, budget.start, budget.end,
+                             len(strings), len(banks), len(budget.transactions), len(txn_ids), len(amounts),
+                             len(notes))
+        with open(filename, "wb") as file:
+            for section in [header] + sections:
+                data = BudgetSnapshot.toBytes(section)
+                file.write(data)
+                file.write(bytes(-len(data) % 8))
+
+    @staticmethod
+    def load(filename, budget_class):
+        """
+        Opens a snapshot. The cells of the ledgers stay in the memory mapped file until they are used.
+        :param filename: Name of the file.
+        :param budget_class: Class of the Budget to create.
+        :return: Budget
+        """
+        with open(filename, "rb") as file:
+            buffer = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY))
+        reader = SnapshotReader(buffer)
+        (magic, version, reserved, year, daysof, start, end, string_count, bank_count, account_count, txn_count,
+         cell_count, note_count) = reader.readStruct(HEADER)
+        if magic != MAGIC:
+            raise BudgetAccountParametersInvalid("%s is not a budget snapshot." % filename)
+        if version != VERSION:
+            raise BudgetAccountParametersInvalid("Snapshot version %s is not supported." % version)
+        offsets = reader.readArray("I", string_count + 1)
+        data = reader.readBytes(offsets[-1] if string_count > 0 else 0)
+        strings = [str(data[offsets[i]:offsets[i + 1]], "utf-8") for i in range(string_count)]
+        bank_records = reader.readRecords(BANK, bank_count)
+        account_records = reader.readRecords(ACCOUNT, account_count)
+        txn_ids = reader.readArray("I", txn_count)
+        txn_amounts = reader.readArray("d", txn_count)
+        days = reader.readArray("d", sum(record[15] for record in account_records))
+        amounts = reader.readArray("d", cell_count)
+        planned = reader.readArray("d", cell_count)
+        previous = reader.readArray("d", cell_count)
+        confirmed = reader.readArray("B", cell_count)
+        present = reader.readArray("B", cell_count)
+        note_records = reader.readRecords(NOTE, note_count)
+
+        def text(index):
+            return None if index == NONE else strings[index]
+
+        meta = json.loads(strings[0])
+        budget = budget_class(year, daysof=daysof, start=start, end=end)
+        budget.days_labels = meta["days_labels"]
+        budget.template = meta["template"]
+        banks = []
+        for name, balance, listed, first, count in bank_records:
+            bank = Bank(name=text(name), initial_balance=balance)
+            bank.transaction_loader = BudgetSnapshot.transactionLoader(strings, txn_ids, txn_amounts, first, count)
+            banks.append(bank)
+            if listed:
+                budget.banks.append(bank)
+                budget.indexBank(bank)
+        note_cells = [cell for cell, note in note_records]
+        for (name, account_name, category, txn_mode, parent, bank, account_year, frequency, account_start,
+             budget_start, budget_end, periodical, transfer_balance, balance, first_day, day_count, first_month,
+             periods, ledger_daysof, count, first_cell) in account_records:
+            account = Account(text(account_name), year=account_year, category=text(category), frequency=frequency,
+                              start=account_start, bank=banks[bank] if bank != NO_BANK else None,
+                              periodical=periodical == 1, txn_mode=text(txn_mode), budget_start=budget_start,
+                              budget_end=budget_end, parent=text(parent))
+            account.name = text(name)
+            account.transfer_balance = transfer_balance == 1
+            account.balance = balance
+            account.days = [number(v) for v in days[first_day:first_day + day_count]]
+            ledger = account.ledger
+            size = periods * ledger_daysof
+            last_cell = first_cell + size
+            ledger.first = first_month
+            ledger.periods = periods
+            ledger.daysof = ledger_daysof
+            ledger.count = count
+            ledger.amounts = amounts[first_cell:last_cell]
+            ledger.planned = planned[first_cell:last_cell]
+            ledger.previous = previous[first_cell:last_cell]
+            ledger.confirmed = confirmed[first_cell:last_cell]
+            ledger.present = present[first_cell:last_cell]
+            for position in range(bisect.bisect_left(note_cells, first_cell), bisect.bisect_left(note_cells, last_cell)):
+                cell, note = note_records[position]
+                ledger.notes[cell - first_cell] = text(note)
+            budget.transactions.append(account)
+            budget.indexAccount(account)
+        budget.restoreBankTimelines()
+        return budget
+
+    @staticmethod
+    def transactionLoader(strings, ids, amounts, first, count):
+        def load():
+            return [{"id": strings[ids[i]], "amount": number(amounts[i])} for i in range(first, first + count)]
+        return load
+
+    @staticmethod
+    def toBytes(section) -> bytes:
+        if isinstance(section, array):
+            if sys.byteorder != "little":
+                section = array(section.typecode, section)
+                section.byteswap()
+            return section.tobytes()
+        return bytes(section)
+
+
+class StringTable:
+    """
+    Strings of a snapshot, each stored once.
+    """
+
+    def __init__(self):
+        self.positions = {}
+        self.encoded = []
+
+    def __len__(self):
+        return len(self.encoded)
+
+    def add(self, value) -> int:
+        """
+        Returns the position of a string in the table, adding it when it is new.
+        :param value: String, or None.
+        :return: int
+        """
+        if value is None:
+            return NONE
+        value = str(value)
+        position = self.positions.get(value)
+        if position is None:
+            position = len(self.encoded)
+            self.positions[value] = position
+            self.encoded.append(value.encode("utf-8"))
+        return position
+
+    def offsets(self) -> array:
+        offsets = array("I", [0])
+        for encoded in self.encoded:
+            offsets.append(offsets[-1] + len(encoded))
+        return offsets
+
+    def data(self) -> bytes:
+        return b"".join(self.encoded)
+
+
+class SnapshotReader:
+    """
+    Reads the sections of a snapshot in order from a buffer.
+    """
+
+    def __init__(self, buffer: memoryview):
+        self.buffer = buffer
+        self.position = 0
+
+    def readBytes(self, size) -> memoryview:
+        if self.position + size > len(self.buffer):
+            raise BudgetAccountParametersInvalid("The snapshot is truncated.")
+        view = self.buffer[self.position:self.position + size]
+        self.position += size + (-size % 8)
+        return view
+
+    def readStruct(self, layout: struct.Struct) -> tuple:
+        return layout.unpack(self.readBytes(layout.size))
+
+    def readRecords(self, layout: struct.Struct, count) -> list:
+        return list(layout.iter_unpack(self.readBytes(layout.size * count)))
+
+    def readArray(self, typecode, count):
+        view = self.readBytes(array(typecode).itemsize * count)
+        if sys.byteorder != "little" and typecode != "B":
+            values = array(typecode, view.tobytes())
+            values.byteswap()
+            return values
+        return view.cast(typecode)
+
+
+def number(value):
+    """
+    Returns whole doubles as int, the way they were before being stored.
+    """
+    return int(value) if value.is_integer() else value
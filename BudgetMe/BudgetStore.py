@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from BudgetMe.Budget import Budget
+from BudgetMe.BudgetException import BudgetNotFound
+
+
+class BudgetStore:
+    """
+    Budgets loaded on demand from a folder of JSON documents produced by Budget.asdict(), one '<name>.json' per
+    Budget. The most recently used Budgets are kept in memory, up to 'capacity' of them. Every lookup compares the
+    modification time and size of the file with the ones it was loaded from and reloads it when they differ.
+    A reload builds a new Budget and swaps it in; requests still holding the previous one keep using it.
+    """
+
+    def __init__(self, folder, capacity=8, budget_class=Budget):
+        self.folder = folder
+        self.capacity = capacity
+        self.budget_class = budget_class
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def getPath(self, name) -> str:
+        """
+        Returns the path of the file of a Budget.
+        :param name: Name of the Budget.
+        :return: str
+        """
+        if not name or name.startswith(".") or os.path.basename(name) != name:
+            raise BudgetNotFound("Budget %s not found." % name)
+        return os.path.join(self.folder, name + ".json")
+
+    def getNames(self) -> list:
+        """
+        Returns the names of the Budgets available in the folder.
+        :return: list
+        """
+        return sorted(f[:-5] for f in os.listdir(self.folder) if f.endswith(".json") and not f.startswith("."))
+
+    def get(self, name) -> Budget:
+        """
+        Returns a Budget, loading it when it is not in memory or when its file changed since it was loaded.
+        :param name: Name of the Budget.
+        :return: Budget
+        """
+        path = self.getPath(name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self.lock:
+                self.entries.pop(name, None)
+            raise BudgetNotFound("Budget %s not found." % name)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry[0] == stamp:
+                self.entries.move_to_end(name)
+                return entry[1]
+        # Loading happens outside the lock so other Budgets keep being served meanwhile.
+        budget = self.load(path)
+        with self.lock:
+            self.entries[name] = (stamp, budget)
+            self.entries.move_to_end(name)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return budget
+
+    def load(self, path) -> Budget:
+        """
+        Builds a Budget from its JSON file.
+        :param path: Path of the file.
+        :return: Budget
+        """
+        with open(path, "r", encoding="utf-8") as file:
+            budget_json = json.load(file)
+        self.loads += 1
+        return self.budget_class.createBudgetFromJson(budget_json)
+
+    def stats(self) -> dict:
+        """
+        Returns the number of Budgets in memory and the load and eviction counters.
+        :return: dict
+        """
+        with self.lock:
+            return {"budgets": len(self.entries), "capacity": self.capacity, "loads": self.loads,
+                    "evictions": self.evictions}
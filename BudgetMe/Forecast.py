@@ -1,12 +1,18 @@
-import  uuid
+import itertools
+
+# Ids of the forecasts created in this process. Cheaper than a uuid and unique.
+FORECAST_IDS = itertools.count(1)
+
 
 class Forecast:
     """
     Forecast is a transaction for an account.
     """
 
+    __slots__ = ("id", "month", "day", "amount", "planned", "previous", "note", "confirmed", "account")
+
     def __init__(self, month, day, amount, note="", previous=0, account=""):
-        self.id = str(uuid.uuid3(uuid.NAMESPACE_DNS, 'bac'))
+        self.id = str(next(FORECAST_IDS))
         self.month = month
         self.day = day
         self.amount = amount
@@ -17,4 +23,4 @@ class Forecast:
         self.account = account
 
     def asdict(self):
-        return {"id": self.id, "month": self.month, "day": self.day, "amount": self.amount, "planned": self.planned, "previous": self.previous, "note": self.note, "caused": self.confirmed, "account": self.account}
\ No newline at end of file
+        return {"id": self.id, "month": self.month, "day": self.day, "amount": self.amount, "planned": self.planned, "previous": self.previous, "note": self.note, "caused": self.confirmed, "account": self.account}
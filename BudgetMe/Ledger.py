@@ -0,0 +1,399 @@
+from BudgetMe.BudgetException import BudgetAccountParametersInvalid
+from BudgetMe.Forecast import Forecast
+
+
+class Ledger:
+    """
+    Dense storage of the transactions of an Account.
+    Cells are laid out month by month, each month holding 'daysof' cells, so every (month, day) lookup is a
+    single index and the balance of a month is a slice of the amounts.
+    """
+
+    def __init__(self, account=""):
+        self.account = account
+        self.first = 1
+        self.periods = 0
+        self.daysof = 0
+        self.amounts = []
+        self.planned = []
+        self.previous = []
+        self.confirmed = bytearray()
+        self.present = bytearray()
+        self.notes = {}
+        self.count = 0
+        # Indexes of the cells holding a transaction when some cells are empty, until a cell is added or moved.
+        self.sparse = None
+
+    def __len__(self):
+        return self.count
+
+    def last(self) -> int:
+        """
+        Returns the last month stored in the ledger.
+        :return: int
+        """
+        return self.first + self.periods - 1
+
+    def clear(self):
+        """
+        Removes all the transactions of the ledger.
+        :return: None
+        """
+        self.__init__(account=self.account)
+
+    def reserve(self, first_month, last_month, daysof):
+        """
+        Allocates the cells for a range of months so filling them does not need to grow the arrays.
+        :param first_month: First month of the range.
+        :param last_month: Last month of the range.
+        :param daysof: Number of days of each month.
+        :return: None
+        """
+        if first_month > last_month or daysof < 1:
+            return
+        self._ensure(first_month, 1)
+        self._ensure(last_month, daysof)
+
+    def _ensure(self, month, day):
+        if day < 1:
+            raise BudgetAccountParametersInvalid("Day (%s) must be greater than zero." % day)
+        if self.periods == 0:
+            self._resize(month, 1, day)
+            return
+        first = min(self.first, month)
+        last = max(self.last(), month)
+        daysof = max(self.daysof, day)
+        if first == self.first and last == self.last() and daysof == self.daysof:
+            return
+        if first == self.first and daysof == self.daysof and isinstance(self.amounts, list):
+            # Growing at the end keeps every index, so the arrays only need to be extended.
+            extra = (last - self.last()) * daysof
+            self.amounts.extend([0] * extra)
+            self.planned.extend([0] * extra)
+            self.previous.extend([0] * extra)
+            self.confirmed.extend(bytearray(extra))
+            self.present.extend(bytearray(extra))
+            self.periods = last - first + 1
+            return
+        self._resize(first, last - first + 1, daysof)
+
+    def materialize(self):
+        """
+        Copies the cells into Python lists and bytearrays when they are views onto a buffer, like the memory
+        mapped file of a snapshot, so the ledger no longer depends on that buffer.
+        :return: None
+        """
+        if isinstance(self.amounts, list):
+            return
+        self.amounts = self.amounts.tolist()
+        self.planned = self.planned.tolist()
+        self.previous = self.previous.tolist()
+        self.confirmed = bytearray(self.confirmed)
+        self.present = bytearray(self.present)
+
+    def copy(self) -> "Ledger":
+        """
+        Returns a ledger with a copy of the cells, as Python lists and bytearrays.
+        :return: Ledger
+        """
+        ledger = Ledger(account=self.account)
+        ledger.first = self.first
+        ledger.periods = self.periods
+        ledger.daysof = self.daysof
+        ledger.amounts = list(self.amounts)
+        ledger.planned = list(self.planned)
+        ledger.previous = list(self.previous)
+        ledger.confirmed = bytearray(self.confirmed)
+        ledger.present = bytearray(self.present)
+        ledger.notes = dict(self.notes)
+        ledger.count = self.count
+        return ledger
+
+    def _resize(self, first, periods, daysof):
+        size = periods * daysof
+        amounts = [0] * size
+        planned = [0] * size
+        previous = [0] * size
+        confirmed = bytearray(size)
+        present = bytearray(size)
+        notes = {}
+        for old in range(len(self.present)):
+            if self.present[old]:
+                month, day = self.position(old)
+                new = (month - first) * daysof + day - 1
+                amounts[new] = self.amounts[old]
+                planned[new] = self.planned[old]
+                previous[new] = self.previous[old]
+                confirmed[new] = self.confirmed[old]
+                present[new] = 1
+                if old in self.notes:
+                    notes[new] = self.notes[old]
+        self.first = first
+        self.periods = periods
+        self.daysof = daysof
+        self.amounts = amounts
+        self.planned = planned
+        self.previous = previous
+        self.confirmed = confirmed
+        self.present = present
+        self.notes = notes
+        self.sparse = None
+
+    def position(self, index) -> tuple:
+        """
+        Translates a cell index into its month and ordinal day.
+        :param index: Index of the cell.
+        :return: Tuple (month, day)
+        """
+        return self.first + index // self.daysof, index % self.daysof + 1
+
+    def find(self, month, day) -> int:
+        """
+        Returns the index of the cell of a month and day, or -1 if there is no transaction there.
+        :param month: Month of the transaction.
+        :param day: Ordinal day of the transaction.
+        :return: int
+        """
+        if day < 1 or day > self.daysof or month < self.first or month > self.last():
+            return -1
+        index = (month - self.first) * self.daysof + day - 1
+        if not self.present[index]:
+            return -1
+        return index
+
+    def index(self, month, day) -> int:
+        """
+        Returns the index of the cell of a month and day.
+        :param month: Month of the transaction.
+        :param day: Ordinal day of the transaction.
+        :return: int
+        """
+        index = self.find(month, day)
+        if index < 0:
+            raise IndexError("There is no transaction for %s on month %s, day %s." % (self.account, month, day))
+        return index
+
+    def put(self, month, day, amount, previous=0, planned=None, confirmed=False, note="") -> int:
+        """
+        Stores a transaction, replacing any transaction in the same month and day.
+        :param month: Month of the transaction.
+        :param day: Ordinal day of the transaction.
+        :param amount: Actual amount.
+        :param previous: Balance transfer from previous month.
+        :param planned: Planned amount. Defaults to the amount.
+        :param confirmed: True if the transaction already happened.
+        :param note: Free text note.
+        :return: Index of the cell.
+        """
+        self._ensure(month, day)
+        index = (month - self.first) * self.daysof + day - 1
+        if not self.present[index]:
+            self.present[index] = 1
+            self.count += 1
+            self.sparse = None
+        self.amounts[index] = amount
+        self.planned[index] = amount if planned is None else planned
+        self.previous[index] = previous
+        self.confirmed[index] = 1 if confirmed else 0
+        if note:
+            self.notes[index] = note
+        else:
+            self.notes.pop(index, None)
+        return index
+
+    def add(self, month, day, amount) -> int:
+        """
+        Adds an amount to the transaction of a month and day, creating it when there is none.
+        :param month: Month of the transaction.
+        :param day: Ordinal day of the transaction.
+        :param amount: Amount to add.
+        :return: Index of the cell.
+        """
+        index = self.find(month, day)
+        if index < 0:
+            return self.put(month, day, amount)
+        self.amounts[index] += amount
+        return index
+
+    def indexes(self) -> list:
+        """
+        Returns the indexes of the cells holding a transaction, in month and day order.
+        :return: list
+        """
+        return list(self.cells())
+
+    def cells(self):
+        """
+        Returns the indexes of the cells holding a transaction without copying them: a range when every cell holds
+        one, otherwise the list kept until a transaction is added in a new cell or the cells are laid out again.
+        The result must not be changed.
+        :return: range or list
+        """
+        if self.count == len(self.present):
+            return range(self.count)
+        if self.sparse is None:
+            self.sparse = [i for i in range(len(self.present)) if self.present[i]]
+        return self.sparse
+
+    def view(self, index) -> "ForecastView":
+        return ForecastView(self, index)
+
+    def getMonth(self, month) -> list:
+        """
+        Returns the transactions of a month.
+        :param month: Month to query.
+        :return: list of ForecastView
+        """
+        if self.periods == 0 or month < self.first or month > self.last():
+            return []
+        start = (month - self.first) * self.daysof
+        return [ForecastView(self, i) for i in range(start, start + self.daysof) if self.present[i]]
+
+    def getMonthBalance(self, month) -> float:
+        """
+        Returns the sum of the amounts of a month.
+        :param month: Month to query.
+        :return: float
+        """
+        if self.periods == 0 or month < self.first or month > self.last():
+            return 0
+        start = (month - self.first) * self.daysof
+        return sum(self.amounts[start:start + self.daysof])
+
+    def getMonthDayBalance(self, month, day) -> float:
+        """
+        Returns the amount of a month and day.
+        :param month: Month to query.
+        :param day: Ordinal day to query.
+        :return: float
+        """
+        index = self.find(month, day)
+        if index < 0:
+            return 0
+        return self.amounts[index]
+
+    def getMonthBalances(self, first_month, last_month) -> list:
+        """
+        Returns the balance of each month of a range.
+        :param first_month: First month of the range.
+        :param last_month: Last month of the range.
+        :return: list
+        """
+        return [self.getMonthBalance(month) for month in range(first_month, last_month + 1)]
+
+    def getBalance(self, first_month, last_month) -> float:
+        """
+        Returns the balance accumulated between two months, both included.
+        :param first_month: First month of the range.
+        :param last_month: Last month of the range.
+        :return: float
+        """
+        return sum(self.getMonthBalances(max(first_month, self.first), min(last_month, self.last())))
+
+
+class ForecastView(Forecast):
+    """
+    Forecast backed by a cell of a Ledger. Reading or writing its values reads or writes the ledger.
+    Its id packs the account, month and day of the cell, so it is unique within a Budget and stays the same for
+    every view of the cell.
+    """
+
+    __slots__ = ("ledger", "index")
+
+    def __init__(self, ledger: Ledger, index):
+        self.ledger = ledger
+        self.index = index
+
+    @property
+    def id(self):
+        return "%s:%d:%d" % (self.ledger.account, self.month, self.day)
+
+    @property
+    def month(self):
+        return self.ledger.first + self.index // self.ledger.daysof
+
+    @property
+    def day(self):
+        return self.index % self.ledger.daysof + 1
+
+    @property
+    def account(self):
+        return self.ledger.account
+
+    @property
+    def amount(self):
+        return self.ledger.amounts[self.index]
+
+    @amount.setter
+    def amount(self, value):
+        self.ledger.amounts[self.index] = value
+
+    @property
+    def planned(self):
+        return self.ledger.planned[self.index]
+
+    @planned.setter
+    def planned(self, value):
+        self.ledger.planned[self.index] = value
+
+    @property
+    def previous(self):
+        return self.ledger.previous[self.index]
+
+    @previous.setter
+    def previous(self, value):
+        self.ledger.previous[self.index] = value
+
+    @property
+    def confirmed(self):
+        return self.ledger.confirmed[self.index] == 1
+
+    @confirmed.setter
+    def confirmed(self, value):
+        self.ledger.confirmed[self.index] = 1 if value else 0
+
+    @property
+    def note(self):
+        return self.ledger.notes.get(self.index, "")
+
+    @note.setter
+    def note(self, value):
+        if value:
+            self.ledger.notes[self.index] = value
+        else:
+            self.ledger.notes.pop(self.index, None)
+
+
+class ForecastArray:
+    """
+    List-like access to the transactions of a Ledger, kept for code that walks 'Account.forecast_array'.
+    """
+
+    def __init__(self, ledger: Ledger):
+        self.ledger = ledger
+
+    def __len__(self):
+        return self.ledger.count
+
+    def __iter__(self):
+        for index in self.ledger.cells():
+            yield ForecastView(self.ledger, index)
+
+    def __getitem__(self, item):
+        cells = self.ledger.cells()
+        if isinstance(item, slice):
+            return [ForecastView(self.ledger, index) for index in cells[item]]
+        return ForecastView(self.ledger, cells[item])
+
+    def append(self, forecast: Forecast):
+        """
+        Stores a Forecast in the ledger.
+        :param forecast: Forecast to store.
+        :return: None
+        """
+        self.ledger.put(forecast.month, forecast.day, forecast.amount, previous=forecast.previous,
+                        planned=forecast.planned, confirmed=forecast.confirmed, note=forecast.note)
+
+    def extend(self, forecasts):
+        for forecast in forecasts:
+            self.append(forecast)
@@ -0,0 +1,61 @@
+class VersionedList(list):
+    """
+    List that counts its changes in 'version'.
+    Budget keeps its accounts and banks in them, so it knows its lookup indexes are stale whenever the lists change
+    without going through it, also when an element is replaced in place.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def __iadd__(self, other):
+        result = super().__iadd__(other)
+        self.version += 1
+        return result
+
+    def __imul__(self, other):
+        result = super().__imul__(other)
+        self.version += 1
+        return result
+
+    def append(self, item):
+        super().append(item)
+        self.version += 1
+
+    def extend(self, items):
+        super().extend(items)
+        self.version += 1
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self.version += 1
+
+    def pop(self, *args):
+        item = super().pop(*args)
+        self.version += 1
+        return item
+
+    def remove(self, item):
+        super().remove(item)
+        self.version += 1
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.version += 1
+
+    def reverse(self):
+        super().reverse()
+        self.version += 1
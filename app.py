@@ -1,36 +1,185 @@
+import hashlib
+import os
+import threading
+import time
+import weakref
+
 from flask import Flask
+from flask import Response
+from flask import abort
+from flask import g
 from flask import render_template
+from flask import request
 from BudgetMe.B2022 import B2022
+from BudgetMe.BudgetException import BudgetNotFound
+from BudgetMe.BudgetMeHtmlPlugIn import BudgetMeHtml
+from BudgetMe.BudgetMetrics import BudgetMetrics
+from BudgetMe.BudgetStore import BudgetStore
 
 app = Flask(__name__)
-budget = B2022.run()
+# Sample budget of the legacy routes, built on its first request so importing the app does not build it.
+budget = None
+budget_lock = threading.Lock()
+store = BudgetStore(os.environ.get("BAC_BUDGETS_FOLDER", "budgets"),
+                    capacity=int(os.environ.get("BAC_BUDGETS_CAPACITY", "8")), budget_class=BudgetMeHtml)
+# Rendered pages of each Budget, dropped together with the Budget when the store evicts or reloads it.
+pages = weakref.WeakKeyDictionary()
+# Instrumentation is opt-in: BAC_METRICS=1 records the methods and the requests served, exported at /metrics.
+metrics = BudgetMetrics()
+if os.environ.get("BAC_METRICS", "0") not in ("", "0"):
+    metrics.enable()
 
-@app.route('/')
-@app.route('/budget/')
-def budgetPage():
+
+def budgetViewModel(budget) -> dict:
+    """
+    Collects what the budget page shows, reading each balance once.
+    :param budget: Budget to show.
+    :return: dict with the arguments of the template.
+    """
+    totals = budget.getPeriodTotals()
     months = []
     monthly_balance = []
     monthly_day_balance = []
     for month in range(budget.start, budget.end + 1):
         months.append(str(budget.getMonthName(month)))
-        monthly_balance.append(round(budget.getMonthBalance(month), 2))
+        monthly_balance.append(round(totals["month"].get(month, 0), 2))
         for day in range(1, budget.daysof + 1):
-            monthly_day_balance.append(round(budget.getMonthDayBalance(month, day), 2))
-    return render_template('budget.html', budget=budget.asdict(), months=months, monthly_balance=monthly_balance,
-                           monthly_day_balance=monthly_day_balance)
+            monthly_day_balance.append(round(totals["day"].get((month, day), 0), 2))
+    transactions = []
+    for account in budget.transactions:
+        ledger = account.ledger
+        transactions.append({"name": account.name, "balance": account.balance,
+                             "amounts": [ledger.amounts[i] for i in ledger.indexes()]})
+    return {"budget": {"daysof": budget.daysof, "days_labels": budget.days_labels, "transactions": transactions},
+            "months": months, "monthly_balance": monthly_balance, "monthly_day_balance": monthly_day_balance}
+
+
+def categoriesViewModel(budget) -> dict:
+    """
+    Collects the balance of each category for the categories page.
+    :param budget: Budget to show.
+    :return: dict with the arguments of the template.
+    """
+    return {"categories": [{"name": k, "value": round(v, 2)} for k, v in budget.getBalanceByCategories().items()]}
+
+
+def savingsViewModel(budget) -> dict:
+    """
+    Collects the potential savings for the savings page.
+    :param budget: Budget to show.
+    :return: dict with the arguments of the template.
+    """
+    return {"savings": budget.calcualtePotentialSavings()}
+
+
+def cachedPage(budget, template, view_model, base=""):
+    """
+    Renders a page once per version of the budget and answers conditional requests from the rendered copy.
+    While the budget does not change, a request only compares its If-None-Match with the ETag of the copy, returning
+    304 when they match. The ETag is the sha1 of the body, so every worker gives the same one for the same page; no
+    Last-Modified is sent, as a time would differ between workers and not change within a second.
+    :param budget: Budget to show.
+    :param template: Name of the template.
+    :param view_model: Function that receives the budget and returns the arguments of the template.
+    :param base: Prefix of the links between the pages of the budget.
+    :return: Response
+    """
+    rendered = pages.setdefault(budget, {})
+    page = rendered.get(template)
+    if page is None or page["version"] != budget.version:
+        body = render_template(template, base=base, **view_model(budget))
+        page = {"version": budget.version, "body": body, "etag": hashlib.sha1(body.encode("utf-8")).hexdigest()}
+        rendered[template] = page
+    response = Response(page["body"], mimetype="text/html")
+    response.set_etag(page["etag"])
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def getSampleBudget():
+    """
+    Returns the sample budget of the legacy routes, building it on the first call.
+    :return: Budget
+    """
+    global budget
+    if budget is None:
+        with budget_lock:
+            if budget is None:
+                budget = B2022.run()
+    return budget
+
+
+def getBudget(name):
+    """
+    Returns a Budget of the store, answering 404 when there is no such Budget.
+    :param name: Name of the Budget.
+    :return: Budget
+    """
+    try:
+        return store.get(name)
+    except BudgetNotFound:
+        abort(404)
+
+
+@app.before_request
+def startRequestTimer():
+    if metrics.enabled:
+        g.started = time.perf_counter()
+
+
+@app.after_request
+def recordRequestTimer(response):
+    """
+    Records the time of the request once the response is closed, so streamed pages count their whole body.
+    :param response: Response of the request.
+    :return: Response
+    """
+    if metrics.enabled and "started" in g:
+        started = g.started
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        status = response.status_code
+        response.call_on_close(lambda: metrics.recordRequest(route, status, time.perf_counter() - started))
+    return response
+
+
+@app.route('/metrics')
+def metricsPage():
+    return Response(metrics.getText(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/')
+@app.route('/budget/')
+def budgetPage():
+    return cachedPage(getSampleBudget(), 'budget.html', budgetViewModel)
+
+@app.route('/report/')
+def reportPage():
+    return Response(getSampleBudget().iterHTMLTable(), mimetype="text/html")
 
 @app.route('/categories/')
 def categoriesPage():
-    categories = budget.getBalanceByCategories()
-    cats = []
-    for k, v in categories.items():
-        cats.append({"name": k, "value": round(v,2)})
-    return render_template('categories.html', categories=cats)
+    return cachedPage(getSampleBudget(), 'categories.html', categoriesViewModel)
 
 @app.route('/savings/')
 def savingsPage():
-    savings = budget.calcualtePotentialSavings()
-    return render_template('savings.html', savings=savings)
+    return cachedPage(getSampleBudget(), 'savings.html', savingsViewModel)
+
+@app.route('/budgets/<name>/')
+@app.route('/budgets/<name>/budget/')
+def storedBudgetPage(name):
+    return cachedPage(getBudget(name), 'budget.html', budgetViewModel, base='/budgets/' + name)
+
+@app.route('/budgets/<name>/report/')
+def storedReportPage(name):
+    return Response(getBudget(name).iterHTMLTable(), mimetype="text/html")
+
+@app.route('/budgets/<name>/categories/')
+def storedCategoriesPage(name):
+    return cachedPage(getBudget(name), 'categories.html', categoriesViewModel, base='/budgets/' + name)
+
+@app.route('/budgets/<name>/savings/')
+def storedSavingsPage(name):
+    return cachedPage(getBudget(name), 'savings.html', savingsViewModel, base='/budgets/' + name)
 
 if __name__ == '__main__':
     app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,51 @@
+"""
+Measures how Account.init scales with the horizon of the budget.
+Each size builds an account of 'DAYSOF' transactions per month over a horizon of 'end' months, so the number of
+forecasts grows linearly with the horizon. A linear build keeps the time per forecast flat across sizes; the
+benchmark fails when it grows more than MAX_GROWTH times, as a build that is quadratic in the horizon does.
+
+Usage (from the repository root): python -m benchmarks.bench_account_init
+"""
+import sys
+import time
+
+from BudgetMe.Account import Account
+
+SIZES = [12, 24, 48, 96, 192, 384]
+DAYSOF = 8
+REPEAT = 5
+# Growth of the time per forecast, from the shortest horizon to the longest, over which the build is not linear.
+MAX_GROWTH = 2.0
+
+
+def build(end):
+    account = Account(account="Benchmark", year=2022, budget_end=end)
+    account.days = [float(day % 7 - 3) for day in range(DAYSOF)]
+    account.init()
+    return account
+
+
+def measure(end) -> float:
+    best = None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        build(end)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+if __name__ == '__main__':
+    print("%8s %10s %12s %16s" % ("months", "forecasts", "seconds", "us/forecast"))
+    per_forecast = []
+    for size in SIZES:
+        elapsed = measure(size)
+        forecasts = size * DAYSOF
+        per_forecast.append(elapsed / forecasts)
+        print("%8d %10d %12.6f %16.3f" % (size, forecasts, elapsed, elapsed / forecasts * 1e6))
+    growth = per_forecast[-1] / per_forecast[0]
+    print("Time per forecast grew %.2fx while the forecasts grew %dx." % (growth, SIZES[-1] // SIZES[0]))
+    if growth > MAX_GROWTH:
+        print("Account.init grows faster than linearly (over %.2fx)." % MAX_GROWTH)
+        sys.exit(1)
@@ -0,0 +1,58 @@
+"""
+Measures the cold start of the command line (python -m BudgetMe) and of importing the library, against a bare Python
+interpreter, and fails when the extra time goes over STARTUP_BUDGET or when a heavy dependency is imported
+before a subcommand needs it.
+
+Usage (from the repository root): python -m benchmarks.bench_cli_startup
+"""
+import os
+import subprocess
+import sys
+import time
+
+REPEAT = 10
+# Seconds the command may add to the start of a bare interpreter.
+STARTUP_BUDGET = 0.15
+HEAVY = ["xlsxwriter", "numpy", "flask"]
+
+COMMANDS = {
+    "python": ["-c", "pass"],
+    "import BudgetMe.Budget": ["-c", "import BudgetMe.Budget"],
+    "python -m BudgetMe --help": ["-m", "BudgetMe", "--help"],
+}
+
+
+def measure(arguments) -> float:
+    best = None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def getHeavyImports() -> list:
+    code = "import sys, BudgetMe.Budget, BudgetMe.BudgetCli, BudgetMe.BudgetBatch; " \
+           "print(' '.join(m for m in %r if m in sys.modules))" % HEAVY
+    output = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, check=True,
+                            universal_newlines=True).stdout
+    return output.split()
+
+
+if __name__ == '__main__':
+    os.environ["PYTHONPATH"] = os.getcwd()
+    print("%24s %10s %10s" % ("command", "seconds", "extra"))
+    base = measure(COMMANDS["python"])
+    slowest = 0
+    for name, arguments in COMMANDS.items():
+        elapsed = base if name == "python" else measure(arguments)
+        slowest = max(slowest, elapsed - base)
+        print("%24s %10.3f %10.3f" % (name, elapsed, elapsed - base))
+    heavy = getHeavyImports()
+    print("Heavy modules imported at start: %s" % (", ".join(heavy) or "none"))
+    if heavy or slowest > STARTUP_BUDGET:
+        print("Over the startup budget of %.3f s." % STARTUP_BUDGET)
+        sys.exit(1)
+    print("Within the startup budget of %.3f s." % STARTUP_BUDGET)
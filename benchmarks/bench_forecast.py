@@ -0,0 +1,76 @@
+"""
+Measures the memory and construction time of Forecast objects, against the previous Forecast that kept a
+'__dict__' and hashed a uuid3 on every construction, and checks that a budget of 100k forecasts gets 100k
+distinct ids in its bank.
+
+Usage (from the repository root): python -m benchmarks.bench_forecast
+"""
+import time
+import tracemalloc
+import uuid
+
+from BudgetMe.Budget import Budget
+from BudgetMe.Forecast import Forecast
+
+COUNT = 100000
+REPEAT = 3
+
+
+class LegacyForecast:
+
+    def __init__(self, month, day, amount, note="", previous=0, account=""):
+        self.id = str(uuid.uuid3(uuid.NAMESPACE_DNS, 'bac'))
+        self.month = month
+        self.day = day
+        self.amount = amount
+        self.planned = amount
+        self.previous = previous
+        self.note = ""
+        self.confirmed = False
+        self.account = account
+
+
+def build(forecast_class):
+    return [forecast_class(i % 12 + 1, 1, float(i), account="Benchmark") for i in range(COUNT)]
+
+
+def measure(forecast_class):
+    best = None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        build(forecast_class)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    tracemalloc.start()
+    forecasts = build(forecast_class)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del forecasts
+    return best, size
+
+
+def buildBudget():
+    # 200 accounts x 125 months x 4 days = 100k forecasts.
+    budget = Budget(2022, daysof=4, start=1, end=125)
+    budget.addBank("Checking")
+    for i in range(200):
+        budget.addAccount("Account %d" % i, days=[1, -1, 2, -2], bank="Checking")
+    return budget
+
+
+if __name__ == '__main__':
+    print("%16s %12s %14s %12s" % ("class", "seconds", "forecasts/s", "MB"))
+    results = {}
+    for forecast_class in [LegacyForecast, Forecast]:
+        elapsed, size = measure(forecast_class)
+        results[forecast_class] = (elapsed, size)
+        print("%16s %12.4f %14.0f %12.2f" % (forecast_class.__name__, elapsed, COUNT / elapsed, size / 1e6))
+    legacy, compact = results[LegacyForecast], results[Forecast]
+    print("Forecast is %.1fx faster to build and takes %.1fx less memory." % (legacy[0] / compact[0],
+                                                                         legacy[1] / compact[1]))
+    started = time.perf_counter()
+    budget = buildBudget()
+    elapsed = time.perf_counter() - started
+    ids = [txn["id"] for txn in budget.getBank("Checking").transactions]
+    print("Budget of %d forecasts built in %.3f s, %d distinct ids in its bank." % (len(ids), elapsed, len(set(ids))))
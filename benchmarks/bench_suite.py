@@ -0,0 +1,215 @@
+"""
+Benchmark suite over synthetic budgets (see benchmarks.workload) of 10, 1k, 10k and 100k accounts.
+Times adding the accounts, every balance query (each one on a cold cache), detectNegativeBalance,
+preventNegativeBalance, the HTML table, the Excel export and the JSON round trips, and writes the results as JSON,
+by default to benchmarks/results/<version>.json. With --compare, each time is compared with the same workload and
+operation of a previous results file and the suite fails when one got slower than the threshold.
+
+Usage (from the repository root):
+python -m benchmarks.bench_suite
+python -m benchmarks.bench_suite --sizes 10 1000 --daysof 1 4 --compare benchmarks/results/1.16.0.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from BudgetMe.BudgetBatch import BudgetReport
+from benchmarks.workload import createBudget, generateAccounts, generateBudget
+
+SIZES = [10, 1000, 10000, 100000]
+DAYSOF = [2]
+# Schema 1 copies the bank into every account, so it grows with accounts x bank transactions.
+SCHEMA_1_LIMIT = 1000
+
+
+def addAccounts(state):
+    budget, calls = state
+    for method, parameters in calls:
+        getattr(budget, method)(**parameters)
+
+
+def queryMonths(budget):
+    for month in range(budget.start, budget.end + 1):
+        budget.getMonthBalance(month)
+
+
+def queryDays(budget):
+    for month in range(budget.start, budget.end + 1):
+        for day in range(1, budget.daysof + 1):
+            budget.getMonthDayBalance(month, day)
+
+
+def queryRunning(budget):
+    for month in range(budget.start, budget.end + 1):
+        budget.getRunningBalance(month)
+    budget.getRunningBalances()
+    budget.getFinalBalance()
+
+
+def queryAccounts(budget):
+    for account in budget.transactions:
+        budget.getAccountBalance(account.name)
+
+
+def queryBanks(budget):
+    for bank in budget.banks:
+        for month in range(budget.start, budget.end + 1):
+            bank.getBalanceAt(month)
+
+
+def queryTotals(budget):
+    budget.getPeriodTotals()
+    budget.getYearlySummaries()
+
+
+def roundTrip(schema):
+    def run(budget):
+        BudgetReport.createBudgetFromJson(json.loads(json.dumps(budget.asdict(schema=schema))))
+    return run
+
+
+def streamRoundTrip(budget):
+    text = io.StringIO()
+    json.dump(budget.asdict(schema=2), text)
+    text.seek(0)
+    BudgetReport.loadJson(text)
+
+
+def exportExcel(budget):
+    with tempfile.TemporaryDirectory() as folder:
+        budget.generateExcelFile(os.path.join(folder, "budget.xlsx"))
+
+
+def cold(budget):
+    budget.invalidate()
+    return budget
+
+
+def coldBanks(budget):
+    for bank in budget.banks:
+        bank.running = None
+    return budget
+
+
+# Name: (prepare the state from the workload and the budget, run the operation on the state, most accounts).
+OPERATIONS = {
+    "addAccount": (lambda workload, budget: (createBudget(workload["accounts"], workload["daysof"]),
+                                             workload["calls"]), addAccounts, None),
+    "balances.months": (lambda workload, budget: cold(budget), queryMonths, None),
+    "balances.days": (lambda workload, budget: cold(budget), queryDays, None),
+    "balances.running": (lambda workload, budget: cold(budget), queryRunning, None),
+    "balances.categories": (lambda workload, budget: cold(budget), BudgetReport.getBalanceByCategories, None),
+    "balances.accounts": (lambda workload, budget: cold(budget), queryAccounts, None),
+    "balances.banks": (lambda workload, budget: coldBanks(budget), queryBanks, None),
+    "balances.totals": (lambda workload, budget: cold(budget), queryTotals, None),
+    "detectNegativeBalance": (lambda workload, budget: cold(budget), BudgetReport.detectNegativeBalance, None),
+    "preventNegativeBalance": (lambda workload, budget: cold(budget.fork()), BudgetReport.preventNegativeBalance,
+                               None),
+    "generateHTMLTable": (lambda workload, budget: cold(budget), BudgetReport.generateHTMLTable, None),
+    "generateExcelFile": (lambda workload, budget: cold(budget), exportExcel, None),
+    "json.schema1": (lambda workload, budget: budget, roundTrip(1), SCHEMA_1_LIMIT),
+    "json.schema2": (lambda workload, budget: budget, roundTrip(2), None),
+    "json.stream": (lambda workload, budget: budget, streamRoundTrip, None),
+}
+
+
+def measure(workload, budget, prepare, run, repeat) -> float:
+    best = None
+    for _ in range(repeat):
+        state = prepare(workload, budget)
+        started = time.perf_counter()
+        run(state)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def runWorkload(accounts, daysof, seed, operations) -> dict:
+    """
+    Generates a workload and times the operations on it.
+    :return: Dictionary with the workload, a checksum of its budget and the seconds of each operation.
+    """
+    repeat = 5 if accounts <= 1000 else 1
+    workload = {"accounts": accounts, "daysof": daysof,
+                "calls": generateAccounts(accounts, daysof=daysof, seed=seed)}
+    budget = generateBudget(accounts, daysof=daysof, seed=seed)
+    result = {"accounts": accounts, "daysof": daysof, "seed": seed, "repeat": repeat,
+              "forecasts": sum(len(account.ledger) for account in budget.transactions),
+              "checksum": round(budget.getFinalBalance(), 2), "operations": {}}
+    for name in operations:
+        prepare, run, limit = OPERATIONS[name]
+        if limit is not None and accounts > limit:
+            continue
+        result["operations"][name] = measure(workload, budget, prepare, run, repeat)
+        print("%8d %6d %24s %12.4f" % (accounts, daysof, name, result["operations"][name]), flush=True)
+    return result
+
+
+def compare(results, previous, threshold) -> list:
+    """
+    Compares the times of two runs, workload by workload.
+    :param results: Results of this run.
+    :param previous: Results of a previous run.
+    :param threshold: Ratio of the times over which an operation counts as slower.
+    :return: List of (accounts, daysof, operation, ratio) slower than the threshold.
+    """
+    before = {(entry["accounts"], entry["daysof"], entry["seed"]): entry for entry in previous["results"]}
+    slower = []
+    for entry in results["results"]:
+        old = before.get((entry["accounts"], entry["daysof"], entry["seed"]))
+        if old is None:
+            continue
+        if old["checksum"] != entry["checksum"]:
+            print("%d accounts, daysof %d: the workload changed, times are not comparable." % (entry["accounts"],
+                                                                                                entry["daysof"]))
+            continue
+        for name, seconds in entry["operations"].items():
+            if name in old["operations"] and old["operations"][name] > 0:
+                ratio = seconds / old["operations"][name]
+                print("%8d %6d %24s %8.2fx" % (entry["accounts"], entry["daysof"], name, ratio))
+                if ratio > threshold:
+                    slower.append((entry["accounts"], entry["daysof"], name, ratio))
+    return slower
+
+
+def getVersion() -> str:
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "VERSION.TXT")) as file:
+        return file.read().strip()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times the main operations over synthetic budgets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Numbers of accounts.")
+    parser.add_argument("--daysof", type=int, nargs="+", default=DAYSOF, help="Days of each month.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--operations", nargs="+", choices=list(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--output", help="Results file. Default: benchmarks/results/<version>.json.")
+    parser.add_argument("--compare", help="Results file of a previous run.")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio that fails --compare.")
+    arguments = parser.parse_args()
+    version = getVersion()
+    results = {"version": version, "created": datetime.now().isoformat(timespec="seconds"),
+               "python": platform.python_version(), "platform": platform.platform(),
+               "processor": platform.processor(), "results": []}
+    print("%8s %6s %24s %12s" % ("accounts", "daysof", "operation", "seconds"))
+    for accounts in arguments.sizes:
+        for daysof in arguments.daysof:
+            results["results"].append(runWorkload(accounts, daysof, arguments.seed, arguments.operations))
+    output = arguments.output or os.path.join("benchmarks", "results", "%s.json" % version)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print("Results written to %s" % output)
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            slower = compare(results, json.load(file), arguments.threshold)
+        if slower:
+            print("%d operations are more than %.2fx slower." % (len(slower), arguments.threshold))
+            sys.exit(1)
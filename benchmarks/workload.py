@@ -0,0 +1,104 @@
+"""
+Seeded generator of synthetic budgets for the benchmarks. The same accounts, days, seed and daysof always give the
+same Budget, so timings of different versions are comparable.
+
+Usage (from the repository root): python -m benchmarks.workload 1000 --daysof 2 --seed 7 > budget.json
+"""
+import argparse
+import json
+import random
+import sys
+
+from BudgetMe.BudgetBatch import BudgetReport
+
+CATEGORIES = ["Job", "House", "Utilities", "Car", "Food", "Health", "Leisure", "Savings", "Taxes", "Banking"]
+FREQUENCIES = [1, 1, 1, 1, 2, 3, 6, 12]
+# Every GROUP accounts, one is a parent and some of the following ones are its children.
+GROUP = 10
+
+
+def generateBudget(accounts, daysof=2, seed=0, end=12, budget_class=BudgetReport):
+    """
+    Builds a Budget with a mix of incomes and expenses, frequencies, starts, optional accounts, single accounts,
+    parents with children and up to 50 banks (see generateAccounts).
+    :param accounts: Number of accounts.
+    :param daysof: Days of each month.
+    :param seed: Seed of the random numbers.
+    :param end: Last month of the Budget.
+    :param budget_class: Class of the Budget to create.
+    :return: Budget
+    """
+    budget = createBudget(accounts, daysof=daysof, end=end, budget_class=budget_class)
+    for method, parameters in generateAccounts(accounts, daysof=daysof, seed=seed, end=end):
+        getattr(budget, method)(**parameters)
+    return budget
+
+
+def createBudget(accounts, daysof=2, end=12, budget_class=BudgetReport):
+    """
+    Creates the empty Budget of a workload, with its banks.
+    :param accounts: Number of accounts, which sets the number of banks.
+    :param daysof: Days of each month.
+    :param end: Last month of the Budget.
+    :param budget_class: Class of the Budget to create.
+    :return: Budget
+    """
+    budget = budget_class(2022, daysof=daysof, start=1, end=end)
+    budget.days_labels = ["D%d" % (day + 1) for day in range(daysof)]
+    for bank in getBanks(accounts):
+        budget.addBank(bank)
+    return budget
+
+
+def getBanks(accounts) -> list:
+    return ["Bank %d" % number for number in range(min(50, max(1, accounts // 100)))]
+
+
+def generateAccounts(accounts, daysof=2, seed=0, end=12) -> list:
+    """
+    Generates the accounts of a workload as Budget method calls, so adding them can be timed on its own.
+    :param accounts: Number of accounts.
+    :param daysof: Days of each month.
+    :param seed: Seed of the random numbers.
+    :param end: Last month of the Budget.
+    :return: List of (method name, parameters).
+    """
+    generator = random.Random(seed)
+    banks = getBanks(accounts)
+    calls = []
+    parent = None
+    for number in range(accounts):
+        name = "Account %d" % number
+        if number % GROUP == 0:
+            parent = name if generator.random() < 0.5 else None
+            account_parent = None
+        else:
+            account_parent = parent if parent is not None and generator.random() < 0.6 else None
+        income = generator.random() < 0.15
+        days = [0] * daysof
+        for day in generator.sample(range(daysof), generator.randint(1, daysof)):
+            amount = round(generator.lognormvariate(5, 1), 2)
+            days[day] = amount * 4 if income else -amount
+        parameters = {"name": name, "days": days, "category": "Job" if income else generator.choice(CATEGORIES),
+                      "bank": generator.choice(banks), "parent": account_parent,
+                      "txn_mode": "Optional" if not income and generator.random() < 0.2 else "Required"}
+        if generator.random() < 0.05:
+            parameters["month"] = generator.randint(1, end)
+            calls.append(("addSingleAccount", parameters))
+        else:
+            parameters["frequency"] = generator.choice(FREQUENCIES)
+            parameters["start"] = generator.randint(1, min(end, 12))
+            calls.append(("addAccount", parameters))
+    return calls
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Writes a synthetic budget as JSON.")
+    parser.add_argument("accounts", type=int)
+    parser.add_argument("--daysof", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end", type=int, default=12)
+    parser.add_argument("--schema", type=int, choices=[1, 2], default=2)
+    arguments = parser.parse_args()
+    json.dump(generateBudget(arguments.accounts, daysof=arguments.daysof, seed=arguments.seed,
+                             end=arguments.end).asdict(schema=arguments.schema), sys.stdout)
@@ -1,8 +1,29 @@
+import functools
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+import zipfile
+from contextlib import redirect_stdout
 from BudgetMe.Forecast import Forecast
 from BudgetMe.Budget import Budget
+from BudgetMe.BudgetMeExcelPlugIn import BudgetMeExcel
+from BudgetMe.BudgetMeHtmlPlugIn import BudgetMeHtml
 from BudgetMe.Account import Account
 from BudgetMe.Bank import Bank
+from BudgetMe.BudgetException import BudgetAccountNotFound, BudgetAccountParametersInvalid, BudgetNotFound
+from BudgetMe.B2022 import B2022
+from BudgetMe.BudgetBatch import BudgetBatch
+from BudgetMe.BudgetCli import main
+from BudgetMe.BudgetImport import BudgetImport
+from BudgetMe.BudgetJsonStream import BudgetJsonStream
+from BudgetMe.BudgetMetrics import BudgetMetrics
+from BudgetMe.BudgetReconcile import BudgetReconcile
+from BudgetMe.BudgetStore import BudgetStore
 from datetime import date
 
 
@@ -72,6 +93,68 @@ class BudgetMeTestCase(unittest.TestCase):
         self.assertEqual(10, x.amount)
         self.assertEqual(20, y.amount)
 
+    def test_ledger_views_write_through(self):
+        bm = Account(account="Foo", year=2020)
+        bm.days = [10, 20]
+        bm.init()
+        x, y = bm.getMonth(2)
+        x.amount = 5
+        y.confirmed = True
+        self.assertEqual(25, bm.getMonthBalance(2))
+        self.assertEqual(5, bm.getMonthDayBalance(2, 1))
+        self.assertTrue(bm.forecast_array[3].confirmed)
+        self.assertEqual("Foo", y.account)
+
+    def test_ledger_grows_with_appended_forecasts(self):
+        bm = Account(account="Foo", year=2020)
+        bm.forecast_array.append(Forecast(month=3, day=1, amount=10))
+        bm.forecast_array.append(Forecast(month=1, day=2, amount=5))
+        bm.forecast_array.append(Forecast(month=3, day=2, amount=1))
+        self.assertEqual(3, len(bm.forecast_array))
+        self.assertEqual([(1, 2), (3, 1), (3, 2)], [(f.month, f.day) for f in bm.forecast_array])
+        self.assertIs(bm.forecast_array, bm.forecast_array)
+        self.assertEqual((3, 2), (bm.forecast_array[-1].month, bm.forecast_array[-1].day))
+        self.assertEqual([5, 10], [f.amount for f in bm.forecast_array[:2]])
+        bm.forecast_array.append(Forecast(month=2, day=1, amount=2))
+        self.assertEqual((2, 1), (bm.forecast_array[1].month, bm.forecast_array[1].day))
+        bm.forecast_array.append(Forecast(month=2, day=1, amount=3))
+        self.assertEqual(4, len(bm.forecast_array))
+        self.assertEqual(3, bm.forecast_array[1].amount)
+        self.assertRaises(IndexError, bm.forecast_array.__getitem__, 4)
+        bm.forecast_array = [Forecast(month=3, day=1, amount=10), Forecast(month=1, day=2, amount=5),
+                             Forecast(month=3, day=2, amount=1)]
+        self.assertEqual(0, bm.getMonthBalance(2))
+        self.assertEqual(16, bm.getFinalBalance())
+        try:
+            bm.setAmount(month=2, day=1, amount=3)
+            self.assertTrue(False)
+        except IndexError:
+            self.assertTrue(True)
+
+    def test_account_asdict_forecasts(self):
+        bm = Account(account="Foo", year=2020)
+        bm.days = [10, -5]
+        bm.init(range_start=2, range_end=3)
+        bm.correctTransaction(month=3, day=2, amount=-7)
+        forecasts = bm.asdict()["forecast_array"]
+        self.assertEqual(24, len(forecasts))
+        self.assertEqual({"id": "Foo:3:2", "month": 3, "day": 2, "amount": -7, "planned": -5,
+                          "previous": 5, "note": "", "caused": True, "account": "Foo"}, forecasts[5])
+
+    def test_forecast_ids(self):
+        first = Forecast(1, 1, 10)
+        second = Forecast(1, 1, 10)
+        self.assertNotEqual(first.id, second.id)
+        self.assertFalse(hasattr(first, "__dict__"))
+        budget = Budget(2022)
+        budget.addBank("FooBank")
+        budget.addAccount("Rent", days=[-10], bank="FooBank")
+        budget.addAccount("Gym", days=[-5], bank="FooBank")
+        ids = [txn["id"] for txn in budget.getBank("FooBank").transactions]
+        self.assertEqual(24, len(set(ids)))
+        self.assertEqual("Gym:12:1", ids[-1])
+        self.assertEqual("Rent:2:1", budget.getAccount("Rent").forecast_array[1].id)
+
     def test_reassignments(self):
         bm = Account(account="Foo", year=2020)
         bm.days = [10, 20]
@@ -134,6 +217,16 @@ class BudgetMeTestCase(unittest.TestCase):
         self.assertEqual(20, bm.getBalancePreviousMonth(month=3))
         self.assertEqual(0, bm.getBalancePreviousMonth(month=1))
 
+    def test_init_sums_each_month_once(self):
+        bm = Account(account="Foo", year=2020)
+        bm.days = [10, -5, 3]
+        calls = []
+        month_balance = bm.ledger.getMonthBalance
+        bm.ledger.getMonthBalance = lambda month: calls.append(month) or month_balance(month)
+        bm.init()
+        self.assertEqual(list(range(1, 13)), calls)
+        self.assertEqual(88, bm.getMonth(12)[2].previous)
+
     def test_transer_balance_previous_month(self):
         bm = Account(account="Foo", year=2020)
         bm.days = [10, -5]
@@ -155,6 +248,28 @@ class BudgetMeTestCase(unittest.TestCase):
         budget.addAccount("Foo", days=[10, 0], start=10)
         self.assertEqual(6, len(budget.getAccount("Foo").forecast_array))
 
+    def test_multi_year_budget(self):
+        budget = Budget(2022, start=1, end=36)
+        budget.addAccount("Salary", days=[100])
+        budget.addAccount("Loan", days=[-50], start=(2023, 7), end=(2024, 6))
+        budget.addSingleAccount("Bonus", month=(2024, 12), days=[1000])
+        self.assertEqual(36 * 100 - 12 * 50 + 1000, budget.getFinalBalance())
+        self.assertEqual(50, budget.getMonthBalance(19))
+        self.assertEqual((2023, 7), budget.getPeriod(19))
+        self.assertEqual(19, budget.getMonthNumber((2023, 7)))
+        self.assertEqual("JUL 2023", budget.getMonthName(19))
+        self.assertEqual("JUL", budget.getMonthName(7))
+        summaries = budget.getYearlySummaries()
+        self.assertEqual([2022, 2023, 2024], [summary["year"] for summary in summaries])
+        self.assertEqual([1200, 900, 1900], [summary["balance"] for summary in summaries])
+        self.assertEqual(4000, summaries[-1]["running"])
+        self.assertEqual(4000, budget.getMatrix().getFinalBalance())
+        try:
+            budget.addAccount("Too long", days=[1], end=37)
+            self.assertTrue(False)
+        except Exception:
+            self.assertTrue(True)
+
     def test_all_transactions_have_the_same_days(self):
         budget = Budget(2020, daysof=2)
         budget.addAccount("Foo", days=[10, 20])
@@ -193,6 +308,51 @@ class BudgetMeTestCase(unittest.TestCase):
             print(txn.asdict())
         self.assertEqual(220, budget.getFinalBalance())
 
+    def test_update_transactions_in_bulk(self):
+        budget = Budget(2020, daysof=2)
+        budget.addAccount("Foo", days=[10, 0])
+        budget.addAccount("Bar", days=[0, 5])
+        summary = budget.updateTransactions([("Foo", 1, 1, 12), ("Bar", 1, 2, 5), ("Foo", 2, 2, -3)])
+        self.assertEqual({"received": 3, "changed": 3, "accounts": {"Foo": 2, "Bar": 1}}, summary)
+        self.assertEqual(119, budget.getAccount("Foo").getFinalBalance())
+        self.assertTrue(budget.getAccount("Bar").getMonth(1)[1].confirmed)
+        summary = budget.confirmTransactions([("Foo", 1, 1), ("Foo", 3, 1), ("Bar", 1, 2, False)])
+        self.assertEqual({"Foo": 1, "Bar": 1}, summary["accounts"])
+        self.assertFalse(budget.getAccount("Bar").getMonth(1)[1].confirmed)
+        budget.updatePreviousBalances([("Foo", 2, 1, 100)])
+        self.assertEqual(100, budget.getAccount("Foo").getMonth(2)[0].previous)
+        with self.assertRaises(BudgetAccountNotFound):
+            budget.updateTransactions([("Foo", 4, 1, 1), ("Missing", 1, 1, 1)])
+        with self.assertRaises(IndexError):
+            budget.updateTransactions([("Foo", 4, 1, 1), ("Foo", 13, 1, 1)])
+        self.assertEqual(10, budget.getAccount("Foo").getMonthBalance(4))
+
+    def test_balance_cache_invalidation(self):
+        budget = Budget(2020)
+        budget.addAccount("Foo", days=[10], category="Credit Card")
+        budget.addAccount("Bar", days=[5], category="Utilities")
+        self.assertEqual(45, budget.getRunningBalance(3))
+        self.assertEqual(15, budget.getMonthBalance(5))
+        self.assertEqual(45, budget.getRunningBalance(3))
+        self.assertEqual(1, budget.getCacheStats()["hits"])
+        version = budget.version
+        budget.updateTransaction("Bar", month=5, day=1, amount=0)
+        self.assertGreater(budget.version, version)
+        self.assertEqual(45, budget.getRunningBalance(3))
+        self.assertEqual(10, budget.getMonthBalance(5))
+        self.assertEqual(55, budget.getTotalBalanceByCategory("Utilities"))
+        self.assertEqual(175, budget.getFinalBalance())
+        budget.addAccount("Baz", days=[-1], category="Utilities", start=4)
+        self.assertEqual(46, budget.getTotalBalanceByCategory("Utilities"))
+        self.assertEqual(45, budget.getRunningBalance(3))
+        self.assertEqual(9, budget.getMonthBalance(5))
+        version = budget.version
+        budget.confirmTransaction("Foo", month=1, day=1)
+        self.assertEqual(version + 1, budget.version)
+        stats = budget.getCacheStats()
+        self.assertEqual(2, stats["hits"])
+        self.assertEqual(stats["version"], budget.version)
+
     def test_calculate_variance(self):
         budget = Budget(2020)
         budget.addAccount("Foo", days=[10])
@@ -261,6 +421,125 @@ class BudgetMeTestCase(unittest.TestCase):
         budget.addAccount("Foo", days=[10], category="Credit Card", bank="Foo")
         self.assertEqual(120, budget.getBank("Foo").balance)
 
+    def test_bank_timelines(self):
+        budget = Budget(2020, daysof=2, start=2, end=14)
+        budget.addBank("FooBank")
+        budget.addBank("BarBank")
+        budget.getBank("BarBank").balance = budget.getBank("BarBank").opening_balance = 50
+        budget.addAccount("Payroll", days=[100, 0], bank="FooBank")
+        budget.addAccount("Rent", days=[0, -30], bank="BarBank", start=3)
+        foo = budget.getBank("FooBank")
+        self.assertEqual(0, foo.getBalanceAt(1))
+        self.assertEqual(100, foo.getBalanceAt(2, 1))
+        self.assertEqual(200, budget.getBankBalanceAt("FooBank", 3))
+        self.assertEqual(50, budget.getBankBalanceAt("BarBank", 2))
+        self.assertEqual(20, budget.getBankBalanceAt("BarBank", 3))
+        budget.updateTransaction("Payroll", 3, 1, 150)
+        self.assertEqual(150, foo.getBalanceAt(2, 2) + 50)
+        self.assertEqual(250, foo.getBalanceAt(3))
+        self.assertEqual(foo.balance, foo.getBalanceAt(14))
+        timelines = budget.getBankTimelines()
+        self.assertEqual(26, len(timelines["periods"]))
+        for bank in budget.banks:
+            expected = [bank.getBalanceAt(month, day) for month, day in timelines["periods"]]
+            self.assertEqual(expected, timelines["banks"][bank.name].tolist())
+        loaded = Budget.createBudgetFromJson(json.loads(json.dumps(budget.asdict(schema=2))))
+        for bank in budget.banks:
+            self.assertEqual(timelines["banks"][bank.name].tolist(),
+                             [loaded.getBankBalanceAt(bank.name, month, day) for month, day in timelines["periods"]])
+        self.assertRaises(BudgetAccountNotFound, budget.getBankBalanceAt, "Nope", 3)
+
+    def test_bank_timelines_after_loading(self):
+        budget = Budget(2022)
+        budget.addBank("A")
+        budget.addAccount("X", days=[10], bank="A")
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "budget.snap")
+            budget.saveSnapshot(file_name)
+            loaded = [Budget.loadJson(io.StringIO(json.dumps(budget.asdict(schema=2)))),
+                      Budget.createBudgetFromJson(json.loads(json.dumps(budget.asdict(schema=1)))),
+                      Budget.loadSnapshot(file_name)]
+        for other in loaded:
+            other.updateTransaction("X", 12, 1, 20)
+            bank = other.getBank("A")
+            self.assertEqual(130, bank.balance)
+            self.assertEqual(130, bank.getBalanceAt(12))
+            self.assertEqual(110, bank.getBalanceAt(11))
+            other.addAccount("Y", days=[-5], bank="A")
+            self.assertEqual(70, bank.balance)
+            self.assertEqual(bank.balance, bank.getBalanceAt(12))
+
+    def test_monte_carlo_simulation(self):
+        budget = Budget(2022, start=3, end=14)
+        budget.addAccount("Payroll", days=[1000])
+        budget.addAccount("Rent", days=[-900])
+        budget.addAccount("Groceries", days=[-200], txn_mode="Optional")
+        fixed = budget.simulate({"Groceries": {"distribution": "normal", "stdev": 0}}, scenarios=10, seed=1,
+                                workers=1)
+        self.assertEqual(list(range(3, 15)), fixed["months"])
+        self.assertEqual(budget.getRunningBalances(), fixed["mean"])
+        self.assertEqual(fixed["mean"], fixed["percentiles"][5])
+        self.assertEqual([1] * 12, fixed["negative_probability"])
+        skipped = budget.simulate({"Groceries": {"distribution": "optional", "probability": 0}}, scenarios=10,
+                                  workers=1)
+        self.assertEqual([100 * (month - 2) for month in range(3, 15)], skipped["mean"])
+        self.assertEqual(0, skipped["any_negative_probability"])
+        distributions = {"Groceries": {"distribution": "uniform", "low": 0, "high": 1}}
+        local = budget.simulate(distributions, scenarios=1000, seed=7, workers=1, batch=300)
+        pooled = budget.simulate(distributions, scenarios=1000, seed=7, workers=2, batch=300)
+        self.assertEqual(local, pooled)
+        self.assertLess(local["negative_probability"][0], local["negative_probability"][-1])
+        self.assertRaises(BudgetAccountNotFound, budget.simulate, {"Nope": {"distribution": "normal"}})
+        self.assertRaises(BudgetAccountParametersInvalid, budget.simulate, {"Rent": {"distribution": "poisson"}})
+
+    def test_fork_copies_on_write(self):
+        budget = BudgetMeHtml(2022, start=3, end=14)
+        budget.addBank("FooBank")
+        budget.addAccount("Payroll", days=[1000], bank="FooBank")
+        budget.addAccount("Rent", days=[-900], bank="FooBank")
+        budget.addAccount("Streaming", days=[-20], bank="FooBank", txn_mode="Optional")
+        budget.addAccount("Gym", days=[-50], parent="Streaming")
+        running = budget.getRunningBalances()
+        bank_balance = budget.getBank("FooBank").balance
+        fork = budget.fork()
+        self.assertIsInstance(fork, BudgetMeHtml)
+        self.assertIs(budget.getAccount("Rent").ledger, fork.getAccount("Rent").ledger)
+        fork.updateTransaction("Rent", 5, 1, -1000)
+        fork.removeAccount("Streaming")
+        fork.payOff("Car", amount=-1200, time=12, start=3, bank="FooBank")
+        self.assertEqual(running, budget.getRunningBalances())
+        self.assertEqual(bank_balance, budget.getBank("FooBank").balance)
+        self.assertEqual(-900, budget.getAccount("Rent").getMonthBalance(5))
+        self.assertEqual(["Payroll", "Rent", "Streaming", "Gym"], [account.name for account in budget.transactions])
+        self.assertIs(budget.getAccount("Payroll").ledger, fork.getAccount("Payroll").ledger)
+        self.assertIsNot(budget.getAccount("Rent").ledger, fork.getAccount("Rent").ledger)
+        self.assertIs(fork.getBank("FooBank"), fork.getAccount("Payroll").bank)
+        self.assertEqual(bank_balance - 100 + 20 * 12 - 1200, fork.getBank("FooBank").balance)
+        self.assertEqual(fork.getBank("FooBank").balance, fork.getBankBalanceAt("FooBank", 14))
+        self.assertEqual(["Gym"], [account.name for account in fork.getChildAccounts("Streaming")])
+        self.assertRaises(BudgetAccountNotFound, fork.getAccount, "Streaming")
+        budget.confirmTransaction("Payroll", 4, 1)
+        self.assertFalse(fork.getAccount("Payroll").ledger.confirmed[1])
+        self.assertIsNot(budget.getAccount("Payroll").ledger, fork.getAccount("Payroll").ledger)
+        nested = fork.fork()
+        nested.updateTransactions([("Payroll", 6, 1, 2000)])
+        comparison = budget.compareRunningBalances({"fork": fork, "nested": nested, "same": budget.fork()})
+        self.assertEqual(list(range(3, 15)), comparison["months"])
+        self.assertEqual(running, comparison["base"])
+        self.assertEqual(fork.getRunningBalances(), comparison["forks"]["fork"])
+        self.assertEqual(nested.getRunningBalances(), comparison["forks"]["nested"])
+        self.assertEqual(running, comparison["forks"]["same"])
+        self.assertEqual(1000, nested.getRunningBalance(14) - fork.getRunningBalance(14))
+        rent = fork.getAccount("Rent")
+        self.assertIs(rent, fork.transactions[fork.position_index[id(rent)]])
+        other = Budget(2022)
+        other.addAccount("Temp", days=[1])
+        scenario = other.fork()
+        self.assertTrue(other.isShared(other.getAccount("Temp")))
+        scenario.removeAccount("Temp")
+        other.removeAccount("Temp")
+        self.assertEqual(0, len(other.shared))
+
     def test_negative_balance(self):
         budget = Budget(2020)
         budget.addBank("FooBank")
@@ -291,6 +570,17 @@ class BudgetMeTestCase(unittest.TestCase):
         self.assertEqual(0, result2['month'])
         self.assertEqual(0, result2['balance'])
 
+    def test_negative_prevention_within_budget_range(self):
+        budget = Budget(2020, daysof=2, start=4, end=9)
+        budget.addAccount("Starting Balance", days=[50, 0], frequency=12, start=4)
+        budget.addAccount("Foo", days=[-10, -5], start=4)
+        self.assertEqual([35, 20, 5, -10, -25, -40], budget.getRunningBalances())
+        self.assertEqual({"month": 7, "balance": -10}, budget.detectNegativeBalance())
+        budget.preventNegativeBalance()
+        protection = budget.getAccount("Negative protection")
+        self.assertEqual([10, 15, 15], [protection.getMonthBalance(month) for month in range(7, 10)])
+        self.assertEqual({"month": 0, "balance": 0}, budget.detectNegativeBalance())
+
     def test_transfer_from_account_to_bank(self):
         budget = Budget(2020)
         budget.addBank("FooBank")
@@ -308,6 +598,40 @@ class BudgetMeTestCase(unittest.TestCase):
         budget.addAccount("Child 2", days=[-10], category="Credit Card", bank="FooBank", parent="Parent")
         self.assertEqual(2, len(budget.getChildAccounts(parent_name="Parent")))
 
+    def test_lookup_indexes(self):
+        budget = Budget(2020)
+        budget.addBank("FooBank")
+        budget.addAccount("Parent", days=[-10], category="Credit Card", bank="FooBank")
+        budget.addAccount("Child 1", days=[-10], category="Credit Card", bank="FooBank", parent="Parent")
+        budget.addAccount("Child 1", days=[-5], category="Credit Card", bank="FooBank")
+        self.assertEqual(-120, budget.getAccount("Child 1").getFinalBalance())
+        self.assertEqual("FooBank", budget.getBank("FooBank").name)
+        self.assertIsNone(budget.getBank("Bar"))
+        self.assertTrue(budget.accountHasChildAccounts("Parent"))
+        account = Account(account="Child 2", year=2020, parent="Parent")
+        account.days = [-1]
+        account.init()
+        budget.transactions.append(account)
+        self.assertEqual(account, budget.getAccount("Child 2"))
+        self.assertEqual(-132, budget.getAccountBalance("Parent"))
+        with self.assertRaises(BudgetAccountNotFound):
+            budget.getAccount("Missing")
+        self.assertEqual(["Parent", "Child 1"], [account.name for account in budget.getChildAccounts(None)])
+        self.assertEqual([], budget.getChildAccounts(""))
+        replacement = Account(account="Other", year=2020, parent="Child 1")
+        replacement.days = [-2]
+        replacement.init()
+        budget.transactions[0] = replacement
+        self.assertIs(replacement, budget.getAccount("Other"))
+        self.assertRaises(BudgetAccountNotFound, budget.getAccount, "Parent")
+        self.assertEqual([replacement], budget.getChildAccounts("Child 1"))
+        self.assertEqual(["Child 1"], [account.name for account in budget.getChildAccounts(None)])
+        budget.banks[0] = Bank("BarBank")
+        self.assertIsNone(budget.getBank("FooBank"))
+        self.assertEqual("BarBank", budget.getBank("BarBank").name)
+        budget.transactions = []
+        self.assertRaises(BudgetAccountNotFound, budget.getAccount, "Other")
+
     def test_get_balance_of_account(self):
         budget = Budget(2020)
         budget.addBank("FooBank")
@@ -337,6 +661,437 @@ class BudgetMeTestCase(unittest.TestCase):
         savings = budget.calcualtePotentialSavings()
         self.assertEqual(-240, savings)
 
+    def test_matrix_matches_budget_aggregates(self):
+        budget = Budget(2020, daysof=2)
+        budget.addBank("FooBank")
+        budget.addBank("Bar")
+        budget.addAccount("Parent", days=[-10, 0], category="Credit Card", bank="FooBank")
+        budget.addAccount("Child 1", days=[-10, -2.5], category="Credit Card", bank="FooBank", parent="Parent")
+        budget.addAccount("Child 2", days=[0, -7], category="Utilities", bank="Bar", parent="Parent", frequency=3)
+        budget.addAccount("Payroll", days=[20, 20], category="Job", bank="Bar", start=3, end=9)
+        budget.addSingleAccount("Bonus", month=6, days=[100, 0], category="Job")
+        budget.updateTransaction("Payroll", month=4, day=2, amount=35)
+        matrix = budget.getMatrix()
+        for month in range(1, 13):
+            self.assertAlmostEqual(budget.getMonthBalance(month), matrix.getMonthBalance(month))
+            self.assertAlmostEqual(budget.getRunningBalance(month), matrix.getRunningBalance(month))
+            self.assertAlmostEqual(budget.getMonthDayBalance(month, 2), matrix.getMonthDayBalance(month, 2))
+        self.assertAlmostEqual(budget.getFinalBalance(), matrix.getFinalBalance())
+        self.assertAlmostEqual(budget.getAccountBalance("Parent"), matrix.getAccountBalance("Parent"))
+        self.assertEqual(budget.getBalanceByCategories(), matrix.getBalanceByCategories())
+        self.assertEqual([budget.getRunningBalance(m) for m in range(1, 13)], matrix.getRunningBalances())
+        self.assertEqual(12, len(matrix.getMonthDayBalances()))
+        self.assertEqual(-270.0, matrix.getBalanceByBanks()["FooBank"])
+
+    def test_matrix_parents_match_budget(self):
+        budget = Budget(2020)
+        budget.addAccount("", days=[-5])
+        budget.addAccount("Blank child", days=[-1], parent="")
+        budget.addAccount("Orphan", days=[3])
+        budget.addAccount("Parent", days=[-10])
+        budget.addAccount("Child", days=[-2], parent="Parent")
+        matrix = budget.getMatrix()
+        for name in ["", "Blank child", "Orphan", "Parent", "Child"]:
+            self.assertAlmostEqual(budget.getAccountBalance(name), matrix.getAccountBalance(name))
+        self.assertEqual({parent: [budget.transactions.index(child) for child in children]
+                          for parent, children in budget.parent_index.items()},
+                         {parent: list(rows) for parent, rows in matrix.parents.items()})
+
+    def test_html_report_streams_in_chunks(self):
+        budget = BudgetMeHtml(2020, daysof=2)
+        budget.days_labels = ["H1", "H2"]
+        budget.addBank("FooBank")
+        budget.addAccount("Parent", days=[-10, 0], category="Credit Card", bank="FooBank")
+        budget.addAccount("Child", days=[-10, 5], category="Credit Card", bank="FooBank", parent="Parent")
+        budget.addAccount("Payroll", days=[100, 0], category="Job", bank="FooBank")
+        budget.updateTransaction("Payroll", month=2, day=1, amount=90)
+        chunks = list(budget.iterHTMLTable())
+        self.assertGreater(len(chunks), 5)
+        html = budget.generateHTMLTable()
+        self.assertEqual("".join(chunks), html)
+        self.assertEqual(1, html.count("positive  confirmed \">$90.00"))
+        self.assertEqual(12, html.count("negative_italic  \">&nbsp;&nbsp;$-10.00"))
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "report.html")
+            budget.generateHtmlFile(file_name=file_name)
+            with open(file_name) as report:
+                self.assertEqual(html, report.read())
+
+    def test_excel_export_beyond_column_z(self):
+        budget = BudgetMeExcel(2020, daysof=2, start=3, end=16)
+        budget.days_labels = ["H1", "H2"]
+        budget.addBank("FooBank")
+        budget.addAccount("Parent", days=[0, 0], bank="FooBank")
+        budget.addAccount("Child", days=[-10, 0], bank="FooBank", parent="Parent")
+        budget.addAccount("Payroll", days=[100, 50], category="Job", bank="FooBank", start=3)
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "budget.xlsx")
+            budget.generateExcelFile(filename=file_name)
+            sheet = zipfile.ZipFile(file_name).read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn('<dimension ref="A1:AD', sheet)
+        self.assertIn('<mergeCell ref="AB1:AC1"/>', sheet)
+        self.assertIn('<c r="AD6"><v>2100</v></c>', sheet)
+
+    def test_app_pages_conditional_requests(self):
+        import app
+        client = app.app.test_client()
+        first = client.get('/budget/')
+        self.assertIs(app.budget, app.getSampleBudget())
+        self.assertEqual(200, first.status_code)
+        self.assertTrue(first.headers.get("ETag"))
+        self.assertIsNone(first.headers.get("Last-Modified"))
+        cached = client.get('/budget/', headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(304, cached.status_code)
+        self.assertEqual(200, client.get('/budget/', headers={"If-Modified-Since": first.headers["Date"]}).status_code)
+        account = app.budget.transactions[0]
+        month, day = account.ledger.position(account.ledger.indexes()[0])
+        amount = account.ledger.amounts[account.ledger.indexes()[0]]
+        app.budget.updateTransaction(account.name, month, day, amount + 1)
+        try:
+            changed = client.get('/budget/', headers={"If-None-Match": first.headers["ETag"]})
+            self.assertEqual(200, changed.status_code)
+            self.assertNotEqual(first.headers["ETag"], changed.headers["ETag"])
+        finally:
+            app.budget.updateTransaction(account.name, month, day, amount)
+
+    def test_metrics(self):
+        original = Budget.getFinalBalance
+        metrics = BudgetMetrics()
+        metrics.enable()
+        try:
+            self.assertIsNot(original, Budget.getFinalBalance)
+            budget = BudgetMeHtml(2022, daysof=2)
+            budget.addAccount("Payroll", days=[100, 100])
+            budget.addAccount("Rent", days=[-50, 0])
+            self.assertEqual(1800, budget.getFinalBalance())
+            stats = metrics.getStats()
+            self.assertEqual(1, stats["Budget.getFinalBalance"]["count"])
+            self.assertEqual(2, stats["Account.getFinalBalance"]["count"])
+            self.assertEqual(2 * 12 * 2, stats["Budget.getFinalBalance"]["scanned"])
+            self.assertEqual(2, stats["Budget.addAccount"]["count"])
+            Budget.createBudgetFromJson(budget.asdict(schema=2))
+            budget.generateHTMLTable()
+            stats = metrics.getStats()
+            self.assertIn("Budget.createBudgetFromJson", stats)
+            self.assertIn("BudgetMeHtml.generateHTMLTable", stats)
+            self.assertLessEqual(stats["Budget.getFinalBalance"]["p95"], stats["Budget.getFinalBalance"]["seconds"])
+            text = metrics.getText()
+            self.assertIn('bac_call_seconds_count{method="Budget.getFinalBalance"} 2', text)
+            self.assertIn('bac_forecasts_scanned_total{method="Budget.getFinalBalance"} 48', text)
+        finally:
+            metrics.disable()
+        self.assertIs(original, Budget.getFinalBalance)
+        self.assertIsInstance(Budget.__dict__["createBudgetFromJson"], classmethod)
+        budget.getFinalBalance()
+        self.assertEqual(2, metrics.getStats()["Budget.getFinalBalance"]["count"])
+        import app
+        client = app.app.test_client()
+        app.metrics.enable()
+        try:
+            client.get('/savings/').close()
+            client.get('/budgets/missing/').close()
+            text = client.get('/metrics').get_data(as_text=True)
+        finally:
+            app.metrics.disable()
+        self.assertIn('bac_requests_total{route="/savings/",status="200"} 1', text)
+        self.assertIn('bac_requests_total{route="/budgets/<name>/",status="404"} 1', text)
+        self.assertIn("bac_metrics_enabled 1", text)
+
+    def test_import_statement(self):
+        budget = Budget(2022, daysof=2)
+        budget.addBank("FooBank")
+        budget.addAccount("Payroll", days=[0, 1000], bank="FooBank")
+        budget.addAccount("Groceries", days=[-200, -200], bank="FooBank")
+        rules = [("acme corp", "Payroll"), (r"super\s?market|grocer", "Groceries")]
+        statement = io.StringIO("Date,Description,Amount\n"
+                                "2022-01-03,SUPERMARKET 123,-45.10\n"
+                                "2022-01-14,Corner Grocer,\"(4.90)\"\n"
+                                "2022-01-17,SUPER MARKET,-120.00\n"
+                                "2022-01-31,ACME CORP PAYROLL,\"$1,050.00\"\n"
+                                "2022-02-01,Unknown shop,-3.00\n"
+                                "2021-12-31,SUPERMARKET,-1.00\n"
+                                "not a date,SUPERMARKET,-1.00\n")
+        unmatched = io.StringIO()
+        report = budget.importStatement(statement, rules, unmatched=unmatched,
+                                        columns={"date": "Date", "description": "Description", "amount": "Amount"})
+        self.assertEqual(7, report["rows"])
+        self.assertEqual(4, report["imported"])
+        self.assertEqual(3, report["transactions"])
+        self.assertEqual({"no rule": 1, "outside budget": 1, "no transaction": 0, "invalid": 1}, report["reasons"])
+        self.assertEqual([6, 7, 8], [sample["line"] for sample in report["samples"]])
+        self.assertEqual(4, len(unmatched.getvalue().splitlines()))
+        ledger = budget.getAccount("Groceries").ledger
+        self.assertEqual(-50, ledger.amounts[ledger.index(1, 1)])
+        self.assertEqual(-120, ledger.amounts[ledger.index(1, 2)])
+        self.assertTrue(ledger.confirmed[ledger.index(1, 1)])
+        self.assertFalse(ledger.confirmed[ledger.index(2, 1)])
+        self.assertEqual(1050, budget.getAccount("Payroll").getMonthDayBalance(1, 2))
+        self.assertEqual(1050 - 170 + 11 * 600, budget.getFinalBalance())
+        ofx = io.StringIO("OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>"
+                          "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20220220120000[-5:EST]<TRNAMT>-80.25"
+                          "<NAME>SUPERMARKET &amp; CO</STMTTRN>\n"
+                          "<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20220228\n<TRNAMT>990.00\n<NAME>ACME\n"
+                          "<MEMO>Corp salary\n</STMTTRN>\n</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>")
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "statement.ofx")
+            with open(path, "w") as file:
+                file.write(ofx.getvalue())
+            report = budget.importStatement(path, rules)
+        self.assertEqual(2, report["imported"])
+        self.assertEqual(-80.25, budget.getAccount("Groceries").getMonthDayBalance(2, 2))
+        self.assertEqual(990, budget.getAccount("Payroll").getMonthDayBalance(2, 2))
+        importer = BudgetImport(budget, rules)
+        self.assertEqual(1, importer.importCsv(io.StringIO("date,description,amount\n03/04/2022,grocer,-1\n"),
+                                               date_format="%m/%d/%Y")["imported"])
+        importer.importCsv(io.StringIO("date,description,amount\n03/04/2022,grocer,-7\n"), date_format="%d/%m/%Y")
+        self.assertEqual(-7, budget.getAccount("Groceries").getMonthDayBalance(4, 1))
+        self.assertEqual(-1, budget.getAccount("Groceries").getMonthDayBalance(3, 1))
+        self.assertRaises(BudgetAccountNotFound, budget.importStatement, io.StringIO(""), [("x", "Nope")])
+        self.assertRaises(BudgetAccountParametersInvalid, budget.importStatement, io.StringIO("a,b\n1,2\n"), rules)
+
+    def test_reconcile(self):
+        budget = Budget(2022, daysof=2)
+        budget.addBank("FooBank")
+        budget.addBank("BarBank")
+        budget.addAccount("Payroll", days=[0, 1000], bank="FooBank")
+        budget.addAccount("Rent", days=[-900, 0], bank="FooBank")
+        budget.addAccount("Phone", days=[-50, 0], bank="FooBank")
+        budget.addAccount("Internet", days=[-50, 0], bank="FooBank")
+        budget.addAccount("Gym", days=[0, -50], bank="BarBank")
+        budget.confirmTransaction("Rent", 1, 1)
+        transactions = [("FooBank", date(2022, 1, 30), 1000),
+                        ("FooBank", date(2022, 1, 3), -900),
+                        ("FooBank", (2, 2), -900),
+                        ("FooBank", (2, 1), -51),
+                        ("FooBank", (2, 2), -49.5),
+                        ("FooBank", (2, 2), -50),
+                        ("BarBank", (3, 2), 50),
+                        ("NoBank", (3, 1), -50),
+                        ("FooBank", (3, 1), 0)]
+        report = budget.reconcile(transactions, amount_tolerance=2, day_tolerance=1, confirm=False)
+        self.assertEqual([1, 6, 7, 8], report["unmatched"])
+        self.assertEqual([(0, "Payroll", 1, 2, 0, 1.0), (2, "Rent", 2, 1, -1, 0.5), (3, "Phone", 2, 1, 0, 0.75),
+                          (4, "Internet", 3, 1, 1, 0.4375), (5, "Internet", 2, 1, -1, 0.5)],
+                         [(match["row"], match["account"], match["month"], match["day"], match["days_apart"],
+                           match["confidence"]) for match in report["matched"]])
+        self.assertEqual(-50, report["matched"][2]["forecast"])
+        ledger = budget.getAccount("Phone").ledger
+        self.assertFalse(ledger.confirmed[ledger.index(2, 1)])
+        balance = budget.getFinalBalance()
+        report = budget.reconcile(transactions, amount_tolerance=2, day_tolerance=1)
+        self.assertEqual(5, len(report["matched"]))
+        self.assertTrue(ledger.confirmed[ledger.index(2, 1)])
+        self.assertEqual(-51, ledger.amounts[ledger.index(2, 1)])
+        self.assertEqual(balance - 1 + 0.5, budget.getFinalBalance())
+        report = budget.reconcile(transactions[:1], amount_tolerance=2, day_tolerance=1)
+        self.assertEqual([0], report["unmatched"])
+        budget.confirmTransactions([("Rent", 4, 1)])
+        report = BudgetReconcile(budget, candidates=1).reconcile([("FooBank", (4, 1), -50), ("FooBank", (4, 1), -50),
+                                                                  ("FooBank", (4, 1), -50)], update=False)
+        self.assertEqual(["Internet", "Phone"], [match["account"] for match in report["matched"]])
+        self.assertEqual([2], report["unmatched"])
+        self.assertEqual(-50, ledger.amounts[ledger.index(4, 1)])
+        self.assertTrue(ledger.confirmed[ledger.index(4, 1)])
+
+    def test_reconcile_identical_amounts(self):
+        budget = Budget(2022)
+        budget.addBank("FooBank")
+        for number in range(300):
+            budget.addAccount("Subscription %d" % number, days=[-50], bank="FooBank")
+        for candidates in [1, 10]:
+            report = BudgetReconcile(budget, day_tolerance=1, candidates=candidates).reconcile(
+                [("FooBank", (1, 1), -50)] * 310 + [("FooBank", (2, 1), -50)] * 300, confirm=False)
+            self.assertEqual(600, len(report["matched"]))
+            self.assertEqual(list(range(300, 310)), report["unmatched"])
+            self.assertEqual(600, len({(match["account"], match["month"]) for match in report["matched"]}))
+            self.assertEqual([(1, 0)] * 300 + [(2, 0)] * 10, [(match["month"], match["days_apart"])
+                                                              for match in report["matched"][:310]])
+        self.assertRaises(BudgetAccountParametersInvalid, BudgetReconcile, budget, candidates=0)
+
+    def test_budget_store_lru_and_reload(self):
+        def save(folder, name, amount):
+            budget = Budget(2022)
+            budget.addBank("FooBank")
+            budget.addAccount("Rent", days=[amount], bank="FooBank")
+            with open(os.path.join(folder, name + ".json"), "w") as file:
+                json.dump(budget.asdict(), file)
+
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ["a", "b", "c"]:
+                save(folder, name, -10)
+            store = BudgetStore(folder, capacity=2, budget_class=BudgetMeHtml)
+            self.assertEqual(["a", "b", "c"], store.getNames())
+            first = store.get("a")
+            self.assertIsInstance(first, BudgetMeHtml)
+            self.assertIs(first, store.get("a"))
+            self.assertEqual(-120, first.getFinalBalance())
+            store.get("b")
+            store.get("c")
+            self.assertEqual({"budgets": 2, "capacity": 2, "loads": 3, "evictions": 1}, store.stats())
+            save(folder, "c", -20)
+            os.utime(os.path.join(folder, "c.json"), ns=(1, 1))
+            self.assertEqual(-240, store.get("c").getFinalBalance())
+            self.assertEqual(-120, first.getFinalBalance())
+            self.assertRaises(BudgetNotFound, store.get, "missing")
+            self.assertRaises(BudgetNotFound, store.get, "../a")
+
+    def test_batch_reports(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for name, schema in [("a", 1), ("b", 2)]:
+                budget = Budget(2022)
+                budget.addBank("FooBank")
+                budget.addAccount("Rent", days=[-10], bank="FooBank")
+                with open(os.path.join(folder, name + ".json"), "w") as file:
+                    json.dump(budget.asdict(schema=schema), file)
+            with open(os.path.join(folder, "broken.json"), "w") as file:
+                file.write("{")
+            sources = [os.path.join(folder, name + ".json") for name in ["a", "b", "broken"]] + [B2022.run]
+            output = os.path.join(folder, "reports")
+            results = BudgetBatch(output, workers=2, chunksize=2).run(sources)
+            self.assertEqual(["a", "b", "broken", "BudgetMe.B2022.B2022.run"], [result["name"] for result in results])
+            self.assertEqual(["html", "xlsx"], sorted(results[0]["outputs"]))
+            with open(os.path.join(output, "b.html")) as file:
+                self.assertIn("Rent", file.read())
+            self.assertTrue(zipfile.is_zipfile(os.path.join(output, "BudgetMe.B2022.B2022.run.xlsx")))
+            self.assertIn("truncated", results[2]["error"])
+            self.assertIn("html", results[3]["timings"])
+            summary = BudgetBatch.summarize(results)
+            self.assertEqual((6, 0, ["broken"]), (summary["rendered"], summary["skipped"], summary["failed"]))
+            os.utime(sources[1], (0, time.time() + 60))
+            again = BudgetBatch(output, formats=["html"], workers=1).run(sources[:2])
+            self.assertEqual((["html"], {}), (again[0]["skipped"], again[0]["outputs"]))
+            self.assertEqual(["html"], list(again[1]["outputs"]))
+            unpicklable = BudgetBatch(output, workers=2, force=True).run([("inline", lambda: B2022.run()), B2022.run])
+            self.assertEqual("inline", unpicklable[0]["name"])
+            self.assertIsNotNone(unpicklable[0]["error"])
+            self.assertIsNone(unpicklable[1]["error"])
+            self.assertRaises(BudgetAccountParametersInvalid, BudgetBatch, output, formats=["pdf"])
+            self.assertRaises(BudgetAccountParametersInvalid, BudgetBatch(output).run, sources[:1] * 2)
+            self.assertRaises(BudgetAccountParametersInvalid, BudgetBatch(output).run,
+                              [lambda: B2022.run(), lambda: B2022.run()])
+            self.assertRaises(BudgetAccountParametersInvalid, BudgetBatch(output).run, [("A", B2022.run), sources[0]])
+            self.assertEqual("functools.partial", BudgetBatch.getName(functools.partial(B2022.run)))
+            self.assertTrue(BudgetBatch.getName(lambda: None).endswith("test_batch_reports._locals_._lambda_"))
+
+    def test_command_line(self):
+        def run(*argv):
+            output = io.StringIO()
+            with redirect_stdout(output):
+                status = main(list(argv))
+            return status, output.getvalue()
+
+        with tempfile.TemporaryDirectory() as folder:
+            budget = Budget(2020)
+            budget.addBank("FooBank")
+            budget.addAccount("Starting Balance", days=[100], bank="FooBank", frequency=12, start=1)
+            budget.addAccount("Foo", days=[-20], bank="FooBank", txn_mode="Optional")
+            source = os.path.join(folder, "budget.json")
+            with open(source, "w") as file:
+                json.dump(budget.asdict(), file)
+            status, output = run("check", source)
+            self.assertEqual(1, status)
+            self.assertIn("negative balance in JUN: $-20.00", output)
+            snapshot = os.path.join(folder, "budget.snap")
+            converted = os.path.join(folder, "converted.json")
+            self.assertEqual(0, run("convert", source, snapshot)[0])
+            self.assertEqual(0, run("convert", snapshot, converted, "--schema", "2")[0])
+            with open(converted) as file:
+                self.assertEqual(2, json.load(file)["schema"])
+            status, output = run("check", "--json", converted)
+            self.assertEqual(-240, json.loads(output)[0]["savings"])
+            status, output = run("render", converted, "-o", folder, "-f", "html", "-w", "1")
+            self.assertEqual(0, status)
+            self.assertTrue(os.path.exists(os.path.join(folder, "converted.html")))
+            self.assertEqual(2, run("check", os.path.join(folder, "missing.json"))[0])
+        code = "import sys, BudgetMe.Budget, BudgetMe.BudgetCli, BudgetMe.BudgetBatch; " \
+               "print([m for m in ['xlsxwriter', 'numpy', 'flask'] if m in sys.modules])"
+        imported = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, check=True,
+                                  universal_newlines=True).stdout
+        self.assertEqual("[]", imported.strip())
+
+    def test_json_schema_2_round_trip(self):
+        budget = Budget(2022, daysof=2, start=3, end=18)
+        budget.days_labels = ["H1", "H2"]
+        budget.addBank("FooBank")
+        budget.addBank("BarBank")
+        budget.addAccount("Payroll", days=[100, 50.5], category="Job", bank="FooBank")
+        budget.addAccount("Rent", days=[-80, 0], category="House", bank="BarBank", start=6)
+        budget.addAccount("Kids", days=[0, 0], bank="FooBank")
+        budget.addAccount("School", days=[-5, 0], bank="FooBank", parent="Kids")
+        budget.confirmTransaction("Payroll", 4, 1)
+        budget.getAccount("Rent").ledger.notes[0] = "First rent"
+        budget_json = json.loads(json.dumps(budget.asdict(schema=2)))
+        self.assertEqual(["FooBank", "BarBank"], [bank["name"] for bank in budget_json["banks"]])
+        self.assertEqual(1, budget_json["accounts"][1]["bank"])
+        self.assertLess(len(json.dumps(budget_json)), len(json.dumps(budget.asdict())) / 4)
+        loaded = Budget.createBudgetFromJson(budget_json)
+        self.assertEqual((3, 18), (loaded.start, loaded.end))
+        self.assertIs(loaded.getBank("FooBank"), loaded.getAccount("Payroll").bank)
+        self.assertIs(loaded.getBank("FooBank"), loaded.getAccount("School").bank)
+        for key in ["transactions", "banks", "days_labels", "year", "daysof"]:
+            self.assertEqual(budget.asdict()[key], loaded.asdict()[key])
+        self.assertEqual(budget.getFinalBalance(), loaded.getFinalBalance())
+        self.assertEqual(budget.asdict(schema=2), loaded.asdict(schema=2))
+
+    def test_json_schema_1_keeps_banks_and_period(self):
+        budget = Budget(2022, start=3, end=18)
+        budget.addBank("FooBank")
+        budget.addAccount("Payroll", days=[100], bank="FooBank")
+        budget.addAccount("Rent", days=[-80], bank="FooBank")
+        loaded = Budget.createBudgetFromJson(json.loads(json.dumps(budget.asdict())))
+        self.assertEqual((3, 18), (loaded.start, loaded.end))
+        self.assertEqual(["FooBank"], [bank.name for bank in loaded.banks])
+        self.assertIs(loaded.getAccount("Payroll").bank, loaded.getAccount("Rent").bank)
+
+    def test_json_stream_loader(self):
+        budget = Budget(2022, daysof=2, start=3, end=18)
+        budget.days_labels = ["H1", "H2"]
+        budget.addBank("FooBank")
+        budget.addAccount("Payroll", days=[100, 50.5], category="Job", bank="FooBank")
+        budget.addAccount("Rent", days=[-80, 0], category="House", bank="FooBank", start=6)
+        for schema in [1, 2]:
+            text = json.dumps(budget.asdict(schema=schema), indent=1)
+            expected = Budget.createBudgetFromJson(json.loads(text))
+            stream = BudgetJsonStream(io.StringIO(text))
+            stream.CHUNK = 7
+            loaded = stream.readBudget(BudgetMeHtml)
+            self.assertIsInstance(loaded, BudgetMeHtml)
+            self.assertEqual(expected.asdict(schema=2), loaded.asdict(schema=2))
+            self.assertIs(loaded.getBank("FooBank"), loaded.getAccount("Rent").bank)
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "budget.json")
+            with open(file_name, "w") as file:
+                json.dump(budget.asdict(schema=2), file)
+            self.assertEqual(budget.getFinalBalance(), Budget.loadJson(file_name).getFinalBalance())
+        self.assertRaises(BudgetAccountParametersInvalid, Budget.loadJson, io.StringIO('{"year": 2022'))
+        self.assertRaises(BudgetAccountParametersInvalid, Budget.loadJson, io.StringIO('[]'))
+
+    def test_snapshot_round_trip(self):
+        budget = BudgetMeHtml(2022, daysof=2, start=1, end=24)
+        budget.days_labels = ["H1", "H2"]
+        budget.addBank("FooBank")
+        budget.addAccount("Payroll", days=[100, 50.5], category="Job", bank="FooBank")
+        budget.addAccount("Rent", days=[-80, 0], category="House", bank="FooBank", start=(2022, 6))
+        budget.addAccount("Kids", days=[0, 0], bank="FooBank")
+        budget.addAccount("School", days=[-5, 0], bank="FooBank", parent="Kids")
+        budget.confirmTransaction("Payroll", 2, 1)
+        budget.getAccount("Rent").ledger.notes[0] = "First rent"
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, "budget.snap")
+            budget.saveSnapshot(file_name)
+            loaded = BudgetMeHtml.loadSnapshot(file_name)
+            self.assertIsInstance(loaded, BudgetMeHtml)
+            self.assertEqual(budget.generateHTMLTable(), loaded.generateHTMLTable())
+            self.assertEqual(budget.asdict()["transactions"], loaded.asdict()["transactions"])
+            self.assertEqual(budget.asdict()["banks"], loaded.asdict()["banks"])
+            self.assertEqual("First rent", loaded.getAccount("Rent").forecast_array[0].note)
+            self.assertIs(loaded.getBank("FooBank"), loaded.getAccount("Rent").bank)
+            loaded.updateTransaction("Payroll", 24, 2, 0)
+            loaded.addAccount("Gym", days=[-10, 0], bank="FooBank", start=20)
+            self.assertEqual(budget.getFinalBalance() - 50.5 - 50, loaded.getFinalBalance())
+            self.assertEqual(budget.getFinalBalance(), Budget.loadSnapshot(file_name).getFinalBalance())
+            del loaded
+
     def test_convert_from_json_forecast_to_forecast_object(self):
         json_forecast = {'id': '535bf824-99f1-329c-a4d9-68e0887ca66f', 'month': 1, 'day': 2, 'amount': 3, 'planned': 3,
                          'previous': 0}